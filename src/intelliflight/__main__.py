@@ -1,11 +1,12 @@
 import argparse
+import asyncio
 import csv
 from datetime import date, timedelta, datetime, time
 import json
 import sys
 
-from intelliflight.util import datautil, nws_manager
-from .models.bayes_net import Bayes_Net
+from intelliflight.util import async_predictor, batchutil, datautil, nws_manager, prediction_server, weatherstore
+from .models.bayes_net import Bayes_Net, DATASET_CACHE_DIR, WEATHER_JSON_PATH, WEATHER_STORE_PATH
 from pathlib import Path
 from pydoc import pager
 from intelliflight.GUI import App
@@ -192,8 +193,9 @@ train_subparser.add_argument(
     '-t', '--training-data',
     required=True,
     type=str,
+    nargs='+',
     dest='flight_path',
-    help='Path to training flight data.'
+    help='Paths or glob patterns (e.g., "flights/2019_*.csv") of training flight data files.'
 )
 train_subparser.add_argument(
     '-p', '--partitions',
@@ -224,6 +226,51 @@ train_subparser.add_argument(
     dest='rng_seed',
     help='Seed for RNG used to shuffle data. Useful for debugging or generating consistent output.'
 )
+train_subparser.add_argument(
+    '-j', '--jobs',
+    required=False,
+    type=int,
+    default=1,
+    dest='workers',
+    help='Number of processes used to load training data and for cross-validation. Defaults to 1.'
+)
+train_subparser.add_argument(
+    '-c', '--cv',
+    required=False,
+    type=str,
+    choices=['kfold', 'loo'],
+    default='kfold',
+    dest='cv',
+    help="Cross-validation scheme used to select the Laplace smoothing value: 'kfold' (nested k-fold over the partitions) or 'loo' (exact leave-one-out; ignores the partition count and jobs). Defaults to 'kfold'."
+)
+train_subparser.add_argument(
+    '--no-cache',
+    action='store_true',
+    dest='no_cache',
+    help='Load the training data from scratch without reading or writing the preprocessed dataset cache in data/cache.'
+)
+
+# Parser for update mode
+update_subparser = subparsers.add_parser(
+    'update', help="Add new flight data to a trained model without retraining.")
+update_subparser.add_argument(
+    '-t', '--training-data',
+    required=True,
+    type=str,
+    dest='flight_path',
+    help='Path to new flight data.'
+)
+
+# Parser for refit mode
+refit_subparser = subparsers.add_parser(
+    'refit', help="Refit a trained model with a new Laplace smoothing value.")
+refit_subparser.add_argument(
+    '-k', '--k-value',
+    required=True,
+    type=int,
+    dest='k',
+    help='New Laplace smoothing value. Must be at least 0.'
+)
 
 # Parser for prediction mode
 predict_subparser = subparsers.add_parser('predict', help="Make a prediction.")
@@ -263,6 +310,92 @@ predict_subparser.add_argument(
     help='Departure time on a 24-hour clock in hh:mm format.'
 )
 
+# Parser for batch prediction mode
+predict_batch_subparser = subparsers.add_parser(
+    'predict-batch', help="Make predictions for every flight in a CSV file.")
+predict_batch_subparser.add_argument(
+    '-i', '--input',
+    required=True,
+    type=str,
+    dest='in_path',
+    help='Path to input CSV of flights with columns ORIGIN_AIRPORT_ID, DEST_AIRPORT_ID, OP_UNIQUE_CARRIER, FL_DATE (YYYY-MM-DD), and CRS_DEP_TIME (hhmm). Optional columns src_tavg, dst_tavg, src_wspd, and dst_wspd give weather (F and MPH); otherwise, forecasts are fetched.'
+)
+predict_batch_subparser.add_argument(
+    '-o', '--output',
+    required=True,
+    type=str,
+    dest='out_path',
+    help='Path to output CSV. Holds the input columns plus PREDICTED_STATUS, PROBABILITY, and ERROR.'
+)
+predict_batch_subparser.add_argument(
+    '-n', '--chunk-size',
+    required=False,
+    type=int,
+    default=batchutil.DEFAULT_CHUNK_SIZE,
+    dest='chunk_size',
+    help=f'Number of flights predicted at once. Defaults to {batchutil.DEFAULT_CHUNK_SIZE}.'
+)
+predict_batch_subparser.add_argument(
+    '--no-forecast',
+    action='store_true',
+    dest='no_forecast',
+    help='Reject flights without weather instead of fetching forecasts.'
+)
+
+# Parser for prediction server mode
+serve_subparser = subparsers.add_parser(
+    'serve', help="Serve predictions over HTTP with the model loaded once.")
+serve_subparser.add_argument(
+    '-H', '--host',
+    required=False,
+    type=str,
+    default=prediction_server.DEFAULT_HOST,
+    dest='host',
+    help=f'Address to bind. Defaults to {prediction_server.DEFAULT_HOST}.'
+)
+serve_subparser.add_argument(
+    '-p', '--port',
+    required=False,
+    type=int,
+    default=prediction_server.DEFAULT_PORT,
+    dest='port',
+    help=f'Port to bind. Defaults to {prediction_server.DEFAULT_PORT}.'
+)
+serve_subparser.add_argument(
+    '-w', '--workers',
+    required=False,
+    type=int,
+    default=prediction_server.DEFAULT_WORKERS,
+    dest='workers',
+    help=f'Number of worker threads handling requests. Defaults to {prediction_server.DEFAULT_WORKERS}.'
+)
+serve_subparser.add_argument(
+    '--no-forecast',
+    action='store_true',
+    dest='no_forecast',
+    help='Reject flights without weather instead of fetching forecasts.'
+)
+
+# Parser for weather store building mode
+build_weather_subparser = subparsers.add_parser(
+    'build-weather', help="Convert the historical weather JSON to the indexed weather store used for training.")
+build_weather_subparser.add_argument(
+    '-i', '--input',
+    required=False,
+    type=str,
+    default=WEATHER_JSON_PATH.as_posix(),
+    dest='json_path',
+    help='Path to historical weather JSON. Defaults to data/historical/weather/weather_by_bts_id.json.'
+)
+build_weather_subparser.add_argument(
+    '-o', '--output',
+    required=False,
+    type=str,
+    default=WEATHER_STORE_PATH.as_posix(),
+    dest='store_path',
+    help='Path to write the weather store to. Defaults to data/historical/weather/weather_by_bts_id.bin.'
+)
+
 # Parser for mapping listing mode
 list_subparser = subparsers.add_parser(
     'list', help='List possible input mappings.')
@@ -300,9 +433,24 @@ else:
         elif sys.argv[1] == 'train':
             train_subparser.print_help()
 
+        elif sys.argv[1] == 'update':
+            update_subparser.print_help()
+
+        elif sys.argv[1] == 'refit':
+            refit_subparser.print_help()
+
         elif sys.argv[1] == 'predict':
             predict_subparser.print_help()
 
+        elif sys.argv[1] == 'predict-batch':
+            predict_batch_subparser.print_help()
+
+        elif sys.argv[1] == 'serve':
+            serve_subparser.print_help()
+
+        elif sys.argv[1] == 'build-weather':
+            build_weather_subparser.print_help()
+
         elif sys.argv[1] == 'list':
             list_subparser.print_help()
 
@@ -321,16 +469,20 @@ else:
             if not cli_yes_no_prompt('The model has already been trained. Do you wish to continue? (y/n): '):
                 exit()
 
-        # Ensure that training data file exists
-        if not Path(args.flight_path).exists():
-            print(f'Error: File {args.flight_path} does not exist.')
+        # Ensure that training data files exist
+        try:
+            flight_paths = datautil.resolve_flight_paths(args.flight_path)
+
+        except FileNotFoundError as e:
+            print(f'Error: {e}')
             exit()
 
         # Train
         bayes = Bayes_Net()
-        bayes.load_data(args.flight_path)
+        bayes.load_data(flight_paths, columnar=True, workers=args.workers,
+                        cache_dir=None if args.no_cache else DATASET_CACHE_DIR.as_posix())
         k, accuracy = bayes.train_model(
-            args.partition_count, args.k_step, args.max_k, args.rng_seed)
+            args.partition_count, args.k_step, args.max_k, args.rng_seed, args.workers, args.cv)
         print(
             f'Generated model parameters with k={k} and an estimated accuracy of {accuracy}%.')
 
@@ -338,6 +490,61 @@ else:
         if cli_yes_no_prompt('Would you like to save this model? (y/n): '):
             bayes.export_parameters()
 
+    elif sys.argv[1] == 'update':
+        # Load model
+        model_path = (root_dir / 'data' / 'models' / 'bayes_net.model.json')
+        if not model_path.exists():
+            print(
+                f'Error: Model file {model_path.as_posix()} does not exist. Train the model first.')
+            exit()
+
+        # Ensure that new data file exists
+        if not Path(args.flight_path).exists():
+            print(f'Error: File {args.flight_path} does not exist.')
+            exit()
+
+        bayes = Bayes_Net(model_path.as_posix())
+        try:
+            record_count = bayes.update(args.flight_path)
+
+        except BufferError as e:
+            # Model file has no frequencies, or new data is empty
+            print(f'Error: {e}')
+            exit()
+
+        print(f'Added {record_count} records to the model.')
+
+        # Prompt user to save model
+        if cli_yes_no_prompt('Would you like to save the updated model? (y/n): '):
+            bayes.export_parameters()
+
+    elif sys.argv[1] == 'refit':
+        # Load model
+        model_path = (root_dir / 'data' / 'models' / 'bayes_net.model.json')
+        if not model_path.exists():
+            print(
+                f'Error: Model file {model_path.as_posix()} does not exist. Train the model first.')
+            exit()
+
+        if args.k < 0:
+            print('Error: Laplace smoothing value must be at least 0.')
+            exit()
+
+        bayes = Bayes_Net(model_path.as_posix())
+        try:
+            bayes.refit(args.k)
+
+        except BufferError as e:
+            # Model file has no frequencies
+            print(f'Error: {e}')
+            exit()
+
+        print(f'Refit model with k={args.k}.')
+
+        # Prompt user to save model
+        if cli_yes_no_prompt('Would you like to save the refit model? (y/n): '):
+            bayes.export_parameters()
+
     elif sys.argv[1] == 'predict':
         # Load model
         model_path = (root_dir / 'data' / 'models' / 'bayes_net.model.json')
@@ -368,38 +575,23 @@ else:
             print('Error: Origin and Destination cannot be the same.')
             exit()
 
+        # Forecasts for both airports are fetched concurrently
+        predictor = async_predictor.AsyncPredictor(
+            bayes,
+            async_predictor.AsyncForecaster(nws_manager.Forecaster(
+                (root_dir / 'data' / 'maps' / 'airport_mappings.json').as_posix()))
+        )
         try:
-            # Get weather data
-            forecast_src = nws_manager.Forecaster((root_dir / 'data' / 'maps' / 'airport_mappings.json').as_posix(
-            )).get_nws_forecast_from_bts(args.src_airport, dep_timestamp.isoformat())
-            forecast_dst = nws_manager.Forecaster((root_dir / 'data' / 'maps' / 'airport_mappings.json').as_posix(
-            )).get_nws_forecast_from_bts(args.dst_airport, dep_timestamp.isoformat())
-
-            # Discretize data/arguments
-            data_to_discretize = [
-                {
-                    "CRS_DEP_TIME": args.dep_time,
-                    'src_tavg': float(forecast_src['temperature']),
-                    'dst_tavg': float(forecast_dst['temperature']),
-                    'src_wspd': float(forecast_src['windSpeed'].split(' ')[0]),
-                    'dst_wspd': float(forecast_dst['windSpeed'].split(' ')[0])
-                }
-            ]
-            datautil.discretize(data_to_discretize)
-            data_to_discretize = data_to_discretize[0]
-
-            # Make prediction
-            status_k, probability = bayes.make_prediction(
-                args.src_airport,
-                args.dst_airport,
-                args.carrier,
-                dep_timestamp.isoweekday(),
-                data_to_discretize['CRS_DEP_TIME'],
-                data_to_discretize['src_tavg'],
-                data_to_discretize['dst_tavg'],
-                data_to_discretize['src_wspd'],
-                data_to_discretize['dst_wspd']
-            )
+            # Get weather data and make prediction
+            prediction = asyncio.run(predictor.predict({
+                'ORIGIN_AIRPORT_ID': args.src_airport,
+                'DEST_AIRPORT_ID': args.dst_airport,
+                'OP_UNIQUE_CARRIER': args.carrier,
+                'FL_DATE': args.date.isoformat(),
+                'CRS_DEP_TIME': args.dep_time
+            }))
+            status_k = prediction['status']
+            probability = prediction['probability']
 
             # If status is a cancellation, add a prefix for readability
             prefix = 'Cancelled due to ' if status_k.find(
@@ -432,6 +624,89 @@ else:
                 f'Error: {e}')
             exit()
 
+        finally:
+            predictor.close()
+
+    elif sys.argv[1] == 'predict-batch':
+        # Load model
+        model_path = (root_dir / 'data' / 'models' / 'bayes_net.model.json')
+        if not model_path.exists():
+            print(
+                f'Error: Model file {model_path.as_posix()} does not exist. Train the model first.')
+            exit()
+
+        # Ensure that input file exists
+        if not Path(args.in_path).exists():
+            print(f'Error: File {args.in_path} does not exist.')
+            exit()
+
+        if args.chunk_size < 1:
+            print('Error: Chunk size must be at least 1.')
+            exit()
+
+        bayes = Bayes_Net(model_path.as_posix())
+        forecaster = None
+        if not args.no_forecast:
+            forecaster = nws_manager.Forecaster(
+                (root_dir / 'data' / 'maps' / 'airport_mappings.json').as_posix())
+
+        stats = batchutil.predict_csv(
+            bayes, args.in_path, args.out_path, forecaster, args.chunk_size)
+        print(
+            f'Predicted {stats["predicted"]} of {stats["rows"]} flights ({stats["rejected"]} rejected) ' +
+            f'in {round(stats["seconds"], 2)}s ({round(stats["rows_per_second"], 1)} flights/s).')
+        print(f'Wrote predictions to {args.out_path}.')
+
+    elif sys.argv[1] == 'serve':
+        # Load model
+        model_path = (root_dir / 'data' / 'models' / 'bayes_net.model.json')
+        if not model_path.exists():
+            print(
+                f'Error: Model file {model_path.as_posix()} does not exist. Train the model first.')
+            exit()
+
+        if args.workers < 1:
+            print('Error: Worker count must be at least 1.')
+            exit()
+
+        bayes = Bayes_Net(model_path.as_posix())
+        forecaster = None
+        if not args.no_forecast:
+            forecaster = nws_manager.Forecaster(
+                (root_dir / 'data' / 'maps' / 'airport_mappings.json').as_posix())
+
+        try:
+            server = prediction_server.PredictionServer(
+                bayes, args.host, args.port, args.workers, forecaster)
+
+        except OSError as e:
+            # Address in use, permission denied, etc.
+            print(f'Error: Cannot bind {args.host}:{args.port}: {e}')
+            exit()
+
+        host, port = server.server_address[:2]
+        print(
+            f'Serving predictions on http://{host}:{port} with {args.workers} workers. Press Ctrl+C to stop.')
+        try:
+            server.serve_forever()
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            server.server_close()
+
+    elif sys.argv[1] == 'build-weather':
+        if not Path(args.json_path).exists():
+            print(f'Error: File {args.json_path} does not exist.')
+            exit()
+
+        store = weatherstore.build_weather_store(
+            args.json_path, args.store_path)
+        start_date, end_date = store.get_date_range()
+        print(
+            f'Wrote weather for {len(store.get_airports())} airports from {start_date} to {end_date - timedelta(days=1)} to {args.store_path}.')
+
     elif sys.argv[1] == 'list':
         # Print input mappings
         params_path = root_dir / 'data' / 'models' / 'bayes_net.model.json'
@@ -4,36 +4,81 @@ import math
 import csv
 import datetime
 import json
+import tempfile
+import copy
+import numpy as np
 
-from ..util import datautil
+from ..util import datautil, weatherstore
 from intelliflight.models.components.dataset import Dataset
 from intelliflight.models.components.keymeta import KeyMeta
 from intelliflight.models.components.frequencycounter import FrequencyCounter
 from intelliflight.models.components.ptables import ProbabilityTables
+from intelliflight.models.components.encoder import FeatureEncoder, StreamEncoder, FEATURES, FEATURE_COLUMNS
+from intelliflight.models.components.partitioncounts import PartitionCounts
+from intelliflight.models.components.compiledpredictor import CompiledPredictor, FACTORS, ROUTE_FEATURES, VARIABLE_FEATURES
+from intelliflight.models.components.predictioncache import PredictionCache
+from intelliflight.models.components.datasetcache import DatasetCache
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Final, Union
 
 
 root_dir = Path(__file__).parent.parent.parent.parent
 data_dir = root_dir / 'data'
+weather_dir = data_dir / 'historical' / 'weather'
+
+# Historical weather database as a store file (see util.weatherstore), used
+# when present, and as JSON
+WEATHER_STORE_PATH: Final = weather_dir / 'weather_by_bts_id.bin'
+WEATHER_JSON_PATH: Final = weather_dir / 'weather_by_bts_id.json'
+
+# Default DatasetCache directory for preprocessed training data
+DATASET_CACHE_DIR: Final = data_dir / 'cache'
+
+# Approximate size of the flight data chunks loaded by each process
+LOAD_CHUNK_BYTES: Final = 2 ** 25
+
+# Maximum number of (k, record, status) scores held in memory at once when
+# testing candidate k values
+SCORE_BLOCK_SIZE: Final = 2 ** 22
 
 
 class Bayes_Net(ai_model.AI_Model):
-    def __init__(self, params_path: str = None):
+    def __init__(self, params_path: str = None, cache_size: int = 0):
         """Construct a Bayes_Net.
 
         Positional arguments:
 
         - params_path -- path to an existing model parameters file. If `None`,
                          the model will be initialized in an untrained state.
+
+        Keyword arguments:
+
+        - cache_size -- maximum number of predictions kept in
+                        `prediction_cache` by `make_prediction()`. 0 disables
+                        the cache.
         """
         # Declare model components
         self.key_meta = KeyMeta()
         self.dataset = Dataset()
         self.frequencies = FrequencyCounter()
         self.p_tables = ProbabilityTables()
+        # Built from key_meta when first needed. Use __get_encoder().
+        self.encoder: FeatureEncoder = None
+        # Built from dataset when training begins
+        self.partition_counts = PartitionCounts()
+        # Compiled from p_tables when first needed, and again whenever the
+        # tables or keys change. Use __get_predictor().
+        self.predictor: CompiledPredictor = None
+        # Predictions of make_prediction(), cleared whenever the predictor
+        # is recompiled
+        self.prediction_cache = PredictionCache(cache_size)
 
         # Parameters used to train model
         self.rng_seed: int = None
+        self.laplace_k: int = None
+        # Number of records counted in frequencies
+        self.training_len: int = None
 
         super().__init__(params_path)
 
@@ -92,73 +137,194 @@ class Bayes_Net(ai_model.AI_Model):
             # Load probabilities
             self.p_tables.import_p_tables(import_json['p_tables'])
 
-    def load_data(self, flight_path: str):
+            # Load smoothing coefficient and raw frequencies, if present.
+            # These are needed to update the model with new data.
+            self.laplace_k = import_json.get('laplace_k')
+            self.training_len = import_json.get('training_len')
+            self.frequencies = FrequencyCounter()
+            if 'frequencies' in import_json:
+                self.frequencies.import_counters(import_json['frequencies'])
+                if self.training_len is None:
+                    self.training_len = sum(
+                        self.frequencies.get_status_counter().values())
+
+        # Vocabularies may have changed
+        self.encoder = None
+
+    def load_data(self, flight_path: Union[str, list[str]], columnar: bool = False, workers: int = 1, cache_dir: str = None):
         """Load historical flight data from `flight_path`.
 
         The program's internal historical weather database will be used.
         This function will NOT train the model.
+
+        Positional arguments:
+
+        - flight_path -- path or glob pattern of a flight data file, or a
+                         list of them (e.g., one file per month). Files are
+                         loaded in order (see
+                         `datautil.resolve_flight_paths()`).
+
+        Keyword arguments:
+
+        - columnar -- if `True`, store only the model features and arrival
+                      statuses as integer-encoded columns (see `Dataset`).
+                      This greatly reduces memory use and speeds up
+                      training.
+        - workers -- number of processes across which the flight data are
+                     read, merged, and encoded, in line-aligned chunks of
+                     about `LOAD_CHUNK_BYTES`. Results are identical to a
+                     serial load (`workers=1`). Unused unless `columnar`.
+        - cache_dir -- directory of a `DatasetCache` (e.g.,
+                       `DATASET_CACHE_DIR`). If set, the encoded dataset is
+                       read from the cache when its inputs (flight data
+                       files, weather, discretization maps, and known
+                       airports) are unchanged, and written to it
+                       otherwise. Unused unless `columnar`.
         """
-        # Get merged and pruned flight and weather data
-        print('BayesNet: Merging training datasets.')
-        data, seen_carriers, seen_src, seen_dst = datautil.merge_training_data(
-            flight_path,
-            (data_dir / 'historical' / 'weather' /
-             'weather_by_bts_id.json').as_posix()
-        )
-        # If flight_path points to a file not containing flight data,
-        # merge_training_data() will fail to extract any data records, but it
-        # will not raise an exception.
-        if len(data) == 0:
+        if workers < 1:
+            raise ValueError(
+                f'BayesNet: ERR: workers={workers} must be at least 1.')
+
+        flight_paths = datautil.resolve_flight_paths(flight_path)
+        weather_path = self.__get_weather_path().as_posix()
+
+        dataset_cache = None
+        if columnar and cache_dir is not None:
+            dataset_cache = DatasetCache(cache_dir)
+            cache_key = self.__get_dataset_cache_key(
+                flight_paths, weather_path)
+            cached = dataset_cache.load(cache_key)
+            if cached is not None:
+                columns, meta = cached
+                print(
+                    f'BayesNet: Loaded cached dataset {cache_key[:12]} from {dataset_cache.get_cache_dir().as_posix()}.')
+                Bayes_Net.__report_drops(
+                    len(columns['status']), meta['drop_counts'])
+                self.key_meta.set_seen_airports(set(meta['seen_airports']))
+                self.key_meta.set_seen_carriers(set(meta['seen_carriers']))
+                self.encoder = None
+                self.dataset.set_columns(columns, self.__get_encoder())
+                return
+
+        # Records are merged, discretized, and stored as they are read, so
+        # that only the stored dataset is held in memory
+        print('BayesNet: Merging and discretizing training data.')
+        drop_counts = {}
+        if columnar and workers > 1:
+            print(
+                f'BayesNet: Encoding data across {workers} processes.')
+            stream_encoders = self.__load_chunks_in_parallel(
+                flight_paths, weather_path, workers, drop_counts)
+        else:
+            weather = weatherstore.open_weather_store(weather_path)
+            records = (record for path in flight_paths
+                       for record in datautil.discretize_records(
+                           datautil.stream_merged_flights(path, weather, drop_counts)))
+
+            if columnar:
+                print('BayesNet: Encoding data.')
+                stream_encoder = StreamEncoder(self.key_meta)
+                stream_encoder.encode(records)
+                stream_encoders = [stream_encoder]
+            else:
+                data = list(records)
+
+        if columnar:
+            data_len = sum(stream_encoder.get_len()
+                           for stream_encoder in stream_encoders)
+            seen_airports = set().union(
+                *[stream_encoder.get_seen_airports() for stream_encoder in stream_encoders])
+            seen_carriers = set().union(
+                *[stream_encoder.get_seen_carriers() for stream_encoder in stream_encoders])
+        else:
+            data_len = len(data)
+            seen_airports = set([
+                *[str(row['ORIGIN_AIRPORT_ID']) for row in data],
+                *[str(row['DEST_AIRPORT_ID']) for row in data]
+            ])
+            seen_carriers = set([str(row['OP_UNIQUE_CARRIER'])
+                                for row in data])
+
+        Bayes_Net.__report_drops(data_len, drop_counts)
+        # If flight_path points to a file not containing flight data, no
+        # records will be merged, but no exception will be raised.
+        if data_len == 0:
             raise BufferError(
                 'BayesNet: ERR: Loaded training dataset is empty or malformed.')
-        # Get combined set of src and dst airports
-        seen_airports = seen_src.copy()
-        for dst in seen_dst:
-            seen_airports.add(dst)
 
         # Update key metadata
         self.key_meta.set_seen_airports(seen_airports)
         self.key_meta.set_seen_carriers(seen_carriers)
+        self.encoder = None
 
-        # Discretize and save data
-        print('BayesNet: Discretizing data.')
-        datautil.discretize(data)
-        self.dataset.set_data(data)
+        # Save data
+        if columnar:
+            encoder = self.__get_encoder()
+            chunks = [stream_encoder.get_columns(encoder)
+                      for stream_encoder in stream_encoders]
+            if len(chunks) == 1:
+                columns = chunks[0]
+            else:
+                columns = {name: np.concatenate([chunk[name] for chunk in chunks])
+                           for name in chunks[0]}
+            self.dataset.set_columns(columns, encoder)
+
+            if dataset_cache is not None:
+                dataset_cache.save(cache_key, columns, {
+                    'seen_airports': sorted(seen_airports),
+                    'seen_carriers': sorted(seen_carriers),
+                    'drop_counts': drop_counts
+                })
+                print(
+                    f'BayesNet: Cached dataset {cache_key[:12]} in {dataset_cache.get_cache_dir().as_posix()}.')
+        else:
+            self.dataset.set_data(data)
 
-    def train_model(self, partition_count: int, k_step_percent: float, max_k_fraction: float, rng_seed: int = None):
+    def train_model(self, partition_count: int, k_step_percent: float, max_k_fraction: float, rng_seed: int = None, workers: int = 1, cv: str = 'kfold'):
         """Train the model.
 
         Positional arguments:
 
         - partition_count -- number of partitions to use for training. Must be
-                             at least 3 (training, validation, test).
+                             at least 3 (training, validation, test). Unused
+                             if `cv` is `'loo'`.
         - k_step_percent -- distance between each candidate value for the
                             laplace smoothing parameter as a fraction of
                             total dataset length. Must be between 0 and 1.
         - max_k_fraction -- maximum value of the laplace smoothing parameter
                             as a fraction of total dataset length. Must be
                             between 0 and 1.
-        - rng_seed -- seed value for the RNG used to shuffle data. Can be used
-                      to ensure consistent output for debugging. If `None`, a
-                      random value is used.
+        - rng_seed -- seed value for the RNG used to permute data. Can be
+                      used to ensure consistent output for debugging. If
+                      `None`, a random value is used.
+        - workers -- number of processes across which test partitions are
+                     distributed. Results are identical to a serial run
+                     (`workers=1`) with the same `rng_seed`. Unused if `cv`
+                     is `'loo'`.
+        - cv -- cross-validation scheme used to select k:
+          - `'kfold'` -- nested k-fold cross-validation over
+                         `partition_count` partitions
+          - `'loo'` -- exact leave-one-out cross-validation, computed from
+                       the counts of the full dataset
 
         Returns:
 
         - Laplace smoothing parameter of trained model
         - Accuracy of trained model against test data
         """
-        if self.dataset.get_data() is None:
+        if not self.dataset.data_loaded():
             raise BufferError(
                 'BayesNet: ERR: No data loaded. Call load_data() first.')
+        if cv not in ('kfold', 'loo'):
+            raise ValueError(
+                f"BayesNet: ERR: cv={cv} must be 'kfold' or 'loo'.")
         start_t: datetime.datetime = datetime.datetime.now().timestamp()
         if rng_seed is None:
             rng_seed = int(random.random() * 1000000000)
         self.rng_seed = rng_seed
         print(f'BayesNet: RNG seed is {self.rng_seed}.')
 
-        print('BayesNet: Shuffling and partitioning data.')
-        partitions = datautil.shuffle_and_partition(
-            self.dataset.get_data(), self.rng_seed, partition_count)
+        encoder = self.__get_encoder()
 
         # Determine laplace smoothing hyperparameter (k) using k-fold cross-validation with validation and test set
         data_len = self.dataset.get_len()
@@ -168,98 +334,68 @@ class Bayes_Net(ai_model.AI_Model):
             k_values = [0]
         else:
             k_values = list(range(0, max_k, k_step))
-        k_test_results = []
 
-        for test_index in range(len(partitions)):
-            print(
-                f'BayesNet: Processing test partition {test_index + 1} of {len(partitions)}.')
-            test_start = partitions[test_index]
-            test_end = None  # Index of first item AFTER test set
-            if test_start == partitions[-1]:
-                test_end = data_len
+        if cv == 'loo':
+            # Every record is held out once, so no shuffling or partitioning
+            # is needed
+            self.dataset.clear_order()
+            print('BayesNet: Counting frequencies.')
+            if self.dataset.is_columnar():
+                columns = self.dataset.get_columns()
             else:
-                test_end = partitions[test_index + 1]
-
-            self.dataset.set_test_bounds(test_start, test_end)
-
-            k_validation_results = {k: 0 for k in k_values}
-
-            passed_test_partition = False  # for logging
-            for validation_index in range(len(partitions)):
-                validation_start = partitions[validation_index]
-                validation_end = None
-                if validation_index == test_index:
-                    passed_test_partition = True
-                    continue
-                elif validation_start == partitions[-1]:
-                    validation_end = data_len
-                else:
-                    validation_end = partitions[validation_index + 1]
+                columns = encoder.encode_records(self.dataset.get_data())
+            total_counts = FrequencyCounter.tally(columns, encoder)
+            print(
+                f'BayesNet: Running leave-one-out cross-validation over {len(k_values)} k values.')
+            errors = Bayes_Net.leave_one_out_k_values(
+                total_counts, columns, k_values)
+            best_index = int(np.argmin(errors))
+            best_k = k_values[best_index]
+            best_error = errors[best_index]
+        else:
+            print('BayesNet: Shuffling and partitioning data.')
+            # Partitions are ranges of a seeded permutation of record
+            # indices, so the loaded data is never reordered and the same
+            # seed always gives the same partitions
+            order, partitions = datautil.permute_and_partition(
+                self.dataset.get_len(), self.rng_seed, partition_count)
+            self.dataset.set_order(order)
 
-                self.dataset.set_validation_bounds(
-                    validation_start, validation_end)
+            # Count each partition once. The counts of any training set are
+            # derived from these by subtraction.
+            print('BayesNet: Counting partition frequencies.')
+            self.partition_counts.build(self.dataset, partitions, encoder)
 
-                validation_pass = \
-                    validation_index + 1 - int(passed_test_partition)
+            # Test partitions are independent of each other
+            if workers > 1:
                 print(
-                    f'BayesNet:   Processing validation partition {validation_pass} of {len(partitions) - 1}.')
-
-                self.frequencies.reset_counters(self.key_meta)
-                self.frequencies.count_frequencies(self.dataset)
-
-                for k in k_values:
-                    print(
-                        f'BayesNet:     Fitting model with k={k}.')
-                    self.p_tables.reset_tables(self.key_meta, self.frequencies)
-                    self.p_tables.fit(self.dataset, self.frequencies, k)
-
-                    print(
-                        f'BayesNet:     Testing model with k={k}.')
-                    error = self.test(self.dataset.get_validation_bounds())
-                    accuracy = round((1 - error) * 100, 2)
-                    print(
-                        f'BayesNet:     Accuracy was {accuracy}%.')
-                    # Incrementally adjust average
-                    k_validation_results[k] += (error -
-                                                k_validation_results[k]) / validation_pass
+                    f'BayesNet: Processing {len(partitions)} test partitions with {workers} workers.')
+                k_test_results = self.__cross_validate_parallel(
+                    k_values, workers)
+            else:
+                k_test_results = [
+                    Bayes_Net.cross_validate_partition(
+                        self.partition_counts, test_index, k_values)
+                    for test_index in range(len(partitions))
+                ]
 
+            # Pick k value that performed best on test set
             best_k = None
             best_error = 2
-            for k, avg_error in k_validation_results.items():
-                if avg_error < best_error:
-                    best_k = k
-                    best_error = avg_error
-
-            print(
-                f'BayesNet:   Refitting model with best k value from cross-validation (k={best_k}).')
-            self.dataset.clear_validation_partition()
-            # Using best k, refit to all data except test set
-            self.frequencies.reset_counters(self.key_meta)
-            self.frequencies.count_frequencies(self.dataset)
-            self.p_tables.reset_tables(self.key_meta, self.frequencies)
-            self.p_tables.fit(self.dataset, self.frequencies, best_k)
-            print(
-                f'BayesNet:   Testing refit model.')
-            error = self.test(self.dataset.get_test_bounds())
-            accuracy = round((1 - error) * 100, 2)
-            print(
-                f'BayesNet:   Accuracy was {accuracy}%.')
-            k_test_results.append({'k': best_k, 'error': error})
-
-        # Pick k value that performed best on test set
-        best_k = None
-        best_error = 2
-        for iteration in k_test_results:
-            if iteration['error'] < best_error:
-                best_k = iteration['k']
-                best_error = iteration['error']
+            for iteration in k_test_results:
+                if iteration['error'] < best_error:
+                    best_k = iteration['k']
+                    best_error = iteration['error']
+            total_counts = self.partition_counts.get_counts_excluding()
 
+        self.laplace_k = best_k
+        self.training_len = data_len
         print(
             f'BayesNet: Refitting model with best k value from testing (k={best_k}).')
         self.dataset.clear_test_partition()
         # Fit to all data with best k
         self.frequencies.reset_counters(self.key_meta)
-        self.frequencies.count_frequencies(self.dataset)
+        self.frequencies.set_count_arrays(total_counts, encoder)
         self.p_tables.reset_tables(self.key_meta, self.frequencies)
         self.p_tables.fit(self.dataset, self.frequencies, best_k)
         accuracy = round((1 - best_error) * 100, 2)
@@ -269,33 +405,149 @@ class Bayes_Net(ai_model.AI_Model):
             f'BayesNet: Completed training in {round(datetime.datetime.now().timestamp() - start_t, 2)}s.')
         return best_k, accuracy
 
-    def export_parameters(self):
-        """Export current model params to file."""
+    def update(self, flight_path: str) -> int:
+        """Add the historical flight data in `flight_path` to the model
+        without retraining on earlier data.
+
+        Only the new records are merged, discretized, and counted. Their
+        counts are added to the model's frequencies, and the probability
+        tables are refit with the model's current k. Airports and carriers
+        first seen in `flight_path` are added to the model. The loaded
+        dataset, if any, is untouched.
+
+        The model must have been trained, or loaded from a parameters file
+        holding frequencies (see `export_parameters()`).
+
+        Returns:
+
+        Number of records added to the model
+        """
+        if self.frequencies.get_status_counter() is None or self.laplace_k is None:
+            raise BufferError(
+                'BayesNet: ERR: Model has no frequencies to update. Train the model or load parameters that include frequencies first.')
+
+        data, seen_carriers, seen_airports = self.__merge_flight_data(
+            flight_path)
+
+        # Extend key metadata with newly seen airports and carriers
+        self.key_meta.set_seen_airports(
+            self.key_meta.get_seen_airports() | seen_airports)
+        self.key_meta.set_seen_carriers(
+            self.key_meta.get_seen_carriers() | seen_carriers)
+        self.encoder = None
+        encoder = self.__get_encoder()
+        self.frequencies.extend_counters(self.key_meta)
+
+        print('BayesNet: Discretizing data.')
+        datautil.discretize(data)
+
+        print('BayesNet: Counting new frequencies.')
+        counts = self.frequencies.get_count_arrays(encoder)
+        new_counts = FrequencyCounter.tally(
+            encoder.encode_records(data), encoder)
+        self.frequencies.set_count_arrays(
+            {name: counts[name] + new_counts[name] for name in counts},
+            encoder)
+
+        self.training_len += len(data)
+        self.refit(self.laplace_k)
+        return len(data)
+
+    def refit(self, k: int):
+        """Rebuild the probability tables from the model's frequencies with
+        laplace smoothing coefficient `k`. No data is loaded or recounted.
+
+        The model must have been trained, or loaded from a parameters file
+        holding frequencies (see `export_parameters()`).
+        """
+        if self.frequencies.get_status_counter() is None or self.training_len is None:
+            raise BufferError(
+                'BayesNet: ERR: Model has no frequencies to refit. Train the model or load parameters that include frequencies first.')
+
+        print(f'BayesNet: Refitting model (k={k}).')
+        self.p_tables.reset_tables(self.key_meta, self.frequencies)
+        self.p_tables.fit_counts(self.frequencies, self.training_len, k)
+        self.laplace_k = k
+
+    def export_parameters(self, include_counts: bool = True):
+        """Export current model params to file.
+
+        Keyword arguments:
+
+        - include_counts -- if `True` and the model's frequencies are known,
+                            also export the smoothing coefficient, raw
+                            frequencies, and training length. These allow
+                            the exported model to be updated with `update()`
+                            or refit with `refit()`.
+        """
         export_json = {}
         export_json['training_rng_seed'] = self.rng_seed
         export_json['seen_airports'] = list(self.key_meta.get_seen_airports())
         export_json['seen_carriers'] = list(self.key_meta.get_seen_carriers())
         export_json['p_tables'] = self.p_tables.export_p_tables()
+        if include_counts and self.laplace_k is not None \
+                and self.frequencies.get_status_counter() is not None:
+            export_json['laplace_k'] = self.laplace_k
+            export_json['training_len'] = self.training_len
+            export_json['frequencies'] = self.frequencies.export_counters()
         with (data_dir / 'models' / 'bayes_net.model.json').open('w') as f_out:
             json.dump(export_json, f_out)
 
-    def test(self, test_bounds: tuple[int, int]):
+    def test(self, test_bounds: tuple[int, int], vectorized: bool = True):
         """Test model accuracy on data within test bounds.
 
-        `test_bounds` fields:
+        `test_bounds` fields (positions in the record order of the dataset):
 
         - test_start -- starting index for test. Inclusive.
         - test_end -- ending index for test. Exclusive.
 
+        Keyword arguments:
+
+        - vectorized -- if `True`, encode the test data and score it with
+                        array operations. Otherwise, call
+                        `make_prediction()` once per record. Both give the
+                        same error rate.
+
         Returns:
 
         Fraction of tests failed (error rate)
         """
+        test_start, test_end = test_bounds
+        indices = self.dataset.get_indices(test_start, test_end)
+        if vectorized:
+            if self.dataset.is_columnar():
+                encoder = self.dataset.get_encoder()
+                columns = {name: column[indices]
+                           for name, column in self.dataset.get_columns().items()}
+            else:
+                encoder = self.__get_encoder()
+                columns = encoder.encode_records(
+                    self.dataset.get_data(), indices)
+            log_p = {name: table[np.newaxis]
+                     for name, table in self.p_tables.get_log_arrays(encoder).items()}
+            return Bayes_Net.__error_rates(log_p, columns)[0]
+
         num_pass = 0
         num_fail = 0
-        test_start, test_end = test_bounds
+        if self.dataset.is_columnar():
+            # Decode each record and compare arrival status keys
+            encoder = self.dataset.get_encoder()
+            columns = self.dataset.get_columns()
+            vocab = {name: encoder.get_keys(name) for name in columns}
+            for i in indices.tolist():
+                record = {column_k: vocab[feature][columns[feature][i]]
+                          for feature, column_k in FEATURE_COLUMNS.items()}
+                predicted_status, _ = self.make_prediction(record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+                                                           record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+                if predicted_status == vocab['status'][columns['status'][i]]:
+                    num_pass += 1
+                else:
+                    num_fail += 1
+
+            return num_fail / (num_pass + num_fail)
+
         data = self.dataset.get_data()
-        for i in range(test_start, test_end):
+        for i in indices.tolist():
             record = data[i]
             predicted_status, _ = self.make_prediction(record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
                                                        record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
@@ -310,7 +562,146 @@ class Bayes_Net(ai_model.AI_Model):
 
         return num_fail / (num_pass + num_fail)
 
-    def make_prediction(self, src_airport: int, dest_airport: int, operating_airline: str, day_of_week: int, departure_time: str, src_tmp: str, dst_tmp: str, src_wnd: str, dst_wnd: str):
+    @staticmethod
+    def cross_validate_partition(partition_counts: PartitionCounts, test_index: int, k_values: list[int]) -> dict:
+        """Select k by cross-validation over all partitions except the test
+        partition, then test a fit with the selected k on the test
+        partition. The model itself is not modified.
+
+        Positional arguments:
+
+        - partition_counts -- `PartitionCounts` built over the dataset
+        - test_index -- index of the test partition
+        - k_values -- candidate laplace smoothing coefficients
+
+        Returns:
+
+        dict with keys:
+        - 'k' -- k value selected by cross-validation
+        - 'error' -- error rate on the test partition of a fit with `k`
+        """
+        partition_count = partition_counts.get_partition_count()
+        print(
+            f'BayesNet: Processing test partition {test_index + 1} of {partition_count}.')
+
+        k_validation_results = {k: 0 for k in k_values}
+
+        passed_test_partition = False  # for logging
+        for validation_index in range(partition_count):
+            if validation_index == test_index:
+                passed_test_partition = True
+                continue
+
+            validation_pass = \
+                validation_index + 1 - int(passed_test_partition)
+            print(
+                f'BayesNet:   Processing validation partition {validation_pass} of {partition_count - 1}.')
+
+            print(
+                f'BayesNet:     Fitting and testing model with {len(k_values)} k values.')
+            validation_errors = Bayes_Net.test_k_values(
+                partition_counts.get_counts_excluding(
+                    test_index, validation_index),
+                partition_counts.get_columns(validation_index),
+                k_values)
+
+            for k, error in zip(k_values, validation_errors):
+                accuracy = round((1 - error) * 100, 2)
+                print(
+                    f'BayesNet:     Accuracy with k={k} was {accuracy}%.')
+                # Incrementally adjust average
+                k_validation_results[k] += (error -
+                                            k_validation_results[k]) / validation_pass
+
+        best_k = None
+        best_error = 2
+        for k, avg_error in k_validation_results.items():
+            if avg_error < best_error:
+                best_k = k
+                best_error = avg_error
+
+        print(
+            f'BayesNet:   Refitting model with best k value from cross-validation (k={best_k}).')
+        # Using best k, refit to all data except test set and test it
+        error = Bayes_Net.test_k_values(
+            partition_counts.get_counts_excluding(test_index),
+            partition_counts.get_columns(test_index),
+            [best_k])[0]
+        accuracy = round((1 - error) * 100, 2)
+        print(
+            f'BayesNet:   Accuracy was {accuracy}%.')
+        return {'k': best_k, 'error': error}
+
+    @staticmethod
+    def test_k_values(counts: dict[str, np.ndarray], columns: dict[str, np.ndarray], k_values: list[int]) -> list[float]:
+        """Fit the model with every candidate k and test each fit in one
+        vectorized pass over the test data. The model itself is not
+        modified.
+
+        Positional arguments:
+
+        - counts -- count arrays of the training data (see
+                    `FrequencyCounter.tally()`)
+        - columns -- encoded columns of the test data (see `FeatureEncoder`)
+        - k_values -- candidate laplace smoothing coefficients
+
+        Returns:
+
+        Fraction of tests failed (error rate) for each value in `k_values`
+        """
+        return Bayes_Net.__error_rates(
+            ProbabilityTables.log_tensors(counts, k_values), columns)
+
+    @staticmethod
+    def leave_one_out_k_values(counts: dict[str, np.ndarray], columns: dict[str, np.ndarray], k_values: list[int]) -> list[float]:
+        """Compute the exact leave-one-out error of every candidate k: each
+        record is scored by a fit to all other records. Fits are derived
+        from `counts` by removing each record's own contribution, so nothing
+        is recounted. The model itself is not modified.
+
+        Positional arguments:
+
+        - counts -- count arrays of the full dataset (see
+                    `FrequencyCounter.tally()`)
+        - columns -- encoded columns of the full dataset (see
+                     `FeatureEncoder`)
+        - k_values -- candidate laplace smoothing coefficients
+
+        Returns:
+
+        Fraction of records misclassified (error rate) for each value in
+        `k_values`
+        """
+        status_dim = len(counts['status'])
+        true_status = columns['status']
+        data_len = len(true_status)
+        # Score the data in blocks to bound the size of the
+        # (k, record, status) tensors
+        block_len = max(
+            1, SCORE_BLOCK_SIZE // (len(k_values) * status_dim * len(FEATURES)))
+        num_fail = np.zeros(len(k_values), dtype=np.int64)
+        for start in range(0, data_len, block_len):
+            end = min(start + block_len, data_len)
+            log_p = ProbabilityTables.leave_one_out_log_tensors(
+                counts, {name: column[start:end]
+                         for name, column in columns.items()},
+                k_values)
+            # Summed in the same order as CompiledPredictor
+            scores = log_p['status']
+            for feature in ROUTE_FEATURES:
+                scores += log_p[feature]
+            variable_scores = np.zeros(scores.shape)
+            for feature in VARIABLE_FEATURES:
+                variable_scores += log_p[feature]
+            scores += variable_scores
+            # argmax() picks the first status on ties, as make_prediction()
+            # does
+            predicted_status = scores.argmax(axis=2)
+            num_fail += (predicted_status != true_status[start:end]).sum(axis=1)
+
+        return (num_fail / data_len).tolist()
+
+    def make_prediction(self, src_airport: int, dest_airport: int, operating_airline: str, day_of_week: int, departure_time: str, src_tmp: str, dst_tmp: str, src_wnd: str, dst_wnd: str, return_distribution: bool = False, top_k: int = None, return_buckets: bool = False, return_contributions: bool = False):
         """Predict flight outcome.
 
         Positional arguments:
@@ -327,11 +718,356 @@ class Bayes_Net(ai_model.AI_Model):
         - src_wnd -- bucket key of discretized wind speed at destination
                      airport
 
+        Keyword arguments:
+
+        - return_distribution -- if `True`, also return the probability of
+                                 every arrival status
+        - top_k -- if set, also return the `top_k` most likely arrival
+                   statuses
+        - return_buckets -- if `True`, also return the probability of each
+                            aggregated outcome (see
+                            `KeyMeta.get_status_buckets()`)
+        - return_contributions -- if `True`, also return the log-probability
+                                  contribution of each factor
+
+        All outputs are derived from one computation of the posterior.
+
         Returns:
 
         - Key of most likely arrival status
         - Probability of most likely arrival status
+        - (`return_distribution` only) dict of the probability of each
+          arrival status, in the order of `KeyMeta.get_status_keys()`
+        - (`top_k` only) list of `(status key, probability)` pairs, most
+          likely first
+        - (`return_buckets` only) dict of the probability of each aggregated
+          outcome, in the order of `KeyMeta.get_status_buckets()`
+        - (`return_contributions` only) dict keyed by factor (the prior,
+          then each feature; see `FACTORS`) of dicts holding the
+          log-probability of the factor given each arrival status. Summing a
+          status's contributions gives its unnormalized log-posterior.
+        """
+        predictor = self.__get_predictor()
+        # Keys in the order of FEATURES
+        keys = (str(day_of_week), str(operating_airline), str(src_airport), str(dest_airport),
+                str(departure_time), str(src_tmp), str(dst_tmp), str(src_wnd), str(dst_wnd))
+        need_distribution = return_distribution or top_k is not None or return_buckets
+        contributions = None
+        # Only valid keys are ever cached. Entries hold the distribution
+        # only if one was ever requested for them; contributions are never
+        # cached.
+        prediction = self.prediction_cache.get(keys)
+        if prediction is None or (need_distribution and len(prediction) == 2):
+            prediction = self.__predict_keys(
+                predictor, keys, need_distribution, return_contributions)
+            if return_contributions:
+                *prediction, contributions = prediction
+                prediction = tuple(prediction)
+            self.prediction_cache.put(keys, prediction)
+        elif return_contributions:
+            contributions = self.__predict_keys(
+                predictor, keys, False, True)[2]
+
+        result = prediction[:2]
+        if need_distribution:
+            distribution = prediction[2]
+            if return_distribution:
+                result += (dict(zip(predictor.get_status_keys(),
+                                    distribution.tolist())),)
+            if top_k is not None:
+                top_status, top_p = predictor.top_k(
+                    distribution[np.newaxis, :], top_k)
+                result += (list(zip(top_status[0].tolist(),
+                                    top_p[0].tolist())),)
+            if return_buckets:
+                result += (dict(zip(predictor.get_bucket_keys(),
+                                    predictor.aggregate_buckets(distribution).tolist())),)
+        if return_contributions:
+            result += ({
+                factor: dict(zip(predictor.get_status_keys(), row))
+                for factor, row in zip(FACTORS, contributions.tolist())
+            },)
+
+        return result
+
+    def make_predictions(self, flights, return_distribution: bool = False, top_k: int = None, return_buckets: bool = False, return_contributions: bool = False, skip_invalid: bool = False) -> tuple:
+        """Predict the outcomes of many flights at once.
+
+        Positional arguments:
+
+        - flights -- either a dict of equal-length columns or an iterable of
+                     records. Both are keyed by the data record keys of the
+                     model features (see `FEATURE_COLUMNS`):
+          - `ORIGIN_AIRPORT_ID` -- BTS ID of source airport
+          - `DEST_AIRPORT_ID` -- BTS ID of destination airport
+          - `OP_UNIQUE_CARRIER` -- code of airline operating flight
+          - `DAY_OF_WEEK` -- day of flight in range `(1: Monday - 7: Sunday)`
+          - `CRS_DEP_TIME` -- discretized departure time in `hhmm` format
+          - `src_tavg`, `dst_tavg` -- bucket keys of discretized temperature
+                                      at source and destination airports
+          - `src_wspd`, `dst_wspd` -- bucket keys of discretized wind speed
+                                      at source and destination airports
+
+        Keyword arguments:
+
+        - return_distribution -- if `True`, also return the probability of
+                                 every arrival status for each flight
+        - top_k -- if set, also return the `top_k` most likely arrival
+                   statuses of each flight
+        - return_buckets -- if `True`, also return the probability of each
+                            aggregated outcome (see
+                            `KeyMeta.get_status_buckets()`) for each flight
+        - return_contributions -- if `True`, also return the log-probability
+                                  contribution of each factor for each
+                                  flight
+        - skip_invalid -- if `True`, predict only the flights whose values
+                          all occurred in the training data rather than
+                          raising on the first unknown value (see
+                          `KeyMeta.validate_records()`)
+
+        All outputs are derived from one computation of the posteriors.
+
+        Returns:
+
+        - array of keys of the most likely arrival status of each flight
+        - array of probabilities of those statuses
+        - (`return_distribution` only) array of shape `(flight, status)`
+          holding the probability of each arrival status, with statuses in
+          the order of `KeyMeta.get_status_keys()`
+        - (`top_k` only) array of shape `(flight, top_k)` holding the keys of
+          the most likely statuses of each flight, most likely first
+        - (`top_k` only) array of shape `(flight, top_k)` holding their
+          probabilities
+        - (`return_buckets` only) array of shape `(flight, bucket)` holding
+          the probability of each aggregated outcome, in the order of
+          `KeyMeta.get_status_buckets()`
+        - (`return_contributions` only) `float32` array of shape
+          `(flight, factor, status)` holding the log-probability of each
+          factor (the prior, then each feature; see `FACTORS`) given each
+          arrival status
+        - (`skip_invalid` only) boolean array marking the flights that were
+          predicted. The outputs above hold one entry per predicted flight.
+        - (`skip_invalid` only) dict of the reason each other flight was
+          skipped, keyed by flight index
+
+        Raises `ValueError` if any flight holds a value that did not occur in
+        the training data, unless `skip_invalid` is set. Inputs are validated
+        once per batch.
+        """
+        if not self.p_tables.is_fit():
+            raise BufferError(
+                'BayesNet: ERR: Model is not trained. Train the model or load parameters first.')
+
+        if isinstance(flights, dict):
+            columns = {feature: flights[column_k]
+                       for feature, column_k in FEATURE_COLUMNS.items()}
+        else:
+            records = list(flights)
+            columns = {feature: [record[column_k] for record in records]
+                       for feature, column_k in FEATURE_COLUMNS.items()}
+
+        if skip_invalid:
+            valid, reasons = self.key_meta.validate_records({
+                column_k: columns[feature]
+                for feature, column_k in FEATURE_COLUMNS.items()})
+            if len(reasons) > 0:
+                columns = {feature: np.asarray(column, dtype=str)[valid]
+                           for feature, column in columns.items()}
+
+        predictor = self.__get_predictor()
+        need_distribution = return_distribution or top_k is not None or return_buckets
+        try:
+            prediction = predictor.predict_batch(
+                columns, need_distribution, return_contributions)
+        except KeyError as e:
+            feature, unknown = e.args[0]
+            raise ValueError(
+                f'BayesNet: {FEATURE_COLUMNS[feature]}={unknown} did not occur in the training data.')
+
+        result = prediction[:2]
+        if need_distribution:
+            distribution = prediction[2]
+            if return_distribution:
+                result += (distribution,)
+            if top_k is not None:
+                result += predictor.top_k(distribution, top_k)
+            if return_buckets:
+                result += (predictor.aggregate_buckets(distribution),)
+        if return_contributions:
+            result += (prediction[-1],)
+        if skip_invalid:
+            result += (valid, reasons)
+
+        return result
+
+    def __cross_validate_parallel(self, k_values: list[int], workers: int) -> list[dict]:
+        """Run `cross_validate_partition()` for every test partition in a
+        process pool. Workers memory-map the encoded dataset and its record
+        order from temporary files rather than receiving copies of them.
+
+        Returns:
+
+        Results of `cross_validate_partition()`, ordered by test partition
+        """
+        columns = self.partition_counts.get_columns()
+        column_names = list(columns.keys())
+        partition_count = self.partition_counts.get_partition_count()
+        partition_starts = [self.partition_counts.get_bounds(i)[0]
+                            for i in range(partition_count)]
+        order = self.partition_counts.get_order()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            columns_path = (Path(tmp_dir) / 'columns.npy').as_posix()
+            np.save(columns_path, np.stack(
+                [columns[name] for name in column_names]))
+            order_path = None
+            if order is not None:
+                order_path = (Path(tmp_dir) / 'order.npy').as_posix()
+                np.save(order_path, order)
+            with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_cross_validation_worker,
+                    initargs=(columns_path, column_names, partition_starts, self.__get_encoder(), order_path)) as pool:
+                return list(pool.map(
+                    _cross_validate_in_worker,
+                    range(partition_count),
+                    [k_values] * partition_count
+                ))
+
+    def __merge_flight_data(self, flight_path: str) -> tuple[list, set, set]:
+        """Merge the flight data in `flight_path` with the program's internal
+        historical weather database.
+
+        Returns:
+
+        - merged_data -- list of merged records. Data are NOT discretized.
+        - seen_carriers -- set of airline codes present in `merged_data`
+        - seen_airports -- set of airport bts_id values present in
+                           `merged_data`
+        """
+        # Get merged and pruned flight and weather data
+        print('BayesNet: Merging training datasets.')
+        drop_counts = {}
+        data, seen_carriers, seen_src, seen_dst = datautil.merge_training_data(
+            flight_path, self.__get_weather_path().as_posix(), drop_counts)
+        Bayes_Net.__report_drops(len(data), drop_counts)
+        # If flight_path points to a file not containing flight data,
+        # merge_training_data() will fail to extract any data records, but it
+        # will not raise an exception.
+        if len(data) == 0:
+            raise BufferError(
+                'BayesNet: ERR: Loaded training dataset is empty or malformed.')
+        # Get combined set of src and dst airports
+        seen_airports = seen_src.copy()
+        for dst in seen_dst:
+            seen_airports.add(dst)
+
+        return data, seen_carriers, seen_airports
+
+    def __load_chunks_in_parallel(self, flight_paths: list[str], weather_path: str, workers: int, drop_counts: dict) -> list[StreamEncoder]:
+        """Read, merge, discretize, and encode the flight data in
+        `flight_paths` in chunks across `workers` processes. Pruned flights
+        are added to `drop_counts`.
+
+        Weather JSON is parsed once here and written to a temporary weather
+        store that the workers memory-map, rather than parsed by every
+        worker.
+
+        Returns:
+
+        one `StreamEncoder` per chunk, in file order
         """
+        chunks = [(path, byte_range) for path in flight_paths
+                  for byte_range in datautil.get_csv_chunks(path, LOAD_CHUNK_BYTES)]
+        if len(chunks) == 0:
+            return []
+
+        weather = weatherstore.open_weather_store(weather_path)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if not isinstance(weather.get_values(), np.memmap):
+                # Not a store file
+                weather_path = (Path(tmp_dir) / 'weather.bin').as_posix()
+                weatherstore.write_weather_store(weather, weather_path)
+            del weather
+
+            with ProcessPoolExecutor(
+                    max_workers=min(workers, len(chunks)),
+                    initializer=_init_load_worker,
+                    initargs=(weather_path, StreamEncoder(self.key_meta))) as pool:
+                results = list(pool.map(_load_chunk_in_worker, *zip(*chunks)))
+
+        for _, chunk_drop_counts in results:
+            for reason, count in chunk_drop_counts.items():
+                drop_counts[reason] = drop_counts.get(reason, 0) + count
+        return [stream_encoder for stream_encoder, _ in results]
+
+    def __get_dataset_cache_key(self, flight_paths: list[str], weather_path: str) -> str:
+        """Get the `DatasetCache` key of the encoded dataset loaded from
+        `flight_paths` and the weather at `weather_path`.
+
+        The key covers every input of the dataset: the size and modification
+        time of each flight data file (see `datautil.get_file_fingerprint()`),
+        the weather version (see `weatherstore.get_weather_version()`), the
+        discretization maps, the known airports, and the fixed
+        vocabularies of `key_meta`. Flight files are not hashed, as reading
+        them would cost much of a load.
+        """
+        return DatasetCache.make_key({
+            'flights': [datautil.get_file_fingerprint(path) for path in flight_paths],
+            'weather': weatherstore.get_weather_version(weather_path),
+            'bucket_maps': datautil.load_bucket_maps(),
+            'known_airports': sorted(datautil.load_known_airports()),
+            'status_keys': list(self.key_meta.get_status_keys()),
+            'dep_times': list(self.key_meta.get_dep_times()),
+            'temp_keys': list(self.key_meta.get_temp_keys()),
+            'wind_keys': list(self.key_meta.get_wind_keys())
+        })
+
+    @staticmethod
+    def __report_drops(merged_len: int, drop_counts: dict):
+        """Print the number of flights merged and pruned for each reason (see
+        `datautil.DROP_REASONS`)."""
+        dropped = ', '.join(f'{drop_counts.get(reason, 0)} {reason}'
+                            for reason in datautil.DROP_REASONS)
+        print(f'BayesNet: Merged {merged_len} flights; dropped {dropped}.')
+
+    def __get_weather_path(self) -> Path:
+        """Get the path of the historical weather database, preferring the
+        weather store to the JSON."""
+        if WEATHER_STORE_PATH.exists():
+            return WEATHER_STORE_PATH
+
+        print(
+            'BayesNet: Weather store not found; reading weather JSON. Run the build-weather command to speed this up.')
+        return WEATHER_JSON_PATH
+
+    def __get_encoder(self) -> FeatureEncoder:
+        """Get the encoder for the current keys, building it if needed."""
+        if self.encoder is None:
+            self.encoder = FeatureEncoder(self.key_meta)
+        return self.encoder
+
+    def __get_predictor(self) -> CompiledPredictor:
+        """Get the compiled predictor for the current tables, compiling it
+        if it is missing or stale. Cached predictions of a stale predictor
+        are discarded."""
+        encoder = self.__get_encoder()
+        if self.predictor is None \
+                or self.predictor.get_revision() != self.p_tables.get_revision() \
+                or self.predictor.get_encoder() is not encoder:
+            self.prediction_cache.clear()
+            self.predictor = CompiledPredictor(self.p_tables, encoder)
+        return self.predictor
+
+    def __predict_keys(self, predictor: CompiledPredictor, keys: tuple, return_distribution: bool, return_contributions: bool = False) -> tuple:
+        """Predict `keys` (in the order of `FEATURES`) with `predictor`.
+        Unknown keys are found by the predictor's own row lookups; the
+        vocabularies are only consulted to explain a failure."""
+        try:
+            return predictor.predict(keys, return_distribution, return_contributions)
+        except KeyError:
+            pass
+
+        _, operating_airline, src_airport, dest_airport = keys[:4]
         if not self.key_meta.in_seen_airports(str(src_airport)):
             raise ValueError(
                 f'BayesNet: src_airport={src_airport} did not occur in the training data.')
@@ -342,38 +1078,99 @@ class Bayes_Net(ai_model.AI_Model):
             raise ValueError(
                 f'BayesNet: operating_airline={operating_airline} did not occur in the training data.')
 
-        src_airport = str(src_airport)
-        dest_airport = str(dest_airport)
-        day_of_week = str(day_of_week)
-
-        predicted_p = dict.fromkeys(self.key_meta.get_status_keys())
-        for key in predicted_p.keys():
-            factors = [
-                self.p_tables.query_p_status(key),
-                self.p_tables.query_p_airline(operating_airline, key),
-                self.p_tables.query_p_day(day_of_week, key),
-                self.p_tables.query_p_dep_time(departure_time, key),
-                self.p_tables.query_p_src(src_airport, key),
-                self.p_tables.query_p_dst(dest_airport, key),
-                self.p_tables.query_p_src_tmp(src_tmp, key),
-                self.p_tables.query_p_dst_tmp(dst_tmp, key),
-                self.p_tables.query_p_src_wnd(src_wnd, key),
-                self.p_tables.query_p_dst_wnd(dst_wnd, key)
-            ]
-            predicted_p[key] = math.prod(factors)
-
-        sum_intermediates = sum(predicted_p.values())
-        best_key = None
-        best_p = -1
-        for k, p in predicted_p.items():
-            if sum_intermediates == 0:
-                predicted_p[k] = 0
+        # Departure time or weather bucket
+        _, reasons = self.key_meta.validate_records({
+            column_k: [key] for column_k, key in zip(FEATURE_COLUMNS.values(), keys)})
+        raise ValueError(f'BayesNet: {reasons.get(0, "Unknown key.")}')
 
-            else:
-                predicted_p[k] = p / sum_intermediates
+    @staticmethod
+    def __error_rates(log_p: dict[str, np.ndarray], columns: dict[str, np.ndarray]) -> list[float]:
+        """Score encoded test data against one or more fits.
+
+        Positional arguments:
+
+        - log_p -- log-probability tensors of the format returned by
+                   `ProbabilityTables.log_tensors()`, one fit per index of
+                   the leading axis
+        - columns -- encoded columns of the test data (see `FeatureEncoder`)
+
+        Returns:
+
+        Fraction of tests failed (error rate) for each fit
+        """
+        fit_count, status_dim = log_p['status'].shape
+        true_status = columns['status']
+        test_len = len(true_status)
+        # Score the test data in blocks to bound the size of the
+        # (fit, record, status) score tensor
+        block_len = max(1, SCORE_BLOCK_SIZE // (fit_count * status_dim))
+        num_fail = np.zeros(fit_count, dtype=np.int64)
+        for start in range(0, test_len, block_len):
+            end = min(start + block_len, test_len)
+            # Summed in the same order as CompiledPredictor
+            scores = np.repeat(log_p['status'][:, np.newaxis, :],
+                               end - start, axis=1)
+            for feature in ROUTE_FEATURES:
+                scores += log_p[feature][:, columns[feature][start:end], :]
+            variable_scores = np.zeros(scores.shape)
+            for feature in VARIABLE_FEATURES:
+                variable_scores += log_p[feature][:, columns[feature][start:end], :]
+            scores += variable_scores
+            # argmax() picks the first status on ties, as make_prediction()
+            # does
+            predicted_status = scores.argmax(axis=2)
+            num_fail += (predicted_status != true_status[start:end]).sum(axis=1)
+
+        return (num_fail / test_len).tolist()
+
+
+# Process pool state for Bayes_Net.train_model(workers > 1)
+_worker_partition_counts: PartitionCounts = None
+
+# Process pool state for Bayes_Net.load_data(workers > 1)
+_worker_weather: weatherstore.WeatherStore = None
+_worker_stream_encoder: StreamEncoder = None
+
+
+def _init_load_worker(weather_path: str, stream_encoder: StreamEncoder):
+    """Memory-map the weather store at `weather_path` once for every chunk
+    the worker loads. Each chunk is encoded by a copy of the empty `stream_encoder`."""
+    global _worker_weather, _worker_stream_encoder
+    _worker_weather = weatherstore.open_weather_store(weather_path)
+    _worker_stream_encoder = stream_encoder
+
+
+def _load_chunk_in_worker(flight_path: str, byte_range: tuple[int, int]) -> tuple[StreamEncoder, dict]:
+    """Read, merge, discretize, and encode the rows of `flight_path` in
+    `byte_range`.
+
+    Returns:
+
+    - `StreamEncoder` holding the encoded chunk
+    - number of flights pruned for each reason
+    """
+    stream_encoder = copy.deepcopy(_worker_stream_encoder)
+    drop_counts = {}
+    stream_encoder.encode(datautil.discretize_records(datautil.stream_merged_flights(
+        flight_path, _worker_weather, drop_counts, byte_range)))
+    return stream_encoder, drop_counts
+
+
+def _init_cross_validation_worker(columns_path: str, column_names: list[str], partition_starts: list[int], encoder: FeatureEncoder, order_path: str = None):
+    """Memory-map the encoded dataset saved at `columns_path` (and its
+    record order saved at `order_path`, if any) and count its partitions."""
+    global _worker_partition_counts
+    stacked = np.load(columns_path, mmap_mode='r')
+    order = None
+    if order_path is not None:
+        order = np.load(order_path, mmap_mode='r')
+    _worker_partition_counts = PartitionCounts()
+    _worker_partition_counts.build_from_columns(
+        {name: stacked[i] for i, name in enumerate(column_names)},
+        partition_starts, encoder, order)
 
-            if predicted_p[k] > best_p:
-                best_key = k
-                best_p = predicted_p[k]
 
-        return best_key, best_p
+def _cross_validate_in_worker(test_index: int, k_values: list[int]) -> dict:
+    """Run `Bayes_Net.cross_validate_partition()` on the worker's dataset."""
+    return Bayes_Net.cross_validate_partition(
+        _worker_partition_counts, test_index, k_values)
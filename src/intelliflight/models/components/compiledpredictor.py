@@ -0,0 +1,350 @@
+import numpy as np
+from collections import OrderedDict
+from typing import Final
+from intelliflight.models.components.encoder import FeatureEncoder, FEATURES
+from intelliflight.models.components.keymeta import KeyMeta, STATUS_BUCKETS
+from intelliflight.models.components.ptables import ProbabilityTables
+
+
+# Features shared by every departure of a route, and the remaining features.
+# Scores are summed as (prior + route features) + (variable features), each
+# part in the order below, so that every scoring path gives identical sums.
+ROUTE_FEATURES: Final = ('airline', 'src', 'dst')
+VARIABLE_FEATURES: Final = tuple(
+    feature for feature in FEATURES if feature not in ROUTE_FEATURES)
+
+# Factors of a prediction, in the order of matrix rows and contributions
+FACTORS: Final = ('prior',) + FEATURES
+
+# Default maximum number of routes in the route memo
+ROUTE_MEMO_SIZE: Final = 2 ** 16
+
+
+class CompiledPredictor:
+    """Stores the following for fast predictions:
+
+    - One dense log-probability matrix of shape `(row, status)`, holding the
+      log prior in row 0 followed by the rows of each feature's
+      `(feature value, status)` log-probability matrix (see
+      `ProbabilityTables.get_log_arrays()`)
+    - Maps of feature keys to matrix rows
+    - Revision of the `ProbabilityTables` it was compiled from
+    - Map of arrival statuses to their buckets (see
+      `KeyMeta.get_status_buckets()`)
+    - Bounded least-recently-used memo of the summed prior and route
+      factors (see `ROUTE_FEATURES`) of `(airline, src, dst)` routes
+      predicted so far
+
+    A prediction is one row lookup per feature and a sum of log vectors.
+    Route factors are looked up and summed once per memoized route.
+    Summing logs rather than multiplying probabilities avoids underflow.
+    Keys are matched by their string form, so `10135` and `'10135'` are the
+    same airport.
+
+    The predictor is a snapshot; it does not follow later changes to the
+    tables. Compare `get_revision()` with
+    `ProbabilityTables.get_revision()` to detect staleness.
+    """
+
+    def __init__(self, p_tables: ProbabilityTables, encoder: FeatureEncoder, route_memo_size: int = ROUTE_MEMO_SIZE):
+        """Compile `p_tables` using the vocabularies of `encoder`.
+
+        Keyword arguments:
+
+        - route_memo_size -- maximum number of routes in the route memo.
+                             When full, memoizing a new route evicts the
+                             least recently used one. 0 disables the memo.
+        """
+        if route_memo_size < 0:
+            raise ValueError(
+                f'CompiledPredictor: ERR: route_memo_size={route_memo_size} must be at least 0.')
+
+        log_p = p_tables.get_log_arrays(encoder)
+        if log_p is None:
+            raise BufferError(
+                'CompiledPredictor: ERR: Tables are not fit. Fit or import tables first.')
+
+        self.__encoder = encoder
+        self.__revision = p_tables.get_revision()
+        self.__status_keys = encoder.get_keys('status')
+        # One-hot (status, bucket) matrix; distribution @ matrix sums each
+        # bucket's statuses
+        self.__bucket_matrix = np.zeros(
+            (len(self.__status_keys), len(STATUS_BUCKETS)))
+        for i, status_k in enumerate(self.__status_keys):
+            self.__bucket_matrix[i, STATUS_BUCKETS.index(
+                KeyMeta.get_status_bucket(status_k))] = 1
+        self.__matrix = np.concatenate(
+            [log_p['status'][np.newaxis, :]]
+            + [log_p[feature] for feature in FEATURES])
+        # Compact copy for per-flight contributions
+        self.__matrix32 = self.__matrix.astype(np.float32)
+        # First matrix row of each feature
+        self.__offsets: dict[str, int] = {}
+        self.__rows: dict[str, dict[str, int]] = {}
+        offset = 1
+        for feature in FEATURES:
+            self.__offsets[feature] = offset
+            self.__rows[feature] = {
+                str(key): offset + code
+                for code, key in enumerate(encoder.get_keys(feature))
+            }
+            offset += encoder.get_dimension(feature)
+        # Positions of route and variable features in a key tuple
+        self.__route_positions = [FEATURES.index(feature)
+                                  for feature in ROUTE_FEATURES]
+        self.__variable_positions = [FEATURES.index(feature)
+                                     for feature in VARIABLE_FEATURES]
+
+        # Summed prior and route rows, keyed by the matrix rows of the route
+        self.__route_memo: OrderedDict = OrderedDict()
+        self.__route_memo_size: int = route_memo_size
+        self.__route_hits: int = 0
+        self.__route_misses: int = 0
+
+    def get_encoder(self) -> FeatureEncoder:
+        """Get the encoder whose vocabularies index the matrices."""
+        return self.__encoder
+
+    def get_revision(self) -> int:
+        """Get the revision of the tables this predictor was compiled from."""
+        return self.__revision
+
+    def get_status_keys(self) -> list[str]:
+        """Get arrival status keys in the column order of the matrices."""
+        return self.__status_keys.copy()
+
+    def get_bucket_keys(self) -> list[str]:
+        """Get arrival status bucket keys in the column order of
+        `aggregate_buckets()`."""
+        return list(STATUS_BUCKETS)
+
+    def get_route_memo_len(self) -> int:
+        """Get the number of routes in the route memo."""
+        return len(self.__route_memo)
+
+    def get_route_memo_size(self) -> int:
+        """Get the maximum number of routes in the route memo."""
+        return self.__route_memo_size
+
+    def clear_route_memo(self):
+        """Remove all routes from the route memo and reset its hit and miss
+        counters."""
+        self.__route_memo.clear()
+        self.__route_hits = 0
+        self.__route_misses = 0
+
+    def get_route_memo_hits(self) -> int:
+        """Get the number of route lookups that found a memoized route."""
+        return self.__route_hits
+
+    def get_route_memo_misses(self) -> int:
+        """Get the number of route lookups that found no memoized route."""
+        return self.__route_misses
+
+    def get_route_memo_hit_rate(self) -> float:
+        """Get the fraction of route lookups that found a memoized route.
+        0 if there were no lookups."""
+        lookups = self.__route_hits + self.__route_misses
+        if lookups == 0:
+            return 0.0
+
+        return self.__route_hits / lookups
+
+    def predict(self, keys: tuple, return_distribution: bool = False, return_contributions: bool = False) -> tuple:
+        """Predict the outcome of one flight.
+
+        Positional arguments:
+
+        - keys -- tuple holding the key of each feature, in the order of
+                  `FEATURES`
+
+        Keyword arguments:
+
+        - return_distribution -- if `True`, also return the probability of
+                                 every arrival status
+        - return_contributions -- if `True`, also return the log-probability
+                                  contribution of every factor
+
+        Returns:
+
+        - Key of most likely arrival status
+        - Probability of most likely arrival status
+        - (`return_distribution` only) array holding the probability of each
+          arrival status, with statuses in the order of `get_status_keys()`
+        - (`return_contributions` only) array of shape `(factor, status)`
+          holding the log-probability of each factor (see `FACTORS`) given
+          each arrival status. Each status's score is the sum of its column.
+
+        Raises `KeyError` if a key is unknown.
+        """
+        route_rows = tuple(
+            self.__rows[feature][str(keys[position])]
+            for feature, position in zip(ROUTE_FEATURES, self.__route_positions))
+        variable_rows = [
+            self.__rows[feature][str(keys[position])]
+            for feature, position in zip(VARIABLE_FEATURES, self.__variable_positions)]
+        # Rows are summed in order, as in predict_batch()
+        scores = self.__get_route_scores(route_rows) \
+            + self.__matrix[variable_rows].sum(axis=0)
+
+        # argmax() picks the first status on ties
+        best_index = int(scores.argmax())
+        best_score = scores[best_index]
+        if return_distribution:
+            distribution = CompiledPredictor.normalize(scores[np.newaxis, :])[0]
+            prediction = (self.__status_keys[best_index],
+                          float(distribution[best_index]), distribution)
+        elif best_score == -np.inf:
+            # Every status is impossible
+            prediction = (self.__status_keys[best_index], 0.0)
+        else:
+            prediction = (self.__status_keys[best_index],
+                          float(1 / np.exp(scores - best_score).sum()))
+
+        if return_contributions:
+            # Rows in the order of FACTORS
+            rows = [0] + [self.__rows[feature][str(key)]
+                          for feature, key in zip(FEATURES, keys)]
+            prediction += (self.__matrix[rows],)
+
+        return prediction
+
+    def predict_batch(self, columns: dict, return_distribution: bool = False, return_contributions: bool = False) -> tuple:
+        """Predict the outcomes of many flights at once.
+
+        Positional arguments:
+
+        - columns -- dict holding an equal-length sequence of keys for each
+                     feature in `FEATURES`
+
+        Keyword arguments:
+
+        - return_distribution -- if `True`, also return the probability of
+                                 every arrival status for each flight
+        - return_contributions -- if `True`, also return the log-probability
+                                  contribution of every factor for each
+                                  flight
+
+        Returns:
+
+        - array of keys of the most likely arrival status of each flight
+        - array of probabilities of those statuses
+        - (`return_distribution` only) array of shape `(flight, status)`
+          holding the probability of each arrival status, with statuses in
+          the order of `get_status_keys()`
+        - (`return_contributions` only) `float32` array of shape
+          `(flight, factor, status)` holding the log-probability of each
+          factor (see `FACTORS`) given each arrival status
+
+        Raises `KeyError` holding `(feature, unknown keys)` if a column holds
+        unknown keys. Each column is validated once.
+        """
+        rows = {}
+        for feature in FEATURES:
+            try:
+                rows[feature] = self.__offsets[feature] + self.__encoder.encode_column(
+                    feature, columns[feature]).astype(np.intp)
+            except KeyError as e:
+                raise KeyError((feature, e.args[0]))
+
+        # Sum the route factors once per distinct route
+        routes, route_index = np.unique(
+            np.stack([rows[feature] for feature in ROUTE_FEATURES], axis=1),
+            axis=0, return_inverse=True)
+        route_scores = np.array(
+            [self.__get_route_scores(tuple(route)) for route in routes.tolist()]
+        ).reshape(len(routes), len(self.__status_keys))
+
+        variable_scores = np.zeros(
+            (len(route_index), len(self.__status_keys)))
+        for feature in VARIABLE_FEATURES:
+            variable_scores += self.__matrix[rows[feature]]
+        scores = route_scores[route_index.reshape(-1)] + variable_scores
+
+        # argmax() picks the first status on ties
+        best_index = scores.argmax(axis=1)
+        distribution = CompiledPredictor.normalize(scores)
+        best_status = np.array(self.__status_keys)[best_index]
+        best_p = distribution[np.arange(len(best_index)), best_index]
+        prediction = (best_status, best_p)
+        if return_distribution:
+            prediction += (distribution,)
+        if return_contributions:
+            # Gather the rows already looked up, in the order of FACTORS
+            factor_rows = np.stack(
+                [np.zeros(len(best_index), dtype=np.intp)]
+                + [rows[feature] for feature in FEATURES], axis=1)
+            prediction += (self.__matrix32[factor_rows],)
+
+        return prediction
+
+    def __get_route_scores(self, route_rows: tuple) -> np.ndarray:
+        """Get the summed prior and route rows for the matrix rows of a
+        route, memoizing them."""
+        route_scores = self.__route_memo.get(route_rows)
+        if route_scores is None:
+            self.__route_misses += 1
+            route_scores = self.__matrix[[0, *route_rows]].sum(axis=0)
+            if self.__route_memo_size > 0:
+                self.__route_memo[route_rows] = route_scores
+                if len(self.__route_memo) > self.__route_memo_size:
+                    self.__route_memo.popitem(last=False)
+        else:
+            self.__route_hits += 1
+            self.__route_memo.move_to_end(route_rows)
+
+        return route_scores
+
+    def top_k(self, distribution: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Get the `k` most likely arrival statuses of each flight, most
+        likely first. Ties are broken in the order of `get_status_keys()`,
+        as in `predict()`.
+
+        Positional arguments:
+
+        - distribution -- array of shape `(flight, status)` as returned by
+                          `predict_batch()`
+        - k -- number of statuses; capped at the number of statuses
+
+        Returns:
+
+        - array of shape `(flight, k)` holding status keys
+        - array of shape `(flight, k)` holding their probabilities
+        """
+        if k < 1:
+            raise ValueError(
+                f'CompiledPredictor: ERR: k={k} must be at least 1.')
+
+        # A stable sort of negated probabilities keeps tied statuses in order
+        indices = np.argsort(-distribution, axis=1, kind='stable')[:, :k]
+        return np.array(self.__status_keys)[indices], \
+            np.take_along_axis(distribution, indices, axis=1)
+
+    def aggregate_buckets(self, distribution: np.ndarray) -> np.ndarray:
+        """Sum the probabilities of the arrival statuses in each bucket (see
+        `get_bucket_keys()`).
+
+        Positional arguments:
+
+        - distribution -- array of shape `(flight, status)` as returned by
+                          `predict_batch()`
+
+        Returns:
+
+        array of shape `(flight, bucket)`
+        """
+        return distribution @ self.__bucket_matrix
+
+    @staticmethod
+    def normalize(scores: np.ndarray) -> np.ndarray:
+        """Convert unnormalized log-probability scores of shape
+        `(flight, status)` into probabilities that sum to 1 per flight.
+        Flights for which every status is impossible get all-zero rows."""
+        max_scores = scores.max(axis=1, keepdims=True)
+        possible = np.isfinite(max_scores)
+        # Shift by the maximum so that the largest term is exp(0) = 1
+        exp_scores = np.exp(scores - np.where(possible, max_scores, 0))
+        return np.divide(
+            exp_scores, exp_scores.sum(axis=1, keepdims=True),
+            out=np.zeros(scores.shape), where=possible)
@@ -1,15 +1,33 @@
+import numpy as np
+from intelliflight.models.components.encoder import FeatureEncoder
+
+
 class Dataset:
     """Stores the following:
 
-    - A list of data
+    - A list of data, or integer-encoded data columns (columnar mode)
+    - Vocabularies of the encoded columns, as a `FeatureEncoder` (columnar
+      mode only)
     - Length of stored dataset
+    - Order in which the records are viewed, as a permutation of record
+      indices (identity if unset)
     - Bounds of test partition (start inclusive, end exclusive)
     - Bounds of validation partition (start inclusive, end exclusive)
+
+    In columnar mode, only the arrival status and model features of each
+    record are kept (see `FeatureEncoder`).
+
+    Partition bounds are positions in the record order, not record indices.
+    Use `get_indices()` to map positions to records. Setting an order never
+    moves the underlying data.
     """
 
     def __init__(self):
         self.__data: list = None
+        self.__columns: dict[str, np.ndarray] = None
+        self.__encoder: FeatureEncoder = None
         self.__datalen: int = None
+        self.__order: np.ndarray = None
         self.__test_start: int = None
         self.__test_end: int = None
         self.__validation_start = None
@@ -21,8 +39,48 @@ class Dataset:
         if not self.data_loaded():
             raise ValueError('Dataset: ERR: Data is None.')
 
+        if self.is_columnar():
+            raise TypeError(
+                'Dataset: ERR: Data is columnar. Use get_columns().')
+
         return self.__data
 
+    def get_columns(self) -> dict[str, np.ndarray]:
+        """Get encoded data columns. These are NOT copies."""
+        if not self.data_loaded():
+            raise ValueError('Dataset: ERR: Data is None.')
+
+        if not self.is_columnar():
+            raise TypeError(
+                'Dataset: ERR: Data is not columnar. Use get_data().')
+
+        return self.__columns
+
+    def get_encoder(self) -> FeatureEncoder:
+        """Get the encoder holding the vocabularies of the data columns.
+        `None` if data is not columnar."""
+        return self.__encoder
+
+    def get_order(self) -> np.ndarray:
+        """Get the record order set by `set_order()`. `None` if records are
+        viewed in storage order."""
+        return self.__order
+
+    def get_indices(self, start: int = 0, end: int = None) -> np.ndarray:
+        """Get the indices of the records at positions `start` (inclusive)
+        to `end` (exclusive) of the record order. If `end` is `None`, the
+        positions run to the end of the dataset. If an order is set, this is
+        a view of it rather than a copy."""
+        if not self.data_loaded():
+            raise ValueError('Dataset: ERR: Data is None.')
+
+        if end is None:
+            end = self.__datalen
+        if self.__order is None:
+            return np.arange(start, end)
+
+        return self.__order[start:end]
+
     def get_len(self) -> int:
         """Get length of full dataset."""
         if not self.data_loaded():
@@ -66,7 +124,49 @@ class Dataset:
         """Set data. For performance, the data is NOT copied; changes to the
         passed list will affect this object's internal list."""
         self.__data = data
+        self.__columns = None
+        self.__encoder = None
         self.__datalen = len(data)
+        self.__order = None
+
+    def set_columns(self, columns: dict[str, np.ndarray], encoder: FeatureEncoder):
+        """Set encoded data columns, switching to columnar mode. For
+        performance, the columns are NOT copied.
+
+        Positional arguments:
+
+        - columns -- columns of the format returned by
+                     `FeatureEncoder.encode_records()`
+        - encoder -- `FeatureEncoder` with which `columns` were encoded
+        """
+        self.__data = None
+        self.__columns = columns
+        self.__encoder = encoder
+        self.__datalen = len(columns['status'])
+        self.__order = None
+
+    def set_order(self, order: np.ndarray):
+        """Set the order in which records are viewed. Partition bounds set
+        afterward refer to positions in this order. The data itself is
+        untouched.
+
+        Positional arguments:
+
+        - order -- permutation of the record indices `0..get_len() - 1`, as
+                   returned by `datautil.permute_and_partition()`
+        """
+        if not self.data_loaded():
+            raise ValueError('Dataset: ERR: Data is None.')
+
+        if len(order) != self.__datalen:
+            raise ValueError('Dataset: ERR: order has length {} but dataset has length {}'.format(
+                len(order), self.__datalen))
+
+        self.__order = np.asarray(order, dtype=np.intp)
+
+    def clear_order(self):
+        """View records in storage order."""
+        self.__order = None
 
     def set_test_bounds(self, test_start: int, test_end: int):
         """Set test partition bounds. Start is inclusive; end is exclusive."""
@@ -121,4 +221,8 @@ class Dataset:
 
     def data_loaded(self) -> bool:
         """Test whether data is loaded in."""
-        return not self.__data is None
+        return not (self.__data is None and self.__columns is None)
+
+    def is_columnar(self) -> bool:
+        """Test whether data is stored as encoded columns."""
+        return self.__columns is not None
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from pathlib import Path
+from typing import Final, Optional
+
+
+# Version of the cache entry layout. Entries of other versions are ignored.
+DATASET_CACHE_VERSION: Final = 1
+
+
+class DatasetCache:
+    """On-disk cache of encoded datasets (see `Dataset.set_columns()`).
+    Stores the following:
+
+    - Directory holding one entry per key
+    - Number of lookups that hit and missed
+
+    Each entry is a directory named after its key holding one `.npy` file
+    per column and a `meta.json` file of metadata (e.g., seen airports).
+    Columns are memory-mapped when loaded, so a hit costs milliseconds
+    regardless of dataset size.
+
+    Keys are hashes of everything the dataset is derived from (see
+    `make_key()`), so entries never go stale; changed inputs simply produce
+    a new key. Entries can be deleted at any time.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.__cache_dir: Path = Path(cache_dir)
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+    def get_cache_dir(self) -> Path:
+        """Get the directory holding the entries."""
+        return self.__cache_dir
+
+    def get_hits(self) -> int:
+        """Get the number of lookups that found an entry."""
+        return self.__hits
+
+    def get_misses(self) -> int:
+        """Get the number of lookups that found no entry."""
+        return self.__misses
+
+    @staticmethod
+    def make_key(inputs: dict) -> str:
+        """Hash the inputs a dataset is derived from into a key.
+
+        Positional arguments:
+
+        - inputs -- JSON-serializable dict describing the inputs, e.g.,
+                    fingerprints of data files and versions of lookup
+                    tables. Equal inputs give equal keys.
+        """
+        return hashlib.sha256(json.dumps(
+            {'version': DATASET_CACHE_VERSION, 'inputs': inputs},
+            sort_keys=True).encode('utf-8')).hexdigest()
+
+    def load(self, key: str) -> Optional[tuple[dict[str, np.ndarray], dict]]:
+        """Load the entry stored under `key`. Counts a hit or a miss.
+
+        Returns:
+
+        `(columns, meta)` as passed to `save()`, the columns being
+        read-only memory maps, or `None` if there is no complete entry
+        """
+        entry_dir = self.__cache_dir / key
+        try:
+            with (entry_dir / 'meta.json').open(encoding='utf-8') as m_in:
+                meta = json.load(m_in)
+            columns = {name: np.load(entry_dir / f'{name}.npy', mmap_mode='r')
+                       for name in meta['columns']}
+
+        except (OSError, ValueError, KeyError):
+            # Missing, partial, or malformed entry
+            self.__misses += 1
+            return None
+
+        self.__hits += 1
+        return columns, meta['meta']
+
+    def save(self, key: str, columns: dict[str, np.ndarray], meta: dict):
+        """Store `columns` and JSON-serializable `meta` under `key`,
+        replacing any entry already there. The entry is written to a
+        temporary directory first so that readers never see a partial
+        entry."""
+        self.__cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.__cache_dir, prefix='.tmp-'))
+        try:
+            for name, column in columns.items():
+                np.save(tmp_dir / f'{name}.npy', column)
+            with (tmp_dir / 'meta.json').open('w', encoding='utf-8') as m_out:
+                json.dump({'columns': list(columns), 'meta': meta}, m_out)
+
+            entry_dir = self.__cache_dir / key
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
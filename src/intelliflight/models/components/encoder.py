@@ -0,0 +1,273 @@
+import numpy as np
+from array import array
+from collections.abc import Iterable
+from types import MappingProxyType
+from typing import Final
+from intelliflight.models.components.keymeta import KeyMeta, RECORD_VOCABULARIES
+
+
+# Model features and the record keys from which they are read. Order matches
+# the tables of FrequencyCounter and ProbabilityTables.
+FEATURE_COLUMNS: Final = {
+    'day': 'DAY_OF_WEEK',
+    'airline': 'OP_UNIQUE_CARRIER',
+    'src': 'ORIGIN_AIRPORT_ID',
+    'dst': 'DEST_AIRPORT_ID',
+    'dep_time': 'CRS_DEP_TIME',
+    'src_tmp': 'src_tavg',
+    'dst_tmp': 'dst_tavg',
+    'src_wnd': 'src_wspd',
+    'dst_wnd': 'dst_wspd'
+}
+
+FEATURES: Final = tuple(FEATURE_COLUMNS.keys())
+
+# Vocabulary (see KeyMeta.get_vocabulary()) of each feature
+FEATURE_VOCABULARIES: Final = {
+    feature: RECORD_VOCABULARIES[column_k]
+    for feature, column_k in FEATURE_COLUMNS.items()
+}
+
+# Features whose vocabularies StreamEncoder builds from the data, and the
+# vocabulary each draws from
+STREAMED_FEATURES: Final = {
+    feature: FEATURE_VOCABULARIES[feature]
+    for feature in ('airline', 'src', 'dst')
+}
+
+
+def get_status_key(record: dict) -> str:
+    """Get the arrival status key (e.g., `'delay:1'`) of a data record."""
+    if record['CANCELLED'] == '1.00':
+        return f'cancel:{record["CANCELLATION_CODE"]}'
+    elif record['DIVERTED'] == '1.00':
+        return 'divert'
+    else:
+        return f'delay:{record["ARR_DELAY_GROUP"]}'
+
+
+class FeatureEncoder:
+    """Maps arrival statuses and feature values to integer codes.
+
+    For each feature `X` (see `FEATURES`), the values of `X` are numbered
+    `0..get_dimension(X) - 1` as in its `KeyMeta` vocabulary (see
+    `FEATURE_VOCABULARIES`). Arrival statuses are numbered in the order of
+    `KeyMeta.get_status_keys()` under the name `'status'`.
+
+    Encoded data are stored as a dict of columns, `{ name: np.ndarray }`,
+    where `name` is `'status'` or a feature in `FEATURES`.
+    """
+
+    def __init__(self, key_meta: KeyMeta):
+        """Take the vocabularies from `key_meta` (see
+        `KeyMeta.get_vocabulary()`)."""
+        if key_meta.get_status_keys() is None \
+                or key_meta.get_seen_airports() is None \
+                or key_meta.get_seen_carriers() is None \
+                or key_meta.get_temp_keys() is None \
+                or key_meta.get_wind_keys() is None:
+            raise BufferError(
+                'FeatureEncoder: ERR: KeyMeta is not fully initialized.')
+
+        self.__vocabularies: dict[str, MappingProxyType] = {
+            'status': key_meta.get_vocabulary('status')}
+        self.__vocab: dict[str, list] = {
+            'status': key_meta.get_vocabulary_keys('status')}
+        for feature, vocabulary in FEATURE_VOCABULARIES.items():
+            self.__vocabularies[feature] = key_meta.get_vocabulary(vocabulary)
+            self.__vocab[feature] = key_meta.get_vocabulary_keys(vocabulary)
+        self.__index: dict[str, dict] = {
+            name: {key: i for i, key in enumerate(keys)}
+            for name, keys in self.__vocab.items()
+        }
+
+    def get_keys(self, name: str) -> list:
+        """Get the keys of `name` ordered by code."""
+        return self.__vocab[name].copy()
+
+    def get_dimension(self, name: str) -> int:
+        """Get the number of values `name` can take."""
+        return len(self.__vocab[name])
+
+    def get_dtype(self, name: str) -> np.dtype:
+        """Get the smallest unsigned integer type that holds every code of
+        `name`."""
+        return np.min_scalar_type(max(self.get_dimension(name) - 1, 0))
+
+    def encode(self, name: str, key) -> int:
+        """Get the code of `key`. Raises `KeyError` if `key` is unknown."""
+        return self.__index[name][key]
+
+    def encode_column(self, name: str, keys) -> np.ndarray:
+        """Encode a sequence of keys of `name` at once. Keys are matched by
+        their string form, so `10135` and `'10135'` encode to the same code.
+        Each distinct key is looked up once.
+
+        Returns:
+
+        array of codes of the type given by `get_dtype()`
+
+        Raises `KeyError` holding the list of unknown keys if any key of
+        `keys` is unknown to the encoder.
+        """
+        unique_keys, inverse = np.unique(
+            np.asarray(keys, dtype=str), return_inverse=True)
+        index = self.__vocabularies[name]
+        unknown = [key for key in unique_keys.tolist() if key not in index]
+        if len(unknown) > 0:
+            raise KeyError(unknown)
+
+        unique_codes = np.array([index[key] for key in unique_keys.tolist()],
+                                dtype=self.get_dtype(name))
+        return unique_codes[inverse.reshape(-1)]
+
+    def encode_records(self, data: list, indices=None) -> dict[str, np.ndarray]:
+        """Encode data records into integer columns.
+
+        Positional arguments:
+
+        - data -- list of data records
+        - indices -- indices of the records in `data` to encode. If `None`,
+                     all records are encoded.
+
+        Returns:
+
+        dict of columns, each holding one code per encoded record. Each
+        column has the type given by `get_dtype()`.
+
+        Raises `KeyError` if a record holds a value unknown to the encoder.
+        """
+        if indices is None:
+            indices = range(len(data))
+        rows = [data[i] for i in indices]
+
+        status_index = self.__index['status']
+        columns = {
+            'status': np.fromiter(
+                (status_index[get_status_key(row)] for row in rows),
+                dtype=self.get_dtype('status'), count=len(rows))
+        }
+        for feature, column_k in FEATURE_COLUMNS.items():
+            index = self.__index[feature]
+            columns[feature] = np.fromiter(
+                (index[row[column_k]] for row in rows),
+                dtype=self.get_dtype(feature), count=len(rows))
+
+        return columns
+
+
+class StreamEncoder:
+    """Encodes a stream of data records into integer columns in one pass,
+    before the airports and carriers of the data are known. Stores the
+    following:
+
+    - Codes of each column so far, in compact arrays
+    - Provisional codes of airports and carriers, numbered in order of first
+      appearance
+
+    Once the stream is consumed, the seen airports and carriers give the
+    vocabularies of a `FeatureEncoder` (see `KeyMeta.set_seen_airports()`
+    and `KeyMeta.set_seen_carriers()`), and `get_columns()` renumbers the
+    provisional codes to that encoder's codes. Only the columns are kept, so
+    memory is bounded by the encoded data rather than by the records.
+    """
+
+    def __init__(self, key_meta: KeyMeta):
+        """Take the fixed vocabularies (statuses, days, departure times,
+        and weather buckets) from `key_meta` (see
+        `KeyMeta.get_vocabulary()`)."""
+        if key_meta.get_status_keys() is None \
+                or key_meta.get_temp_keys() is None \
+                or key_meta.get_wind_keys() is None:
+            raise BufferError(
+                'StreamEncoder: ERR: KeyMeta is not fully initialized.')
+
+        vocabularies = {'status': 'status'}
+        vocabularies.update({feature: vocabulary
+                             for feature, vocabulary in FEATURE_VOCABULARIES.items()
+                             if feature not in STREAMED_FEATURES})
+        self.__index: dict[str, dict] = {
+            name: {key: i for i, key in enumerate(key_meta.get_vocabulary_keys(vocabulary))}
+            for name, vocabulary in vocabularies.items()
+        }
+        # Provisional codes, shared by src and dst
+        self.__seen: dict[str, dict] = {'carrier': {}, 'airport': {}}
+
+        self.__codes: dict[str, array] = {
+            name: array('I') for name in ('status',) + FEATURES}
+
+    def get_len(self) -> int:
+        """Get the number of records encoded so far."""
+        return len(self.__codes['status'])
+
+    def get_seen_airports(self) -> set[str]:
+        """Get the airports of the records encoded so far."""
+        return set(self.__seen['airport'])
+
+    def get_seen_carriers(self) -> set[str]:
+        """Get the carriers of the records encoded so far."""
+        return set(self.__seen['carrier'])
+
+    def encode(self, records: Iterable[dict]) -> int:
+        """Encode each record of `records`, consuming them.
+
+        Returns:
+
+        Number of records encoded
+
+        Raises `KeyError` if a record holds a status, day, departure time, or
+        weather bucket unknown to the encoder. Records before it remain
+        encoded.
+        """
+        codes = self.__codes
+        index = self.__index
+        seen = self.__seen
+        fixed_columns = [(feature, column_k) for feature, column_k in FEATURE_COLUMNS.items()
+                         if feature not in STREAMED_FEATURES]
+        count = 0
+        for row in records:
+            # Look up every fixed code before changing any state, so that a
+            # bad record leaves the encoder as it was
+            status_code = index['status'][get_status_key(row)]
+            row_codes = [(feature, index[feature][row[column_k]])
+                         for feature, column_k in fixed_columns]
+            for feature, vocabulary in STREAMED_FEATURES.items():
+                key = row[FEATURE_COLUMNS[feature]]
+                row_codes.append(
+                    (feature, seen[vocabulary].setdefault(key, len(seen[vocabulary]))))
+
+            codes['status'].append(status_code)
+            for feature, code in row_codes:
+                codes[feature].append(code)
+            count += 1
+
+        return count
+
+    def get_columns(self, encoder: FeatureEncoder) -> dict[str, np.ndarray]:
+        """Get the columns encoded so far, in the codes of `encoder`.
+
+        Positional arguments:
+
+        - encoder -- `FeatureEncoder` whose vocabularies hold every airport
+                     and carrier seen
+
+        Returns:
+
+        dict of columns of the format returned by
+        `FeatureEncoder.encode_records()`
+
+        Raises `KeyError` if `encoder` lacks a seen airport or carrier.
+        """
+        columns = {}
+        for name, codes in self.__codes.items():
+            column = np.frombuffer(codes, dtype=np.uintc)
+            if name in STREAMED_FEATURES:
+                # Renumber provisional codes to the encoder's
+                provisional = self.__seen[STREAMED_FEATURES[name]]
+                renumber = np.array([encoder.encode(name, key) for key in provisional],
+                                    dtype=encoder.get_dtype(name))
+                columns[name] = renumber[column]
+            else:
+                columns[name] = column.astype(encoder.get_dtype(name))
+
+        return columns
@@ -1,6 +1,8 @@
+import numpy as np
 from copy import deepcopy
 from intelliflight.models.components.dataset import Dataset
 from intelliflight.models.components.keymeta import KeyMeta
+from intelliflight.models.components.encoder import FeatureEncoder, FEATURES, get_status_key
 
 
 class FrequencyCounter:
@@ -61,47 +63,52 @@ class FrequencyCounter:
 
         self.__counters_reset = True
 
+    def extend_counters(self, key_meta: KeyMeta):
+        """Add zero-frequency entries for airports and carriers in `key_meta`
+        that the counters do not yet hold. Existing frequencies are kept."""
+        if self.__status_counter is None:
+            raise BufferError(
+                'FrequencyCounter: ERR: Counters are not initialized. Run reset_counters() first.')
+
+        zero_counts = dict.fromkeys(self.__status_counter.keys(), 0)
+        for aline_k in key_meta.get_seen_carriers():
+            if aline_k not in self.__airline_counter:
+                self.__airline_counter[aline_k] = zero_counts.copy()
+
+        for airport_k in key_meta.get_seen_airports():
+            if airport_k not in self.__src_counter:
+                self.__src_counter[airport_k] = zero_counts.copy()
+            if airport_k not in self.__dst_counter:
+                self.__dst_counter[airport_k] = zero_counts.copy()
+
     def count_frequencies(self, dataset: Dataset):
         """Given 'dataset', calculate and set the frequencies of all feature
-        values. `reset_counters()` must be called first."""
+        values. `reset_counters()` must be called first. Test and validation
+        bounds are positions in the record order of `dataset`."""
         # Error checking
         if not self.__counters_reset:
             raise BufferError(
                 'FrequencyCounter: ERR: Counters were not reset. Run reset_counters() first.')
-        validation_start, validation_end = dataset.get_validation_bounds()
-        test_start, test_end = dataset.get_test_bounds()
-        if validation_start is None:
-            # Test bounds must both be None or both have values
-            # If there is no test set, make the bounds negative so the index in the dataset never falls between them
-            if test_start is None:
-                test_start = -999
-                test_end = -999
-            # Set bounds to test set bounds
-            validation_start = test_start
-            validation_end = test_end
-        else:
-            # Cannot have validation set but no test set
-            if test_start is None or test_end is None:
-                raise TypeError(
-                    'FrequencyCounter.count_frequencies(): Test set boundaries cannot be None if a validation set is defined.')
+        if dataset.is_columnar():
+            # Encoded data is counted with the vectorized engine
+            self.count_frequencies_vectorized(dataset, dataset.get_encoder())
+            return
+
+        test_start, test_end, validation_start, validation_end = \
+            self.__get_excluded_bounds(dataset)
 
         # Count features
 
         data = dataset.get_data()
+        indices = dataset.get_indices().tolist()
         for i in range(dataset.get_len()):
             # Check if record is in test or validation set
             if ((test_start <= i < test_end)
                     or (validation_start <= i < validation_end)):
                 continue
-            record = data[i]
+            record = data[indices[i]]
             # Process arrival status
-            status_k = None
-            if record['CANCELLED'] == '1.00':
-                status_k = f'cancel:{record["CANCELLATION_CODE"]}'
-            elif record['DIVERTED'] == '1.00':
-                status_k = 'divert'
-            else:
-                status_k = f'delay:{record["ARR_DELAY_GROUP"]}'
+            status_k = get_status_key(record)
 
             self.__status_counter[status_k] += 1
 
@@ -121,6 +128,149 @@ class FrequencyCounter:
 
         self.__counters_reset = False
 
+    def count_frequencies_vectorized(self, dataset: Dataset, encoder: FeatureEncoder):
+        """Given 'dataset', calculate and set the frequencies of all feature
+        values using integer-encoded columns and `np.bincount()`.
+        `reset_counters()` must be called first.
+
+        Produces the same counts as `count_frequencies()`. `encoder` must be
+        built from the `KeyMeta` passed to `reset_counters()`. If `dataset`
+        is columnar, its columns are counted directly with its own encoder.
+        """
+        # Error checking
+        if not self.__counters_reset:
+            raise BufferError(
+                'FrequencyCounter: ERR: Counters were not reset. Run reset_counters() first.')
+        test_start, test_end, validation_start, validation_end = \
+            self.__get_excluded_bounds(dataset)
+
+        # Select records outside of the test and validation sets
+        included = np.ones(dataset.get_len(), dtype=bool)
+        included[max(test_start, 0):max(test_end, 0)] = False
+        included[max(validation_start, 0):max(validation_end, 0)] = False
+        indices = dataset.get_indices()[included]
+
+        if dataset.is_columnar():
+            encoder = dataset.get_encoder()
+            columns = {name: column[indices]
+                       for name, column in dataset.get_columns().items()}
+        else:
+            columns = encoder.encode_records(dataset.get_data(), indices)
+        self.count_encoded(columns, encoder)
+
+    def count_encoded(self, columns: dict[str, np.ndarray], encoder: FeatureEncoder):
+        """Given integer-encoded `columns` (see `FeatureEncoder`), calculate
+        and set the frequencies of all feature values. Every record in
+        `columns` is counted. `reset_counters()` must be called first."""
+        if not self.__counters_reset:
+            raise BufferError(
+                'FrequencyCounter: ERR: Counters were not reset. Run reset_counters() first.')
+
+        self.set_count_arrays(FrequencyCounter.tally(columns, encoder), encoder)
+
+    @staticmethod
+    def tally(columns: dict[str, np.ndarray], encoder: FeatureEncoder) -> dict[str, np.ndarray]:
+        """Count integer-encoded `columns` in one vectorized pass.
+
+        Returns:
+
+        dict with the following keys:
+        - 'status' -- array of shape `(status,)` holding `freq(S = s)`
+        - each feature `X` in `FEATURES` -- array of shape `(x, status)`
+          holding `freq(X = x | S = s)`
+        """
+        # Widen compact column types so that the pair index cannot overflow
+        status = columns['status'].astype(np.intp)
+        status_dim = encoder.get_dimension('status')
+        counts = {
+            'status': np.bincount(status, minlength=status_dim)
+        }
+        for feature in FEATURES:
+            feature_dim = encoder.get_dimension(feature)
+            # Count (value, status) pairs as a flattened 2D index
+            pairs = columns[feature].astype(np.intp) * status_dim + status
+            counts[feature] = np.bincount(
+                pairs, minlength=feature_dim * status_dim
+            ).reshape(feature_dim, status_dim)
+
+        return counts
+
+    def set_count_arrays(self, counts: dict[str, np.ndarray], encoder: FeatureEncoder):
+        """Set all frequencies from count arrays of the format returned by
+        `tally()`."""
+        status_keys = encoder.get_keys('status')
+        self.__status_counter = dict(
+            zip(status_keys, counts['status'].tolist()))
+        for feature, table in self.__get_tables().items():
+            for key, row in zip(encoder.get_keys(feature), counts[feature].tolist()):
+                table[key] = dict(zip(status_keys, row))
+
+        self.__counters_reset = False
+
+    def get_count_arrays(self, encoder: FeatureEncoder) -> dict[str, np.ndarray]:
+        """Get all frequencies as count arrays of the format returned by
+        `tally()`."""
+        if self.__status_counter is None:
+            return None
+        status_keys = encoder.get_keys('status')
+        counts = {
+            'status': np.array([self.__status_counter[s] for s in status_keys],
+                               dtype=np.int64)
+        }
+        for feature, table in self.__get_tables().items():
+            counts[feature] = np.array(
+                [[table[key][s] for s in status_keys]
+                 for key in encoder.get_keys(feature)],
+                dtype=np.int64
+            ).reshape(encoder.get_dimension(feature), len(status_keys))
+
+        return counts
+
+    def import_counters(self, counters: dict):
+        """Import frequency tables from a dictionary of the format returned by
+        `export_counters()`."""
+        self.__status_counter = deepcopy(counters['arrival_status'])
+        self.__day_counter = deepcopy(counters['day'])
+        self.__airline_counter = deepcopy(counters['airline'])
+        self.__src_counter = deepcopy(counters['src_airport'])
+        self.__dst_counter = deepcopy(counters['dst_airport'])
+        self.__dep_time_counter = deepcopy(counters['departure_time'])
+        self.__src_tmp_counter = deepcopy(counters['src_temperature'])
+        self.__dst_tmp_counter = deepcopy(counters['dst_temperature'])
+        self.__src_wind_counter = deepcopy(counters['src_wind_speed'])
+        self.__dst_wind_counter = deepcopy(counters['dst_wind_speed'])
+        self.__counters_reset = False
+
+    def export_counters(self) -> dict[str, dict]:
+        """Dumps frequency tables to a JSON-friendly dict and returns it.
+
+        Returns:
+
+        dict with the same keys as `ProbabilityTables.export_p_tables()`:
+        - 'arrival_status'
+        - 'day'
+        - 'airline'
+        - 'src_airport'
+        - 'dst_airport'
+        - 'departure_time'
+        - 'src_temperature'
+        - 'dst_temperature'
+        - 'src_wind_speed'
+        - 'dst_wind_speed'
+        """
+        return {
+            'arrival_status': self.__status_counter,
+            'day': self.__day_counter,
+            'airline': self.__airline_counter,
+            'src_airport': self.__src_counter,
+            'dst_airport': self.__dst_counter,
+            'departure_time': self.__dep_time_counter,
+            'src_temperature': self.__src_tmp_counter,
+            'dst_temperature': self.__dst_tmp_counter,
+            'src_wind_speed': self.__src_wind_counter,
+            'dst_wind_speed': self.__dst_wind_counter
+        }
+
     def get_status_counter(self) -> dict[str, int]:
         """Copy `status_counter`"""
         if self.__status_counter is None:
@@ -202,3 +352,40 @@ class FrequencyCounter:
     def query_dst_wnd_counter(self, dst_wnd: str, status: str) -> int:
         """Get `freq(dst_wnd | status)`"""
         return self.__dst_wind_counter[dst_wnd][status]
+
+    def __get_tables(self) -> dict[str, dict[str, dict[str, int]]]:
+        """Get feature tables by feature name. These are NOT copies."""
+        return {
+            'day': self.__day_counter,
+            'airline': self.__airline_counter,
+            'src': self.__src_counter,
+            'dst': self.__dst_counter,
+            'dep_time': self.__dep_time_counter,
+            'src_tmp': self.__src_tmp_counter,
+            'dst_tmp': self.__dst_tmp_counter,
+            'src_wnd': self.__src_wind_counter,
+            'dst_wnd': self.__dst_wind_counter
+        }
+
+    def __get_excluded_bounds(self, dataset: Dataset) -> tuple[int, int, int, int]:
+        """Get `(test_start, test_end, validation_start, validation_end)`
+        of the records in `dataset` that must not be counted. Unset
+        partitions get negative bounds that no index falls between."""
+        validation_start, validation_end = dataset.get_validation_bounds()
+        test_start, test_end = dataset.get_test_bounds()
+        if validation_start is None:
+            # Test bounds must both be None or both have values
+            # If there is no test set, make the bounds negative so the index in the dataset never falls between them
+            if test_start is None:
+                test_start = -999
+                test_end = -999
+            # Set bounds to test set bounds
+            validation_start = test_start
+            validation_end = test_end
+        else:
+            # Cannot have validation set but no test set
+            if test_start is None or test_end is None:
+                raise TypeError(
+                    'FrequencyCounter.count_frequencies(): Test set boundaries cannot be None if a validation set is defined.')
+
+        return test_start, test_end, validation_start, validation_end
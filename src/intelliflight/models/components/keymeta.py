@@ -1,3 +1,25 @@
+import numpy as np
+from types import MappingProxyType
+from typing import Final
+
+
+# Vocabulary (see KeyMeta.get_vocabulary()) of each data record key
+RECORD_VOCABULARIES: Final = {
+    'DAY_OF_WEEK': 'day',
+    'OP_UNIQUE_CARRIER': 'carrier',
+    'ORIGIN_AIRPORT_ID': 'airport',
+    'DEST_AIRPORT_ID': 'airport',
+    'CRS_DEP_TIME': 'dep_time',
+    'src_tavg': 'temp',
+    'dst_tavg': 'temp',
+    'src_wspd': 'wind',
+    'dst_wspd': 'wind'
+}
+
+# Aggregated arrival outcomes (see KeyMeta.get_status_bucket())
+STATUS_BUCKETS: Final = ('on_time', 'delayed', 'cancelled', 'diverted')
+
+
 class KeyMeta:
     """Stores the following information:
 
@@ -6,6 +28,9 @@ class KeyMeta:
     - Arrival statuses as `{ key: description }` (both `str`)
     - Key values for temperature buckets
     - Key values for wind speed buckets
+    - Aggregated outcomes of arrival statuses (see `STATUS_BUCKETS`)
+    - Vocabularies mapping the string form of each of the above to an
+      integer code, built on first use
     """
 
     def __init__(self):
@@ -26,6 +51,8 @@ class KeyMeta:
             for j in ['00', '30']:
                 self.__DEP_TIMES.append(f'{str(i).rjust(2, "0")}{j}')
 
+        self.__vocabularies: dict[str, MappingProxyType] = {}
+
     def in_seen_airports(self, airport: str) -> bool:
         if self.__seen_airports is None:
             raise BufferError('KeyMeta: ERR: seen_airports not initialized.')
@@ -46,6 +73,97 @@ class KeyMeta:
             raise BufferError('KeyMeta: ERR: wind_keys not initialized.')
         return airport in self.__wind_keys
 
+    def get_vocabulary(self, name: str) -> MappingProxyType:
+        """Get a read-only map of the string form of each key of a
+        vocabulary to its integer code. These are the codes used by
+        `FeatureEncoder`. The map is built once and reused until the keys
+        change.
+
+        Positional arguments:
+
+        - name -- one of `'status'`, `'day'`, `'airport'`, `'carrier'`,
+                  `'dep_time'`, `'temp'`, or `'wind'`
+        """
+        vocabulary = self.__vocabularies.get(name)
+        if vocabulary is None:
+            vocabulary = MappingProxyType(
+                {str(key): i for i, key in enumerate(self.get_vocabulary_keys(name))})
+            self.__vocabularies[name] = vocabulary
+
+        return vocabulary
+
+    def get_vocabulary_keys(self, name: str) -> list:
+        """Get the keys of a vocabulary (see `get_vocabulary()`) ordered by
+        code, as stored rather than in their string form. Airports and
+        carriers are sorted so that codes are stable between runs."""
+        if name == 'status':
+            keys = self.__arrival_statuses
+        elif name == 'day':
+            keys = [str(day_k) for day_k in range(1, 8)]
+        elif name == 'airport':
+            keys = None if self.__seen_airports is None \
+                else sorted(self.__seen_airports)
+        elif name == 'carrier':
+            keys = None if self.__seen_carriers is None \
+                else sorted(self.__seen_carriers)
+        elif name == 'dep_time':
+            keys = self.__DEP_TIMES
+        elif name == 'temp':
+            keys = self.__temp_keys
+        elif name == 'wind':
+            keys = self.__wind_keys
+        else:
+            raise ValueError(f'KeyMeta: ERR: Unknown vocabulary {name}.')
+        if keys is None:
+            raise BufferError(f'KeyMeta: ERR: {name} keys not initialized.')
+
+        return list(keys)
+
+    def validate_records(self, columns: dict) -> tuple[np.ndarray, dict[int, str]]:
+        """Check many data records against the vocabularies at once. Each
+        distinct value of a column is looked up once.
+
+        Positional arguments:
+
+        - columns -- dict of equal-length sequences of values, keyed by data
+                     record keys in `RECORD_VOCABULARIES`. Other keys are
+                     ignored.
+
+        Returns:
+
+        - boolean array marking the records whose values are all known
+        - dict of the reason each invalid record was rejected, keyed by
+          record index. Only the first unknown value of a record (in the
+          order of `RECORD_VOCABULARIES`) is reported.
+        """
+        mask = None
+        reasons: dict[int, str] = {}
+        for column_k, name in RECORD_VOCABULARIES.items():
+            if column_k not in columns:
+                continue
+
+            vocabulary = self.get_vocabulary(name)
+            unique_keys, inverse = np.unique(
+                np.asarray(columns[column_k], dtype=str), return_inverse=True)
+            inverse = inverse.reshape(-1)
+            unknown = np.array([key not in vocabulary
+                                for key in unique_keys.tolist()], dtype=bool)
+            if mask is None:
+                mask = np.ones(len(inverse), dtype=bool)
+            if not unknown.any():
+                continue
+
+            column_unknown = unknown[inverse]
+            # Report only rows not already rejected by an earlier column
+            for i in np.flatnonzero(column_unknown & mask).tolist():
+                reasons[i] = f'{column_k}={unique_keys[inverse[i]]} did not occur in the training data.'
+            mask &= ~column_unknown
+
+        if mask is None:
+            mask = np.ones(0, dtype=bool)
+
+        return mask, reasons
+
     def get_arrival_statuses(self) -> dict[str, str]:
         if self.__arrival_statuses is None:
             return None
@@ -81,17 +199,40 @@ class KeyMeta:
             return None
         return self.__arrival_statuses.keys()
 
+    def get_status_buckets(self) -> list[str]:
+        """Get the aggregated outcome keys (see `STATUS_BUCKETS`)."""
+        return list(STATUS_BUCKETS)
+
+    @staticmethod
+    def get_status_bucket(status_k: str) -> str:
+        """Get the aggregated outcome (see `STATUS_BUCKETS`) of an arrival
+        status key. As in BTS on-time statistics, arrivals less than 15
+        minutes late (delay group 0 or below) are on time."""
+        if status_k.find('cancel:') == 0:
+            return 'cancelled'
+        elif status_k == 'divert':
+            return 'diverted'
+        elif int(status_k.split(':')[1]) <= 0:
+            return 'on_time'
+        else:
+            return 'delayed'
+
     def set_arrival_statuses(self, arrival_statuses: dict[str, str]):
         self.__arrival_statuses = arrival_statuses.copy()
+        self.__vocabularies.pop('status', None)
 
     def set_seen_airports(self, seen_airports: set[str]):
         self.__seen_airports = seen_airports.copy()
+        self.__vocabularies.pop('airport', None)
 
     def set_seen_carriers(self, seen_carriers: set[str]):
         self.__seen_carriers = seen_carriers.copy()
+        self.__vocabularies.pop('carrier', None)
 
     def set_temp_keys(self, temp_keys: list[str]):
         self.__temp_keys = temp_keys.copy()
+        self.__vocabularies.pop('temp', None)
 
     def set_wind_keys(self, wind_keys: list[str]):
         self.__wind_keys = wind_keys.copy()
+        self.__vocabularies.pop('wind', None)
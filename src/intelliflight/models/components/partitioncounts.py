@@ -0,0 +1,166 @@
+import numpy as np
+from intelliflight.models.components.dataset import Dataset
+from intelliflight.models.components.encoder import FeatureEncoder, FEATURES
+
+
+class PartitionCounts:
+    """Stores the following for a partitioned dataset:
+
+    - Integer-encoded columns of the full dataset (see `FeatureEncoder`)
+    - Order of the records, as a permutation of record indices (identity if
+      `None`)
+    - Bounds of each partition (start inclusive, end exclusive) as positions
+      in the record order
+    - Count arrays of each partition (see `FrequencyCounter.tally()`)
+    - Count arrays of the full dataset
+
+    Counts are additive, so the counts of any union of partitions are
+    derived from these arrays without recounting data. The columns are never
+    reordered; a partition is the index range `order[start:end]`.
+    """
+
+    def __init__(self):
+        self.__columns: dict[str, np.ndarray] = None
+        self.__order: np.ndarray = None
+        self.__bounds: list[tuple[int, int]] = None
+        self.__partition_counts: list[dict[str, np.ndarray]] = None
+        self.__total_counts: dict[str, np.ndarray] = None
+
+    def build(self, dataset: Dataset, partition_starts: list[int], encoder: FeatureEncoder):
+        """Encode `dataset` and count each of its partitions once. Columnar
+        datasets are used as-is and must be encoded with `encoder`. The
+        record order of `dataset` (see `Dataset.set_order()`) is used.
+
+        Positional arguments:
+
+        - dataset -- `Dataset` holding the partitioned data
+        - partition_starts -- starting position of each partition, ascending
+        - encoder -- `FeatureEncoder` used to encode and count the data
+        """
+        if dataset.is_columnar():
+            columns = dataset.get_columns()
+        else:
+            columns = encoder.encode_records(dataset.get_data())
+        self.build_from_columns(
+            columns, partition_starts, encoder, dataset.get_order())
+
+    def build_from_columns(self, columns: dict[str, np.ndarray], partition_starts: list[int], encoder: FeatureEncoder, order: np.ndarray = None):
+        """Count each partition of already encoded `columns` once. The
+        columns are NOT copied.
+
+        Positional arguments:
+
+        - columns -- encoded columns of the full dataset
+        - partition_starts -- starting position of each partition, ascending
+        - encoder -- `FeatureEncoder` with which `columns` were encoded
+        - order -- permutation of record indices over which partitions are
+                   defined. If `None`, records are taken in storage order.
+        """
+        data_len = len(columns['status'])
+        self.__columns = columns
+        self.__order = order
+        self.__bounds = [
+            (start, partition_starts[i + 1]
+             if i + 1 < len(partition_starts) else data_len)
+            for i, start in enumerate(partition_starts)
+        ]
+        self.__partition_counts = self.__tally_partitions(encoder)
+        self.__total_counts = {
+            name: sum(counts[name] for counts in self.__partition_counts)
+            for name in self.__partition_counts[0].keys()
+        }
+
+    def get_partition_count(self) -> int:
+        """Get number of partitions."""
+        self.__check_built()
+        return len(self.__bounds)
+
+    def get_bounds(self, index: int) -> tuple[int, int]:
+        """Get `(start, end)` of partition `index`."""
+        self.__check_built()
+        return self.__bounds[index]
+
+    def get_order(self) -> np.ndarray:
+        """Get the record order. `None` if records are in storage order."""
+        self.__check_built()
+        return self.__order
+
+    def get_indices(self, index: int) -> np.ndarray:
+        """Get the record indices of partition `index`. If an order is
+        set, this is a view of it rather than a copy."""
+        self.__check_built()
+        start, end = self.__bounds[index]
+        if self.__order is None:
+            return np.arange(start, end)
+
+        return self.__order[start:end]
+
+    def get_columns(self, index: int = None) -> dict[str, np.ndarray]:
+        """Get encoded columns of partition `index`, or of the full dataset
+        (in storage order) if `index` is `None`. Without a record order,
+        these are NOT copies; with one, the records of partition `index` are
+        gathered into new arrays."""
+        self.__check_built()
+        if index is None:
+            return self.__columns
+
+        if self.__order is None:
+            start, end = self.__bounds[index]
+            return {name: column[start:end]
+                    for name, column in self.__columns.items()}
+
+        indices = self.get_indices(index)
+        return {name: column[indices]
+                for name, column in self.__columns.items()}
+
+    def get_counts_excluding(self, *indices: int) -> dict[str, np.ndarray]:
+        """Get count arrays of the full dataset, excluding the partitions
+        at `indices`. Each index is excluded once, even if repeated."""
+        self.__check_built()
+        counts = {name: table.copy()
+                  for name, table in self.__total_counts.items()}
+        for index in set(indices):
+            for name, table in self.__partition_counts[index].items():
+                counts[name] -= table
+
+        return counts
+
+    def __tally_partitions(self, encoder: FeatureEncoder) -> list[dict[str, np.ndarray]]:
+        """Count every partition in one pass over the columns by labelling
+        each record with its partition.
+
+        Returns:
+
+        Count arrays (see `FrequencyCounter.tally()`) of each partition
+        """
+        partition_count = len(self.__bounds)
+        labels = np.empty(len(self.__columns['status']), dtype=np.intp)
+        for i in range(partition_count):
+            labels[self.get_indices(i)] = i
+
+        # Widen compact column types so that the flattened index cannot
+        # overflow
+        status = self.__columns['status'].astype(np.intp)
+        status_dim = encoder.get_dimension('status')
+        tables = {
+            'status': np.bincount(
+                labels * status_dim + status,
+                minlength=partition_count * status_dim
+            ).reshape(partition_count, status_dim)
+        }
+        for feature in FEATURES:
+            feature_dim = encoder.get_dimension(feature)
+            # Count (partition, value, status) triples as a flattened 3D index
+            triples = (labels * feature_dim + self.__columns[feature].astype(np.intp)) \
+                * status_dim + status
+            tables[feature] = np.bincount(
+                triples, minlength=partition_count * feature_dim * status_dim
+            ).reshape(partition_count, feature_dim, status_dim)
+
+        return [{name: table[i] for name, table in tables.items()}
+                for i in range(partition_count)]
+
+    def __check_built(self):
+        if self.__bounds is None:
+            raise BufferError(
+                'PartitionCounts: ERR: Counts were not built. Run build() first.')
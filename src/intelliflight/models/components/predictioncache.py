@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Bounded least-recently-used cache of predictions. Stores the
+    following:
+
+    - Predictions keyed on the discretized feature tuple of a flight
+    - Maximum number of stored predictions. 0 disables the cache.
+    - Number of lookups that hit and missed since the last `clear()`
+
+    When full, storing a new prediction evicts the least recently used one.
+    """
+
+    def __init__(self, max_size: int = 0):
+        if max_size < 0:
+            raise ValueError(
+                f'PredictionCache: ERR: max_size={max_size} must be at least 0.')
+
+        self.__entries: OrderedDict = OrderedDict()
+        self.__max_size: int = max_size
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+    def get(self, key: tuple):
+        """Get the prediction stored for `key`, or `None` if there is none.
+        Counts a hit or a miss. Always `None` if the cache is disabled."""
+        if self.__max_size == 0:
+            return None
+
+        value = self.__entries.get(key)
+        if value is None:
+            self.__misses += 1
+        else:
+            self.__hits += 1
+            self.__entries.move_to_end(key)
+
+        return value
+
+    def put(self, key: tuple, value):
+        """Store `value` as the prediction for `key`, evicting the least
+        recently used prediction if the cache is full."""
+        if self.__max_size == 0:
+            return
+
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        if len(self.__entries) > self.__max_size:
+            self.__entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all predictions and reset the hit and miss counters."""
+        self.__entries.clear()
+        self.__hits = 0
+        self.__misses = 0
+
+    def set_max_size(self, max_size: int):
+        """Set the maximum number of stored predictions, evicting the least
+        recently used ones if needed. 0 disables the cache."""
+        if max_size < 0:
+            raise ValueError(
+                f'PredictionCache: ERR: max_size={max_size} must be at least 0.')
+
+        self.__max_size = max_size
+        while len(self.__entries) > max_size:
+            self.__entries.popitem(last=False)
+
+    def get_max_size(self) -> int:
+        """Get the maximum number of stored predictions."""
+        return self.__max_size
+
+    def get_len(self) -> int:
+        """Get the number of stored predictions."""
+        return len(self.__entries)
+
+    def get_hits(self) -> int:
+        """Get the number of lookups that found a prediction."""
+        return self.__hits
+
+    def get_misses(self) -> int:
+        """Get the number of lookups that found no prediction."""
+        return self.__misses
+
+    def get_hit_rate(self) -> float:
+        """Get the fraction of lookups that found a prediction. 0 if there
+        were no lookups."""
+        lookups = self.__hits + self.__misses
+        if lookups == 0:
+            return 0.0
+
+        return self.__hits / lookups
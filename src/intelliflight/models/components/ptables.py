@@ -1,7 +1,9 @@
+import numpy as np
 from copy import deepcopy
 from intelliflight.models.components.dataset import Dataset
 from intelliflight.models.components.keymeta import KeyMeta
 from intelliflight.models.components.frequencycounter import FrequencyCounter
+from intelliflight.models.components.encoder import FeatureEncoder, FEATURES
 
 
 class ProbabilityTables:
@@ -37,12 +39,15 @@ class ProbabilityTables:
         self.__p_tables_reset: bool = False
         # Flag indicating whether tables have been fit to data
         self.__p_tables_fit: bool = False
+        # Incremented whenever table contents change
+        self.__revision: int = 0
 
     def reset_tables(self, key_meta: KeyMeta, frequencies: FrequencyCounter):
         """Initializes tables with new keys and a zero value for each key.
         Keys derived from arguments."""
         self.__p_tables_fit = False
         self.__p_tables_reset = True
+        self.__revision += 1
         self.__k = None
         self.p_status = dict.fromkeys(
             key_meta.get_status_keys(), 0)
@@ -86,7 +91,17 @@ class ProbabilityTables:
         """
         # Test and validation data were not used for frequency calculation
         # and should be omitted from data_len.
-        data_len = dataset.get_training_len()
+        self.fit_counts(frequencies, dataset.get_training_len(), k)
+
+    def fit_counts(self, frequencies: FrequencyCounter, data_len: int, k: int):
+        """Fits the tables to frequencies without a dataset.
+
+        Positional arguments:
+
+        - frequencies -- `FrequencyCounter` holding the training frequencies
+        - data_len -- number of records counted in `frequencies`
+        - k -- laplace smoothing coefficient to use
+        """
         if not self.__p_tables_reset:
             raise BufferError(
                 'ProbabilityTables: ERR: Tables were not reset. Run reset_tables() first.')
@@ -141,12 +156,103 @@ class ProbabilityTables:
         # Update other variables
         self.__k = k
         self.__p_tables_fit = True
+        self.__revision += 1
         self.__p_tables_reset = False
 
+    @staticmethod
+    def log_tensors(counts: dict[str, np.ndarray], k_values: list[int]) -> dict[str, np.ndarray]:
+        """Smooth count arrays with every candidate k at once and return the
+        natural logs of the resulting probabilities. Equivalent to calling
+        `fit()` once per k.
+
+        Positional arguments:
+
+        - counts -- count arrays of the training data (see
+                    `FrequencyCounter.tally()`)
+        - k_values -- laplace smoothing coefficients to use
+
+        Returns:
+
+        dict with the following keys:
+        - 'status' -- array of shape `(k, status)` holding `log P(S = s)`
+        - each feature `X` in `FEATURES` -- array of shape `(k, x, status)`
+          holding `log P(X = x | S = s)`
+        """
+        k = np.asarray(k_values, dtype=np.float64)
+        status_freq = counts['status']
+        data_len = status_freq.sum()
+        tensors = {
+            'status': ProbabilityTables.__laplace_smooth_arrays(
+                status_freq[np.newaxis, :], data_len, len(status_freq),
+                k[:, np.newaxis])
+        }
+        for feature in FEATURES:
+            table = counts[feature]
+            tensors[feature] = ProbabilityTables.__laplace_smooth_arrays(
+                table[np.newaxis, :, :], status_freq[np.newaxis, np.newaxis, :],
+                table.shape[0], k[:, np.newaxis, np.newaxis])
+
+        # Zero probabilities become -inf
+        with np.errstate(divide='ignore'):
+            return {name: np.log(tensor) for name, tensor in tensors.items()}
+
+    @staticmethod
+    def leave_one_out_log_tensors(counts: dict[str, np.ndarray], columns: dict[str, np.ndarray], k_values: list[int]) -> dict[str, np.ndarray]:
+        """For each record in `columns`, remove the record's own contribution
+        from `counts`, smooth the remaining counts with every candidate k,
+        and return the natural logs of the probabilities of the record's
+        feature values. Equivalent to calling `log_tensors()` once per
+        record on counts that exclude it.
+
+        Positional arguments:
+
+        - counts -- count arrays of data that include every record in
+                    `columns` (see `FrequencyCounter.tally()`)
+        - columns -- encoded columns of the records to leave out
+        - k_values -- laplace smoothing coefficients to use
+
+        Returns:
+
+        dict with the following keys, each holding an array of shape
+        `(k, record, status)`:
+        - 'status' -- `log P(S = s)` without the record
+        - each feature `X` in `FEATURES` -- `log P(X = x | S = s)` without
+          the record, where `x` is the record's value of `X`
+        """
+        k = np.asarray(k_values, dtype=np.float64)[:, np.newaxis, np.newaxis]
+        status = columns['status'].astype(np.intp)
+        status_dim = len(counts['status'])
+        # One-hot arrival status of each record, i.e., its own contribution
+        # to the counts of every table row it falls in
+        own = np.zeros((len(status), status_dim), dtype=np.int64)
+        own[np.arange(len(status)), status] = 1
+
+        status_freq = counts['status'][np.newaxis, :] - own
+        data_len = counts['status'].sum() - 1
+        tensors = {
+            'status': ProbabilityTables.__laplace_smooth_arrays(
+                status_freq[np.newaxis], data_len, status_dim, k)
+        }
+        for feature in FEATURES:
+            table = counts[feature]
+            observed = table[columns[feature]] - own
+            tensors[feature] = ProbabilityTables.__laplace_smooth_arrays(
+                observed[np.newaxis], status_freq[np.newaxis],
+                table.shape[0], k)
+
+        # Zero probabilities become -inf
+        with np.errstate(divide='ignore'):
+            return {name: np.log(tensor) for name, tensor in tensors.items()}
+
     def get_k(self):
         """Get the smoothing coefficient used for the last call to `fit()`."""
         return self.__k
 
+    def get_revision(self) -> int:
+        """Get a counter that changes whenever the tables are reset, fit, or
+        imported. Used to detect stale copies of the tables."""
+        return self.__revision
+
     def is_fit(self):
         """Test whether the tables have been fit to data."""
         return self.__p_tables_fit
@@ -181,6 +287,7 @@ class ProbabilityTables:
         self.p_src_wnd = deepcopy(tables['src_wind_speed'])
         self.p_dst_wnd = deepcopy(tables['dst_wind_speed'])
         self.__p_tables_fit = True
+        self.__revision += 1
         self.__p_tables_reset = False
 
     def export_p_tables(self) -> dict[str, dict]:
@@ -213,6 +320,33 @@ class ProbabilityTables:
             'dst_wind_speed': self.p_dst_wnd
         }
 
+    def get_log_arrays(self, encoder: FeatureEncoder) -> dict[str, np.ndarray]:
+        """Get the natural logs of all probabilities as arrays ordered by the
+        codes of `encoder`.
+
+        Returns:
+
+        dict of the format returned by `log_tensors()`, without the leading
+        k axis
+        """
+        if self.p_status is None:
+            return None
+        status_keys = encoder.get_keys('status')
+        arrays = {
+            'status': np.array([self.p_status[s] for s in status_keys],
+                               dtype=np.float64)
+        }
+        for feature, table in self.__get_tables().items():
+            arrays[feature] = np.array(
+                [[table[key][s] for s in status_keys]
+                 for key in encoder.get_keys(feature)],
+                dtype=np.float64
+            ).reshape(encoder.get_dimension(feature), len(status_keys))
+
+        # Zero probabilities become -inf
+        with np.errstate(divide='ignore'):
+            return {name: np.log(array) for name, array in arrays.items()}
+
     # QUERY FUNCTIONS
     # Given a key and an arrival status, these functions return
     # P(variable = key | arrival status)
@@ -303,6 +437,20 @@ class ProbabilityTables:
         """Deep copy `p_dst_wnd`"""
         return deepcopy(self.p_dst_wnd)
 
+    def __get_tables(self) -> dict[str, dict[str, dict[str, float]]]:
+        """Get feature tables by feature name. These are NOT copies."""
+        return {
+            'day': self.p_day,
+            'airline': self.p_airline,
+            'src': self.p_src,
+            'dst': self.p_dst,
+            'dep_time': self.p_dep_time,
+            'src_tmp': self.p_src_tmp,
+            'dst_tmp': self.p_dst_tmp,
+            'src_wnd': self.p_src_wnd,
+            'dst_wnd': self.p_dst_wnd
+        }
+
     def __laplace_smooth(self, observations_freq: int, total: int, dimension: int, k: int):
         """Calculate the probability that a random variable takes a value.
 
@@ -322,3 +470,14 @@ class ProbabilityTables:
             return 0  # Avoid DivideByZero exception
 
         return (observations_freq + k) / (total + dimension * k)
+
+    @staticmethod
+    def __laplace_smooth_arrays(observations_freq: np.ndarray, total: np.ndarray, dimension: int, k: np.ndarray) -> np.ndarray:
+        """Array version of `__laplace_smooth()`. Arguments are broadcast
+        against each other."""
+        numerator, denominator = np.broadcast_arrays(
+            observations_freq + k, total + dimension * k)
+        # Avoid division by zero, as in __laplace_smooth()
+        return np.divide(numerator, denominator,
+                         out=np.zeros(numerator.shape),
+                         where=denominator != 0)
@@ -0,0 +1,216 @@
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from intelliflight.util import batchutil, datautil
+from intelliflight.util.nws_manager import Forecaster
+from intelliflight.models.bayes_net import Bayes_Net
+
+
+class AsyncForecaster:
+    """Asynchronous front end of a `Forecaster`. Stores the following:
+
+    - `Forecaster` whose blocking requests are run in worker threads
+    - Hourly forecast URL of each airport looked up so far. These follow
+      from airport locations and do not change.
+    - Hourly forecast fetches in flight, keyed by airport BTS ID
+
+    Concurrent callers asking for the same airport share one fetch rather
+    than each making their own requests.
+    """
+
+    def __init__(self, forecaster: Forecaster):
+        self.__forecaster = forecaster
+        self.__hourly_urls: dict[int, str] = {}
+        self.__in_flight: dict[int, asyncio.Future] = {}
+        self.__fetches: int = 0
+        self.__shared: int = 0
+
+    def get_fetch_count(self) -> int:
+        """Get the number of hourly forecasts fetched."""
+        return self.__fetches
+
+    def get_shared_count(self) -> int:
+        """Get the number of requests served by a fetch already in
+        flight."""
+        return self.__shared
+
+    async def get_hourly_periods(self, bts_id: int) -> list[dict]:
+        """Get all 1-hour periods of the hourly forecast at an airport,
+        joining the fetch already in flight for it if there is one.
+
+        Raises the exceptions of `Forecaster.get_hourly_forecast_url()` and
+        `Forecaster.get_hourly_periods()`.
+        """
+        fetch = self.__in_flight.get(bts_id)
+        if fetch is None:
+            self.__fetches += 1
+            fetch = asyncio.ensure_future(self.__fetch_hourly_periods(bts_id))
+            self.__in_flight[bts_id] = fetch
+            fetch.add_done_callback(
+                lambda _: self.__in_flight.pop(bts_id, None))
+        else:
+            self.__shared += 1
+
+        # Shield the shared fetch so that one cancelled caller does not
+        # cancel it for the others
+        return await asyncio.shield(fetch)
+
+    async def get_nws_forecast_from_bts(self, bts_id: int, iso_timestamp: str) -> dict:
+        """Asynchronous `Forecaster.get_nws_forecast_from_bts()`."""
+        # Validate timestamp format before making any requests
+        datetime.datetime.fromisoformat(
+            iso_timestamp[:-1] if iso_timestamp[-1] == 'Z' else iso_timestamp)
+
+        periods = await self.get_hourly_periods(int(bts_id))
+        return Forecaster.find_period(periods, iso_timestamp)
+
+    async def __fetch_hourly_periods(self, bts_id: int) -> list[dict]:
+        hourly_url = self.__hourly_urls.get(bts_id)
+        if hourly_url is None:
+            hourly_url = await asyncio.to_thread(
+                self.__forecaster.get_hourly_forecast_url, bts_id)
+            self.__hourly_urls[bts_id] = hourly_url
+
+        return await asyncio.to_thread(
+            self.__forecaster.get_hourly_periods, hourly_url)
+
+
+class AsyncPredictor:
+    """Predicts flights from an event loop. Stores the following:
+
+    - Trained `Bayes_Net`
+    - `AsyncForecaster` used for flights without weather (optional)
+    - Single worker thread running inference
+
+    The forecasts of both airports of a flight are fetched concurrently,
+    and inference runs off the event loop. Because the model is not
+    thread-safe, inference is serialized on one worker thread; concurrent
+    `predict_many()` calls still batch their flights.
+    """
+
+    def __init__(self, bayes: Bayes_Net, forecaster: AsyncForecaster = None):
+        """Positional arguments:
+
+        - bayes -- trained `Bayes_Net`
+
+        Keyword arguments:
+
+        - forecaster -- `AsyncForecaster` used to fetch weather for flights
+                        without it. If `None`, such flights are rejected.
+        """
+        if not bayes.p_tables.is_fit():
+            raise BufferError(
+                'AsyncPredictor: ERR: Model is not trained. Train the model or load parameters first.')
+
+        self.__bayes = bayes
+        self.__forecaster = forecaster
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+
+    async def predict(self, flight: dict) -> dict:
+        """Predict the outcome of one flight (see
+        `batchutil.prepare_flight()`).
+
+        Returns:
+
+        dict holding the key (`status`), `description`, and `probability`
+        of the most likely arrival status
+
+        Raises `ValueError` if the flight cannot be predicted, and the
+        exceptions of `Forecaster.get_nws_forecast_from_bts()` if a forecast
+        fails.
+        """
+        record = await self.__prepare(flight)
+        loop = asyncio.get_running_loop()
+        prediction = (await loop.run_in_executor(self.__executor, self.__infer, [record]))[0]
+        if 'error' in prediction:
+            raise ValueError(prediction['error'])
+        return prediction
+
+    async def predict_many(self, flights: list[dict]) -> list[dict]:
+        """Predict the outcomes of many flights, fetching all of their
+        forecasts concurrently and running inference once.
+
+        Returns:
+
+        one dict per flight holding either `status`, `description`, and
+        `probability` (see `predict()`) or an `error`
+        """
+        prepared = await asyncio.gather(
+            *[self.__prepare(flight) for flight in flights],
+            return_exceptions=True)
+
+        results = [None] * len(flights)
+        records = []
+        record_indices = []
+        for i, outcome in enumerate(prepared):
+            if isinstance(outcome, batchutil.FLIGHT_ERRORS):
+                results[i] = {'error': str(outcome)}
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                records.append(outcome)
+                record_indices.append(i)
+
+        if len(records) > 0:
+            loop = asyncio.get_running_loop()
+            predictions = await loop.run_in_executor(
+                self.__executor, self.__infer, records)
+            for i, prediction in zip(record_indices, predictions):
+                results[i] = prediction
+
+        return results
+
+    def close(self):
+        """Stop the inference thread once pending predictions finish."""
+        self.__executor.shutdown(wait=True)
+
+    async def __prepare(self, flight: dict) -> dict:
+        """Validate a flight and fill in its weather, fetching the forecasts
+        of both airports concurrently if needed."""
+        if not isinstance(flight, dict):
+            raise ValueError('Flight must be a dict.')
+        record, dep_timestamp = batchutil.parse_flight(flight)
+        weather = batchutil.get_given_weather(flight)
+        if weather is not None:
+            return record | weather
+
+        if self.__forecaster is None:
+            raise ValueError('No weather given and forecasts are disabled.')
+        hour = batchutil.get_forecast_hour(dep_timestamp).isoformat()
+        src_forecast, dst_forecast = await asyncio.gather(
+            self.__forecaster.get_nws_forecast_from_bts(
+                int(record['ORIGIN_AIRPORT_ID']), hour),
+            self.__forecaster.get_nws_forecast_from_bts(
+                int(record['DEST_AIRPORT_ID']), hour))
+        record['src_tavg'], record['src_wspd'] = batchutil.read_forecast(
+            src_forecast)
+        record['dst_tavg'], record['dst_wspd'] = batchutil.read_forecast(
+            dst_forecast)
+        return record
+
+    def __infer(self, records: list[dict]) -> list[dict]:
+        """Discretize and predict prepared records. Runs on the inference
+        thread.
+
+        Returns:
+
+        one dict per record holding either `status`, `description`, and
+        `probability` or the `error` that made it invalid
+        """
+        datautil.discretize(records)
+        status, p, valid, reasons = self.__bayes.make_predictions(
+            records, skip_invalid=True)
+        results = [{'error': f'BayesNet: {reasons[i]}'} if i in reasons else None
+                   for i in range(len(records))]
+        descriptions = self.__bayes.key_meta.get_arrival_statuses()
+        valid_indices = np.flatnonzero(valid).tolist()
+        for i, status_k, probability in zip(valid_indices, status.tolist(), p.tolist()):
+            results[i] = {
+                'status': status_k,
+                'description': descriptions[status_k],
+                'probability': probability
+            }
+        return results
@@ -0,0 +1,280 @@
+import csv
+import time
+from datetime import date, datetime
+from typing import Final
+
+import requests
+
+from intelliflight.util import datautil
+from intelliflight.util.nws_manager import Forecaster
+from intelliflight.models.bayes_net import Bayes_Net
+
+
+# Columns every input flight must hold
+BATCH_INPUT_COLUMNS: Final = (
+    'ORIGIN_AIRPORT_ID',
+    'DEST_AIRPORT_ID',
+    'OP_UNIQUE_CARRIER',
+    'FL_DATE',
+    'CRS_DEP_TIME'
+)
+
+# Optional raw weather columns (degrees F and MPH). Forecasts are fetched for
+# flights that leave any of them empty.
+BATCH_WEATHER_COLUMNS: Final = ('src_tavg', 'dst_tavg', 'src_wspd', 'dst_wspd')
+
+# Columns appended to each output row
+BATCH_OUTPUT_COLUMNS: Final = ('PREDICTED_STATUS', 'PROBABILITY', 'ERROR')
+
+DEFAULT_CHUNK_SIZE: Final = 10000
+
+# Exceptions that reject one flight rather than the whole batch: bad input
+# and failed forecasts. Forecaster requests raise `requests` exceptions,
+# which do not subclass the built-in ConnectionError.
+FLIGHT_ERRORS: Final = (ValueError, KeyError, ConnectionError,
+                        requests.RequestException)
+
+
+def parse_flight_date(fl_date: str) -> date:
+    """Parse a flight date given as `YYYY-MM-DD` or in the BTS format
+    `M/D/YYYY[ hh:mm:ss AM]`. Raises `ValueError` on any other format."""
+    if '/' in fl_date:
+        # date_arr = Flight date in [month, day, year] format
+        date_arr = fl_date.split(' ')[0].split('/')
+        if len(date_arr) != 3:
+            raise ValueError(f'Invalid flight date {fl_date}.')
+        return date(int(date_arr[2]), int(date_arr[0]), int(date_arr[1]))
+
+    return date.fromisoformat(fl_date)
+
+
+def get_forecast_weather(forecaster: Forecaster, forecasts: dict, bts_id: str, dep_timestamp: datetime) -> tuple[float, float]:
+    """Get the forecast temperature and wind speed at an airport for the
+    hour containing `dep_timestamp`. Each airport-hour is fetched once;
+    later calls are served from `forecasts`.
+
+    Positional arguments:
+
+    - forecaster -- `Forecaster` used to fetch forecasts
+    - forecasts -- dict of fetched weather keyed by `(bts_id, hour)`. Updated
+                   in-place.
+    - bts_id -- BTS ID of the airport
+    - dep_timestamp -- departure time
+
+    Returns:
+
+    - temperature (F)
+    - wind speed (MPH)
+
+    Raises the exceptions of `Forecaster.get_nws_forecast_from_bts()`.
+    """
+    hour = get_forecast_hour(dep_timestamp)
+    weather = forecasts.get((bts_id, hour))
+    if weather is None:
+        weather = read_forecast(forecaster.get_nws_forecast_from_bts(
+            int(bts_id), hour.isoformat()))
+        forecasts[(bts_id, hour)] = weather
+
+    return weather
+
+
+def get_forecast_hour(dep_timestamp: datetime) -> datetime:
+    """Get the start of the forecast hour containing `dep_timestamp`."""
+    return dep_timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def read_forecast(forecast: dict) -> tuple[float, float]:
+    """Read the temperature (F) and wind speed (MPH) of a forecast period
+    (see `Forecaster.get_nws_forecast_from_bts()`)."""
+    return float(forecast['temperature']), \
+        float(forecast['windSpeed'].split(' ')[0])
+
+
+def parse_flight(row: dict) -> tuple[dict, datetime]:
+    """Validate one input row and convert it into an undiscretized model
+    record without weather.
+
+    Positional arguments:
+
+    - row -- input row holding `BATCH_INPUT_COLUMNS`
+
+    Returns:
+
+    - record keyed by the data record keys of the model features other
+      than weather
+    - departure time
+
+    Raises `ValueError` if the row is malformed. Airports and carriers are
+    not checked against the training data here; see
+    `Bayes_Net.make_predictions(skip_invalid=True)`.
+    """
+    missing = [column_k for column_k in BATCH_INPUT_COLUMNS
+               if not row.get(column_k)]
+    if len(missing) > 0:
+        raise ValueError(f'Missing columns {missing}.')
+
+    dep_time = str(row['CRS_DEP_TIME']).rjust(4, '0')
+    if len(dep_time) != 4 or not dep_time.isdigit() \
+            or int(dep_time[:2]) > 23 or int(dep_time[2:]) > 59:
+        raise ValueError(f'Invalid departure time {dep_time}.')
+    dep_date = parse_flight_date(str(row['FL_DATE']))
+    record = {
+        'ORIGIN_AIRPORT_ID': str(row['ORIGIN_AIRPORT_ID']),
+        'DEST_AIRPORT_ID': str(row['DEST_AIRPORT_ID']),
+        'OP_UNIQUE_CARRIER': str(row['OP_UNIQUE_CARRIER']),
+        'DAY_OF_WEEK': str(dep_date.isoweekday()),
+        'CRS_DEP_TIME': dep_time
+    }
+    dep_timestamp = datetime.combine(
+        dep_date, datetime.strptime(dep_time, '%H%M').time())
+
+    return record, dep_timestamp
+
+
+def get_given_weather(row: dict) -> dict:
+    """Get the raw weather of an input row as floats keyed by
+    `BATCH_WEATHER_COLUMNS`, or `None` if any of them is empty. Raises
+    `ValueError` if a value is not a number."""
+    if not all(row.get(column_k) for column_k in BATCH_WEATHER_COLUMNS):
+        return None
+
+    return {column_k: float(row[column_k])
+            for column_k in BATCH_WEATHER_COLUMNS}
+
+
+def prepare_flight(row: dict, forecaster: Forecaster = None, forecasts: dict = None) -> dict:
+    """Convert one input row into an undiscretized model record.
+
+    Positional arguments:
+
+    - row -- input row holding `BATCH_INPUT_COLUMNS` and optionally
+             `BATCH_WEATHER_COLUMNS`
+
+    Keyword arguments:
+
+    - forecaster -- `Forecaster` used for rows without weather. If `None`,
+                    such rows are rejected.
+    - forecasts -- forecast memo passed to `get_forecast_weather()`
+
+    Returns:
+
+    record keyed by the data record keys of the model features, with raw
+    weather values
+
+    Raises `ValueError` if the row cannot be predicted, and the exceptions
+    of `Forecaster.get_nws_forecast_from_bts()` if a forecast fails.
+    """
+    record, dep_timestamp = parse_flight(row)
+    weather = get_given_weather(row)
+    if weather is not None:
+        record |= weather
+    elif forecaster is None:
+        raise ValueError('No weather given and forecasts are disabled.')
+    else:
+        if forecasts is None:
+            forecasts = {}
+        record['src_tavg'], record['src_wspd'] = get_forecast_weather(
+            forecaster, forecasts, record['ORIGIN_AIRPORT_ID'], dep_timestamp)
+        record['dst_tavg'], record['dst_wspd'] = get_forecast_weather(
+            forecaster, forecasts, record['DEST_AIRPORT_ID'], dep_timestamp)
+
+    return record
+
+
+def predict_csv(bayes: Bayes_Net, in_path: str, out_path: str, forecaster: Forecaster = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Predict the outcome of every flight in a CSV file, streaming the
+    input and writing the output one chunk at a time.
+
+    Positional arguments:
+
+    - bayes -- trained `Bayes_Net`
+    - in_path -- path to input CSV holding `BATCH_INPUT_COLUMNS` and
+                 optionally `BATCH_WEATHER_COLUMNS`
+    - out_path -- path to output CSV. Holds the input columns followed by
+                  `BATCH_OUTPUT_COLUMNS`.
+
+    Keyword arguments:
+
+    - forecaster -- `Forecaster` used to fetch weather for flights without
+                    it. If `None`, such flights are rejected.
+    - chunk_size -- number of flights held in memory and predicted at once
+
+    Rejected flights are written with an empty prediction and the reason in
+    the `ERROR` column.
+
+    Returns:
+
+    dict of run statistics:
+    - `rows` -- number of input flights
+    - `predicted` -- number of flights predicted
+    - `rejected` -- number of flights rejected
+    - `seconds` -- wall time of the run
+    - `rows_per_second` -- throughput
+    """
+    if chunk_size < 1:
+        raise ValueError(
+            f'batchutil: ERR: chunk_size={chunk_size} must be at least 1.')
+
+    start_time = time.perf_counter()
+    forecasts = {}
+    stats = {'rows': 0, 'predicted': 0, 'rejected': 0}
+    with open(in_path, 'r', encoding='utf-8', newline='') as f_in, \
+            open(out_path, 'w', encoding='utf-8', newline='') as f_out:
+        reader = csv.DictReader(f_in)
+        fieldnames = [column_k for column_k in (reader.fieldnames or [])
+                      if column_k not in BATCH_OUTPUT_COLUMNS]
+        writer = csv.DictWriter(
+            f_out, fieldnames=fieldnames + list(BATCH_OUTPUT_COLUMNS),
+            extrasaction='ignore')
+        writer.writeheader()
+
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                _predict_chunk(bayes, chunk, writer,
+                               forecaster, forecasts, stats)
+                chunk = []
+        if len(chunk) > 0:
+            _predict_chunk(bayes, chunk, writer, forecaster, forecasts, stats)
+
+    stats['seconds'] = time.perf_counter() - start_time
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] \
+        if stats['seconds'] > 0 else 0.0
+    return stats
+
+
+def _predict_chunk(bayes: Bayes_Net, chunk: list[dict], writer: csv.DictWriter, forecaster: Forecaster, forecasts: dict, stats: dict):
+    """Predict one chunk of input rows, write them, and update `stats`."""
+    records = []
+    record_rows = []
+    for row in chunk:
+        try:
+            records.append(prepare_flight(row, forecaster, forecasts))
+            record_rows.append(row)
+            row['ERROR'] = ''
+        except FLIGHT_ERRORS as e:
+            row['PREDICTED_STATUS'] = ''
+            row['PROBABILITY'] = ''
+            row['ERROR'] = str(e)
+
+    predicted = 0
+    if len(records) > 0:
+        datautil.discretize(records)
+        status, p, valid, reasons = bayes.make_predictions(
+            records, skip_invalid=True)
+        for i, reason in reasons.items():
+            record_rows[i]['PREDICTED_STATUS'] = ''
+            record_rows[i]['PROBABILITY'] = ''
+            record_rows[i]['ERROR'] = reason
+        valid_rows = [row for row, is_valid in zip(record_rows, valid.tolist())
+                      if is_valid]
+        for row, status_k, probability in zip(valid_rows, status.tolist(), p.tolist()):
+            row['PREDICTED_STATUS'] = status_k
+            row['PROBABILITY'] = probability
+        predicted = len(valid_rows)
+
+    writer.writerows(chunk)
+    stats['rows'] += len(chunk)
+    stats['predicted'] += predicted
+    stats['rejected'] += len(chunk) - predicted
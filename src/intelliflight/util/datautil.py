@@ -1,25 +1,41 @@
 import json
 import csv
+import glob
+import os
 from pathlib import Path
 import random
 import math
+import numpy as np
 
 from bisect import bisect_right
-from intelliflight.util import typeutil
+from collections.abc import Iterable, Iterator
+from functools import cache
+from typing import Final, Union
+from intelliflight.util import typeutil, weatherstore
 
 from intelliflight.constants import WEATHER_FIELDS, TIME_INTERVAL_SIZE
 
 
 data_dir = Path(__file__).parent.parent.parent.parent / 'data'
 
+# Reasons for which merge_training_data() prunes flights
+DROP_REASONS: Final = ('unknown_airport', 'no_weather', 'incomplete_weather')
 
-def merge_training_data(flight_path: str, weather_path: str):
+
+def merge_training_data(flight_path: str, weather_path: str, drop_counts: dict = None):
     """Merge data & collate data keys contained therein.
 
     Positional vrguments:
 
     - flight_path -- path to flight data file
-    - weather_path -- path to weather data file
+    - weather_path -- path to weather data file, either a weather store or
+                      historical weather JSON (see
+                      `weatherstore.open_weather_store()`)
+
+    Keyword arguments:
+
+    - drop_counts -- dict to which the number of flights pruned for each
+                     reason in `DROP_REASONS` is added, if given
 
     Returns:
 
@@ -45,67 +61,272 @@ def merge_training_data(flight_path: str, weather_path: str):
       - `dst_wspd` (wind speed at destination)
     - Data are NOT discretized at this stage.
     """
-    flight_data = []
-    weather_data = None
-    known_airports = None
-    # Read data from files
-    with open(flight_path, 'r', encoding="utf-8") as f_in, \
-            open(weather_path, 'r', encoding="utf-8") as w_in, \
-        (data_dir / 'maps' / 'airport_mappings.json').open(encoding="utf-8") as a_in:
-        # Load known airport mappings
-        mappings = json.load(a_in)
-        typeutil.AIRPORT_MAP_SCHEMA.validate(mappings)
-        known_airports = [i['bts_id'] for i in mappings]
-
-        # Load weather data
-        weather_data = json.load(w_in)
-
-        # Load flight data
-        for row in csv.DictReader(f_in):
-            flight_data.append(row)
-
     merged_data = []
     seen_carriers = set()
     seen_src = set()
     seen_dst = set()
 
-    for row in flight_data:
-        # date_arr = Flight date in [month, day, year] format
-        date_arr = row['FL_DATE'].split(' ')[0].split('/')
-        # Convert to YYYY-MM-DD string
-        ymd_date = f'{date_arr[2]}-{date_arr[0].rjust(2, "0")}-{date_arr[1].rjust(2, "0")}'
-
-        # Check that weather data exists for the source and destination airports
-        # Also check that src and dst airports are known
-        # First, check that src and dst airports are in weather data
-        # Next, check that the relevant date has weather data for src and dst
-        # Finally, check that src and dst are known in the mappings file
-        if str(row['ORIGIN_AIRPORT_ID']) in weather_data.keys() and str(row['DEST_AIRPORT_ID']) in weather_data.keys() \
-                and ymd_date in weather_data[str(row['ORIGIN_AIRPORT_ID'])].keys() \
-                and ymd_date in weather_data[str(row['DEST_AIRPORT_ID'])].keys() \
-                and str(row['ORIGIN_AIRPORT_ID']) in known_airports and str(row['DEST_AIRPORT_ID']) in known_airports:
-            # Read flight data at source and destination
-            flight_weather = {
-                'src': weather_data[str(row['ORIGIN_AIRPORT_ID'])][ymd_date],
-                'dst': weather_data[str(row['DEST_AIRPORT_ID'])][ymd_date]
-            }
-            # Check that for source and destination weather,
-            # all relevant weather fields exist (i.e., are not null).
-            if all([all([i[key['historical']] is not None for i in flight_weather.values()]) for key in WEATHER_FIELDS]):
-                # Generate merged data point
-                merged_row = row
-                for key in [i['historical'] for i in WEATHER_FIELDS]:
-                    merged_row[f'src_{key}'] = flight_weather['src'][key]
-                    merged_row[f'dst_{key}'] = flight_weather['dst'][key]
-
-                merged_data.append(merged_row)
-                seen_src.add(str(row['ORIGIN_AIRPORT_ID']))
-                seen_dst.add(str(row['DEST_AIRPORT_ID']))
-                seen_carriers.add(str(row['OP_UNIQUE_CARRIER']))
+    for row in stream_merged_flights(flight_path, weather_path, drop_counts):
+        merged_data.append(row)
+        seen_src.add(str(row['ORIGIN_AIRPORT_ID']))
+        seen_dst.add(str(row['DEST_AIRPORT_ID']))
+        seen_carriers.add(str(row['OP_UNIQUE_CARRIER']))
 
     return merged_data, seen_carriers, seen_src, seen_dst
 
 
+def stream_merged_flights(flight_path: str, weather_path: Union[str, weatherstore.WeatherStore], drop_counts: dict = None, byte_range: tuple[int, int] = None) -> Iterator[dict]:
+    """Stream the records of `merge_training_data()` one at a time, without
+    holding the flight data in memory. The stages are, in order,
+    `read_flight_rows()`, `parse_flight_dates()`, `filter_flights()`, and
+    `join_weather()`; chain `discretize_records()` to discretize them.
+
+    The airport mappings and weather are opened immediately; the flight data
+    is read as the records are consumed.
+
+    Positional arguments:
+
+    - flight_path -- path to flight data file
+    - weather_path -- path to weather data file (see
+                      `merge_training_data()`), or a `WeatherStore` already
+                      opened
+
+    Keyword arguments:
+
+    - drop_counts -- dict to which the number of flights pruned for each
+                     reason in `DROP_REASONS` is added as the records are
+                     consumed, if given
+    - byte_range -- range of the flight data file to read (see
+                    `read_flight_rows()`)
+
+    Returns:
+
+    iterator of merged records. Data are NOT discretized.
+    """
+    if drop_counts is None:
+        drop_counts = {}
+    known_airports = load_known_airports()
+    if isinstance(weather_path, weatherstore.WeatherStore):
+        weather = weather_path
+    else:
+        weather = weatherstore.open_weather_store(weather_path)
+
+    return join_weather(
+        filter_flights(parse_flight_dates(
+            read_flight_rows(flight_path, byte_range)), known_airports, drop_counts),
+        weather, drop_counts)
+
+
+def resolve_flight_paths(flight_paths: Union[str, list[str]]) -> list[str]:
+    """Resolve flight data paths, expanding glob patterns (e.g.,
+    `flights/2019_*.csv`). Matches of each pattern are sorted by name.
+
+    Positional arguments:
+
+    - flight_paths -- path or glob pattern, or a list of them
+
+    Returns:
+
+    list of flight data file paths, in the given order
+
+    Raises `FileNotFoundError` if a path does not exist or a pattern matches
+    no files.
+    """
+    if isinstance(flight_paths, (str, Path)):
+        flight_paths = [flight_paths]
+
+    resolved = []
+    for flight_path in flight_paths:
+        flight_path = str(flight_path)
+        if glob.has_magic(flight_path):
+            matches = sorted(glob.glob(flight_path))
+            if len(matches) == 0:
+                raise FileNotFoundError(
+                    f'No flight data files match {flight_path}.')
+            resolved.extend(matches)
+        elif not Path(flight_path).is_file():
+            raise FileNotFoundError(
+                f'Flight data file {flight_path} does not exist.')
+        else:
+            resolved.append(flight_path)
+
+    return resolved
+
+
+def get_file_fingerprint(path: str) -> dict:
+    """Identify the contents of the file at `path` by its absolute path,
+    size, and modification time, without reading it."""
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+
+def get_csv_chunks(flight_path: str, chunk_bytes: int) -> list[tuple[int, int]]:
+    """Split the rows of a CSV file into byte ranges of about `chunk_bytes`
+    that start and end on line boundaries, for `read_flight_rows()`. The
+    header line is excluded. Fields must not hold line breaks, which BTS
+    data never does.
+
+    Returns:
+
+    list of `(start, end)` byte offsets (start inclusive, end exclusive)
+    covering every row once, in file order. Empty if the file has no rows.
+    """
+    if chunk_bytes < 1:
+        raise ValueError(
+            f'datautil: ERR: chunk_bytes={chunk_bytes} must be at least 1.')
+
+    with open(flight_path, 'rb') as f_in:
+        f_in.readline()
+        bounds = [f_in.tell()]
+        size = os.fstat(f_in.fileno()).st_size
+        while bounds[-1] + chunk_bytes < size:
+            # Finish the line holding the last byte of the chunk
+            f_in.seek(bounds[-1] + chunk_bytes - 1)
+            f_in.readline()
+            if f_in.tell() >= size:
+                break
+            bounds.append(f_in.tell())
+        bounds.append(size)
+
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:])
+            if start < end]
+
+
+@cache
+def load_known_airports() -> frozenset[str]:
+    """Read the bts_id of each airport in `airport_mappings.json`. The file
+    is read once per process."""
+    with (data_dir / 'maps' / 'airport_mappings.json').open(encoding="utf-8") as a_in:
+        mappings = json.load(a_in)
+    typeutil.AIRPORT_MAP_SCHEMA.validate(mappings)
+    return frozenset(str(i['bts_id']) for i in mappings)
+
+
+def read_flight_rows(flight_path: str, byte_range: tuple[int, int] = None) -> Iterator[dict]:
+    """Read the rows of a BTS flight data CSV one at a time.
+
+    Keyword arguments:
+
+    - byte_range -- `(start, end)` byte offsets of the rows to read, as
+                    returned by `get_csv_chunks()`. If `None`, every row is
+                    read.
+    """
+    with open(flight_path, 'rb') as f_in:
+        fieldnames = next(csv.reader([f_in.readline().decode('utf-8')]), None)
+        if fieldnames is None:
+            # Empty file
+            return
+        end = None
+        if byte_range is not None:
+            f_in.seek(byte_range[0])
+            end = byte_range[1]
+
+        def read_lines() -> Iterator[str]:
+            position = f_in.tell()
+            for line in f_in:
+                if end is not None and position >= end:
+                    break
+                position += len(line)
+                yield line.decode('utf-8')
+
+        yield from csv.DictReader(read_lines(), fieldnames)
+
+
+def parse_flight_dates(rows: Iterable[dict]) -> Iterator[tuple[str, dict]]:
+    """Pair each flight row with its flight date in `YYYY-MM-DD` format.
+    BTS dates (`FL_DATE`) are in `M/D/YYYY 12:00:00 AM` format."""
+    # Flight files span few distinct dates, so each is converted once
+    ymd_dates: dict[str, str] = {}
+    for row in rows:
+        fl_date = row['FL_DATE']
+        ymd_date = ymd_dates.get(fl_date)
+        if ymd_date is None:
+            # date_arr = Flight date in [month, day, year] format
+            date_arr = fl_date.split(' ')[0].split('/')
+            # Convert to YYYY-MM-DD string
+            ymd_date = f'{date_arr[2]}-{date_arr[0].rjust(2, "0")}-{date_arr[1].rjust(2, "0")}'
+            ymd_dates[fl_date] = ymd_date
+        yield ymd_date, row
+
+
+def filter_flights(dated_rows: Iterable[tuple[str, dict]], known_airports: frozenset[str], drop_counts: dict) -> Iterator[tuple[str, dict]]:
+    """Keep the dated flight rows (see `parse_flight_dates()`) whose source
+    and destination are both known airports. This runs before the weather
+    join so that pruned rows are never joined.
+
+    Positional arguments:
+
+    - dated_rows -- iterable of `(ymd_date, row)`
+    - known_airports -- set of the bts_id of each known airport (see
+                        `load_known_airports()`)
+    - drop_counts -- dict to which pruned rows are added under
+                     `'unknown_airport'`
+    """
+    for ymd_date, row in dated_rows:
+        if row['ORIGIN_AIRPORT_ID'] in known_airports and row['DEST_AIRPORT_ID'] in known_airports:
+            yield ymd_date, row
+        else:
+            drop_counts['unknown_airport'] = drop_counts.get(
+                'unknown_airport', 0) + 1
+
+
+def join_weather(dated_rows: Iterable[tuple[str, dict]], weather: weatherstore.WeatherStore, drop_counts: dict) -> Iterator[dict]:
+    """Join dated flight rows (see `parse_flight_dates()`) with the weather
+    at their source and destination airports on their date, merging it into
+    them as `src_<field>` and `dst_<field>` for each field of
+    `WEATHER_FIELDS`.
+
+    Rows are pruned if either airport has no weather on their date
+    (`'no_weather'`) or lacks a weather field (`'incomplete_weather'`); the
+    source airport is checked first. Pruned rows are added to `drop_counts`
+    under their reason.
+
+    Each airport's weather on each date is looked up once and indexed by
+    airport and date, so the cost per row is a few dict lookups.
+    """
+    fields = [i['historical'] for i in WEATHER_FIELDS]
+    src_keys = [f'src_{key}' for key in fields]
+    dst_keys = [f'dst_{key}' for key in fields]
+    # Per-airport date index of weather values, or of the reason they
+    # cannot be used
+    date_index: dict[str, dict[str, Union[tuple, str]]] = {}
+
+    def get_values(bts_id: str, ymd_date: str) -> Union[tuple, str]:
+        airport_dates = date_index.get(bts_id)
+        if airport_dates is None:
+            airport_dates = date_index[bts_id] = {}
+        values = airport_dates.get(ymd_date)
+        if values is None:
+            record = weather.lookup(bts_id, ymd_date)
+            if record is None:
+                values = 'no_weather'
+            elif any(record[key] is None for key in fields):
+                values = 'incomplete_weather'
+            else:
+                values = tuple(record[key] for key in fields)
+            airport_dates[ymd_date] = values
+        return values
+
+    for ymd_date, row in dated_rows:
+        src_values = get_values(row['ORIGIN_AIRPORT_ID'], ymd_date)
+        if type(src_values) is str:
+            drop_counts[src_values] = drop_counts.get(src_values, 0) + 1
+            continue
+        dst_values = get_values(row['DEST_AIRPORT_ID'], ymd_date)
+        if type(dst_values) is str:
+            drop_counts[dst_values] = drop_counts.get(dst_values, 0) + 1
+            continue
+
+        # Generate merged data point
+        row.update(zip(src_keys, src_values))
+        row.update(zip(dst_keys, dst_values))
+        yield row
+
+
 def shuffle_and_partition(dataset: list, rng_seed: int, partition_count: int) -> list[int]:
     """Shuffle dataset in-place with passed RNG seed and return partition starting indices.
 
@@ -127,8 +348,44 @@ def shuffle_and_partition(dataset: list, rng_seed: int, partition_count: int) ->
     # Shuffle dataset in-place
     random.seed(rng_seed)
     random.shuffle(dataset)
+    return get_partition_starts(len(dataset), partition_count)
+
+
+def permute_and_partition(data_len: int, rng_seed: int, partition_count: int) -> tuple[np.ndarray, list[int]]:
+    """Generate a seeded permutation of record indices and return it with
+    partition starting indices. Unlike `shuffle_and_partition()`, no data is
+    moved: partition `i` holds the records at
+    `order[starts[i]:starts[i + 1]]`.
+
+    The permutation is the order `shuffle_and_partition()` would give a
+    dataset of length `data_len` with the same `rng_seed`.
+
+    Positional arguments:
+
+    - data_len -- number of records to permute
+    - rng_seed -- seed value for `random.seed()`
+    - partition_count -- number of data partitions to generate
+
+    Returns:
+
+    - order -- array holding a permutation of `0..data_len - 1`
+    - starts -- list of starting positions in `order` for each partition
+
+    Post-conditions:
+
+    - RNG is reseeded based on `rng_seed`
+    """
+    random.seed(rng_seed)
+    order = list(range(data_len))
+    random.shuffle(order)
+    return np.array(order, dtype=np.intp), get_partition_starts(data_len, partition_count)
+
+
+def get_partition_starts(data_len: int, partition_count: int) -> list[int]:
+    """Split `data_len` records into `partition_count` near-equal
+    partitions and return the starting index of each."""
     # Get exact starting position of each partition
-    l = len(dataset)
+    l = data_len
     partition_size = l / partition_count
     partition_indices = [0]
     for i in range(partition_count - 1):
@@ -138,6 +395,28 @@ def shuffle_and_partition(dataset: list, rng_seed: int, partition_count: int) ->
     return [math.floor(i) for i in partition_indices]
 
 
+@cache
+def load_bucket_maps() -> tuple[tuple, tuple, tuple, tuple]:
+    """Read the temperature and wind speed maps used by `discretize()`.
+    The files are read once per process; the returned values are shared
+    and must not be modified.
+
+    Returns:
+
+    - rows of `temp_ranges.csv`
+    - lower bound of each temperature bucket after the first
+    - rows of `wind_speeds.csv`
+    - lower bound of each wind speed bucket after the first
+    """
+    with (data_dir / 'maps' / 'wind_speeds.csv').open('r', encoding='utf-8') as w_in, \
+            (data_dir / 'maps' / 'temp_ranges.csv').open('r', encoding='utf-8') as t_in:
+        wind_map = tuple(csv.DictReader(w_in))
+        temp_map = tuple(csv.DictReader(t_in))
+
+    return temp_map, tuple(float(i['min']) for i in temp_map[1:]), \
+        wind_map, tuple(float(i['min']) for i in wind_map[1:])
+
+
 def discretize(dataset: list):
     """Discretize weather and time data in-place.
 
@@ -156,25 +435,25 @@ def discretize(dataset: list):
     - Departure time is floored to a 30-minute increment (`hh00` or `hh30`).
     - All data keys other than those specified above are untouched.
     """
-    wind_map = None
-    temp_map = None
-    with (data_dir / 'maps' / 'wind_speeds.csv').open('r', encoding='utf-8') as w_in, \
-            (data_dir / 'maps' / 'temp_ranges.csv').open('r', encoding='utf-8') as t_in:
-        wind_map = list(csv.DictReader(w_in))
-        temp_map = list(csv.DictReader(t_in))
+    for _ in discretize_records(dataset):
+        pass
+
+
+def discretize_records(records: Iterable[dict]) -> Iterator[dict]:
+    """Discretize each record of `records` in-place as in `discretize()`,
+    yielding it once done. Records are discretized as they are consumed."""
+    temp_map, temp_thresholds, wind_map, wind_thresholds = load_bucket_maps()
 
-    for row in dataset:
+    for row in records:
         for prefix in ['src_', 'dst_']:
             # Discretize temperature
             temp = row[f'{prefix}tavg']
-            thresholds = [float(i['min']) for i in temp_map[1:]]
-            index = bisect_right(thresholds, temp)
+            index = bisect_right(temp_thresholds, temp)
             row[f'{prefix}tavg'] = temp_map[index]['key']
 
             # Discretize wind speed
             wind = row[f'{prefix}wspd']
-            thresholds = [float(i['min']) for i in wind_map[1:]]
-            index = bisect_right(thresholds, wind)
+            index = bisect_right(wind_thresholds, wind)
             row[f'{prefix}wspd'] = temp_map[index]['key']
 
         # Discretize timestamp into 30min segments
@@ -184,3 +463,4 @@ def discretize(dataset: list):
         dep_min = int(dep_time[2:])
         new_min = str(dep_min - (dep_min % TIME_INTERVAL_SIZE))
         row['CRS_DEP_TIME'] = f'{dep_time[:2]}{new_min.rjust(2, "0")}'
+        yield row
@@ -48,10 +48,21 @@ class Forecaster:
         ValueError -- Raised if iso_timestamp is not in range (now, now + 7 days).
         """
 
-        # Validate timestamp format
-        if iso_timestamp[-1] == 'Z':
-            iso_timestamp = iso_timestamp[:-1]
+        # Validate timestamp format before making any requests
+        datetime.datetime.fromisoformat(
+            iso_timestamp[:-1] if iso_timestamp[-1] == 'Z' else iso_timestamp)
+
+        hourly_url = self.get_hourly_forecast_url(bts_id)
+        return Forecaster.find_period(
+            self.get_hourly_periods(hourly_url), iso_timestamp)
 
+    def get_hourly_forecast_url(self, bts_id: int) -> str:
+        """Get the URL of the hourly forecast covering an airport.
+
+        Exceptions:
+        ConnectionError -- Raised if the API request to NWS fails.
+        KeyError -- Raised if the requested BTS ID is not in the mappings file.
+        """
         for airport in self.AIRPORT_MAPPINGS:
             # Find BTS ID in known airports
             if int(airport['bts_id']) == bts_id:
@@ -67,33 +78,51 @@ class Forecaster:
                     raise ConnectionError(
                         f'NWS point lookup returned {point_res.status_code}: {point_res.text}')
 
-                # Get hourly forecast for the next 7 days using URL provided
-                # in the previous API response's body
-                hourly_res: requests.Response = self.http_get(
-                    point_res.json()['properties']['forecastHourly'])
+                return point_res.json()['properties']['forecastHourly']
 
-                if hourly_res.status_code != 200:
-                    raise ConnectionError(
-                        f'NWS forecast lookup returned {hourly_res.status_code}: {hourly_res.text}')
+        # Provided airport is unknown
+        raise KeyError(f'No airport with BTS ID {bts_id} found in mappings.')
 
-                # From all 1-hour periods in the forecast, find and return
-                # the one containing iso_timestamp
-                requested_timestamp = datetime.datetime.fromisoformat(
-                    iso_timestamp)
-                for period in hourly_res.json()['properties']['periods']:
-                    start_time = datetime.datetime.fromisoformat(
-                        period['startTime'])
-                    end_time = datetime.datetime.fromisoformat(
-                        period['endTime'])
+    def get_hourly_periods(self, hourly_url: str) -> list[dict]:
+        """Get all 1-hour periods of the hourly forecast at `hourly_url`
+        (see `get_hourly_forecast_url()`).
 
-                    if start_time.timestamp() <= requested_timestamp.timestamp() < end_time.timestamp():
-                        return period
+        Exceptions:
+        ConnectionError -- Raised if the API request to NWS fails.
+        """
+        # Get hourly forecast for the next 7 days
+        hourly_res: requests.Response = self.http_get(hourly_url)
 
-                raise ValueError(
-                    f'Timestamp {iso_timestamp} is outside the allowed range.')
+        if hourly_res.status_code != 200:
+            raise ConnectionError(
+                f'NWS forecast lookup returned {hourly_res.status_code}: {hourly_res.text}')
 
-        # Provided airport is unknown
-        raise KeyError(f'No airport with BTS ID {bts_id} found in mappings.')
+        return hourly_res.json()['properties']['periods']
+
+    @staticmethod
+    def find_period(periods: list[dict], iso_timestamp: str) -> dict:
+        """Find the period containing `iso_timestamp` among the periods of an
+        hourly forecast (see `get_hourly_periods()`).
+
+        Exceptions:
+        ValueError -- Raised if no period contains iso_timestamp.
+        """
+        # Validate timestamp format
+        if iso_timestamp[-1] == 'Z':
+            iso_timestamp = iso_timestamp[:-1]
+
+        # From all 1-hour periods in the forecast, find and return
+        # the one containing iso_timestamp
+        requested_timestamp = datetime.datetime.fromisoformat(iso_timestamp)
+        for period in periods:
+            start_time = datetime.datetime.fromisoformat(period['startTime'])
+            end_time = datetime.datetime.fromisoformat(period['endTime'])
+
+            if start_time.timestamp() <= requested_timestamp.timestamp() < end_time.timestamp():
+                return period
+
+        raise ValueError(
+            f'Timestamp {iso_timestamp} is outside the allowed range.')
 
 
 # if __name__ == '__main__':
@@ -0,0 +1,276 @@
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Final
+
+import numpy as np
+
+from intelliflight.util import batchutil, datautil
+from intelliflight.util.nws_manager import Forecaster
+from intelliflight.models.bayes_net import Bayes_Net
+
+
+DEFAULT_HOST: Final = '127.0.0.1'
+DEFAULT_PORT: Final = 8080
+DEFAULT_WORKERS: Final = 4
+
+# Number of most recent request latencies kept for percentiles
+LATENCY_WINDOW: Final = 10000
+
+# Largest accepted request body in bytes
+MAX_BODY_SIZE: Final = 2 ** 24
+
+
+class LatencyStats:
+    """Thread-safe record of request latencies. Stores the following:
+
+    - Number of requests and of failed requests since startup
+    - Latencies (seconds) of the `window` most recent requests
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        if window < 1:
+            raise ValueError(
+                f'LatencyStats: ERR: window={window} must be at least 1.')
+
+        self.__lock = threading.Lock()
+        self.__latencies: deque = deque(maxlen=window)
+        self.__requests: int = 0
+        self.__errors: int = 0
+        self.__start_time: float = time.time()
+
+    def record(self, seconds: float, error: bool = False):
+        """Record one request that took `seconds`."""
+        with self.__lock:
+            self.__latencies.append(seconds)
+            self.__requests += 1
+            if error:
+                self.__errors += 1
+
+    def summary(self) -> dict:
+        """Summarize recorded requests.
+
+        Returns:
+
+        dict holding `requests`, `errors`, and `uptime_s`, as well as the
+        `mean_ms`, `p50_ms`, `p95_ms`, `p99_ms`, and `max_ms` latencies of
+        the most recent requests (`None` if there were none)
+        """
+        with self.__lock:
+            latencies = np.array(self.__latencies) * 1000
+            summary = {
+                'requests': self.__requests,
+                'errors': self.__errors,
+                'uptime_s': round(time.time() - self.__start_time, 3)
+            }
+
+        if len(latencies) == 0:
+            return summary | {key: None for key in
+                              ['mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']}
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+        return summary | {
+            'mean_ms': round(float(latencies.mean()), 3),
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'max_ms': round(float(latencies.max()), 3)
+        }
+
+
+class PredictionServer(HTTPServer):
+    """HTTP server answering JSON prediction requests with a model loaded
+    once at startup. Requests are handled by a fixed pool of worker
+    threads.
+
+    Endpoints:
+
+    - `POST /predict` -- body is one flight or `{ "flights": [...] }`, each
+      flight holding the columns of `batchutil.BATCH_INPUT_COLUMNS` and
+      optionally `batchutil.BATCH_WEATHER_COLUMNS`. Responds with
+      `{ "predictions": [...] }`, one entry per flight holding either
+      `status`, `description`, and `probability` or an `error`.
+    - `GET /health` -- responds with `{ "status": "ok", ... }`
+    - `GET /stats` -- responds with `LatencyStats.summary()` of
+      `/predict` requests
+    """
+
+    def __init__(self, bayes: Bayes_Net, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = DEFAULT_WORKERS, forecaster: Forecaster = None):
+        """Bind the server without serving yet. Run `serve_forever()` to
+        serve.
+
+        Positional arguments:
+
+        - bayes -- trained `Bayes_Net`
+
+        Keyword arguments:
+
+        - host -- address to bind
+        - port -- port to bind. 0 picks a free port (see `server_address`).
+        - workers -- number of worker threads
+        - forecaster -- `Forecaster` used to fetch weather for flights
+                        without it. If `None`, such flights are rejected.
+        """
+        if workers < 1:
+            raise ValueError(
+                f'PredictionServer: ERR: workers={workers} must be at least 1.')
+        if not bayes.p_tables.is_fit():
+            raise BufferError(
+                'PredictionServer: ERR: Model is not trained. Train the model or load parameters first.')
+
+        self.bayes = bayes
+        self.forecaster = forecaster
+        self.latency_stats = LatencyStats()
+        self.workers = workers
+        # Forecasts keyed by (airport, hour); see batchutil.get_forecast_weather()
+        # Dropped every hour so that they stay current and bounded in number
+        self.forecasts: dict = {}
+        self.__forecasts_hour: int = None
+        self.__forecasts_lock = threading.Lock()
+        # The model and its caches are not thread-safe
+        self.model_lock = threading.Lock()
+        self.__pool = ThreadPoolExecutor(max_workers=workers)
+        # Read discretization maps before the first request
+        datautil.load_bucket_maps()
+        super().__init__((host, port), PredictionRequestHandler)
+
+    def predict(self, flights: list[dict]) -> list[dict]:
+        """Predict the outcome of each flight in `flights` (see
+        `batchutil.prepare_flight()`).
+
+        Returns:
+
+        one dict per flight holding either `status`, `description`, and
+        `probability` or an `error`
+        """
+        current_hour = int(time.time() // 3600)
+        with self.__forecasts_lock:
+            if current_hour != self.__forecasts_hour:
+                self.forecasts = {}
+                self.__forecasts_hour = current_hour
+            forecasts = self.forecasts
+
+        results = [None] * len(flights)
+        records = []
+        record_indices = []
+        for i, flight in enumerate(flights):
+            try:
+                if not isinstance(flight, dict):
+                    raise ValueError('Flight must be a JSON object.')
+                records.append(batchutil.prepare_flight(
+                    flight, self.forecaster, forecasts))
+                record_indices.append(i)
+            except batchutil.FLIGHT_ERRORS as e:
+                results[i] = {'error': str(e)}
+
+        if len(records) > 0:
+            datautil.discretize(records)
+            with self.model_lock:
+                status, p, valid, reasons = self.bayes.make_predictions(
+                    records, skip_invalid=True)
+            for j, reason in reasons.items():
+                results[record_indices[j]] = {'error': f'BayesNet: {reason}'}
+            record_indices = np.asarray(record_indices)[valid].tolist()
+            descriptions = self.bayes.key_meta.get_arrival_statuses()
+            for i, status_k, probability in zip(record_indices, status.tolist(), p.tolist()):
+                results[i] = {
+                    'status': status_k,
+                    'description': descriptions[status_k],
+                    'probability': probability
+                }
+
+        return results
+
+    def process_request(self, request, client_address):
+        """Hand the request to a worker thread."""
+        self.__pool.submit(self.__process_request_worker,
+                           request, client_address)
+
+    def server_close(self):
+        """Close the socket and wait for running requests to finish."""
+        super().server_close()
+        self.__pool.shutdown(wait=True)
+
+    def __process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """Handles the endpoints of `PredictionServer`."""
+
+    server: PredictionServer
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.__send_json(HTTPStatus.OK, {
+                'status': 'ok',
+                'workers': self.server.workers,
+                'forecasts': self.server.forecaster is not None
+            })
+        elif self.path == '/stats':
+            self.__send_json(HTTPStatus.OK,
+                             self.server.latency_stats.summary())
+        else:
+            self.__send_json(HTTPStatus.NOT_FOUND,
+                             {'error': f'Unknown endpoint {self.path}.'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self.__send_json(HTTPStatus.NOT_FOUND,
+                             {'error': f'Unknown endpoint {self.path}.'})
+            return
+
+        start_time = time.perf_counter()
+        try:
+            body_len = int(self.headers.get('Content-Length', 0))
+            if not (0 < body_len <= MAX_BODY_SIZE):
+                raise ValueError(
+                    f'Content-Length must be in range [1,{MAX_BODY_SIZE}].')
+            body = json.loads(self.rfile.read(body_len))
+            if isinstance(body, dict) and 'flights' in body:
+                flights = body['flights']
+                if not isinstance(flights, list):
+                    raise ValueError('flights must be a JSON array.')
+            else:
+                flights = [body]
+
+            response = {'predictions': self.server.predict(flights)}
+            status = HTTPStatus.OK
+
+        except ValueError as e:
+            # Also covers malformed JSON
+            status = HTTPStatus.BAD_REQUEST
+            response = {'error': str(e)}
+
+        except Exception as e:
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            response = {'error': str(e)}
+
+        finally:
+            # Record before responding so that the request is counted by the
+            # time the client sees the response
+            self.server.latency_stats.record(
+                time.perf_counter() - start_time, status != HTTPStatus.OK)
+
+        self.__send_json(status, response)
+
+    def log_message(self, format, *args):
+        # Per-request logging to stderr would dominate response times
+        pass
+
+    def __send_json(self, status: HTTPStatus, body: dict):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
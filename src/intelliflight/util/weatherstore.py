@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import struct
+from datetime import date, timedelta
+from typing import Final, Optional
+
+import numpy as np
+
+from intelliflight.constants import WEATHER_FIELDS
+
+
+# Leading bytes of a weather store file
+STORE_MAGIC: Final = b'IFWXSTOR'
+STORE_VERSION: Final = 1
+
+# Historical weather fields kept in a store, in storage order
+STORE_FIELDS: Final = tuple(field['historical'] for field in WEATHER_FIELDS)
+
+# Value matrix alignment within a store file
+_DATA_ALIGNMENT: Final = 64
+_PREFIX: Final = struct.Struct('<8sI')
+
+
+class WeatherStore:
+    """Historical daily weather at each airport, indexed by airport and day.
+    Stores the following:
+
+    - Row of each airport (bts_id) in the value matrix
+    - First date covered and number of days covered
+    - Value matrix of shape (airports, days, fields), with `NaN` for missing
+      values and days. This is memory-mapped when the store is read from a
+      store file (see `open_weather_store()`), so only the pages touched by
+      lookups are read.
+    - Presence matrix of shape (airports, days) marking the days each
+      airport has a record for, so that a recorded day missing every field
+      is told apart from a day without a record
+    - Checksum identifying the contents of the store
+    """
+
+    def __init__(self, bts_ids: list[str], start_date: date, values: np.ndarray, present: np.ndarray = None, checksum: str = None):
+        """Positional arguments:
+
+        - bts_ids -- airport of each row of `values`
+        - start_date -- date of the first column of `values`
+        - values -- array of shape `(len(bts_ids), days, len(STORE_FIELDS))`
+
+        Keyword arguments:
+
+        - present -- boolean array of shape `(len(bts_ids), days)` marking
+                     recorded days. If `None`, days with any value are
+                     recorded.
+        - checksum -- checksum of the contents. Computed if `None`.
+        """
+        if values.shape[0] != len(bts_ids) or values.ndim != 3 \
+                or values.shape[2] != len(STORE_FIELDS):
+            raise ValueError(
+                f'WeatherStore: ERR: values of shape {values.shape} do not match {len(bts_ids)} airports and {len(STORE_FIELDS)} fields.')
+        if present is None:
+            present = ~np.isnan(values).all(axis=2)
+        elif present.shape != values.shape[:2]:
+            raise ValueError(
+                f'WeatherStore: ERR: present of shape {present.shape} does not match values of shape {values.shape}.')
+
+        self.__rows: dict[str, int] = {
+            str(bts_id): i for i, bts_id in enumerate(bts_ids)}
+        self.__start_date: date = start_date
+        self.__start_ordinal: int = start_date.toordinal()
+        self.__values: np.ndarray = values
+        self.__present: np.ndarray = present
+        # Day offset of each date string looked up so far
+        self.__day_offsets: dict[str, int] = {}
+        self.__checksum: str = checksum if checksum is not None \
+            else _get_checksum(list(self.__rows), start_date, values, present)
+
+    def get_airports(self) -> tuple[str, ...]:
+        """Get the bts_id of each airport in the store, in row order."""
+        return tuple(self.__rows)
+
+    def get_date_range(self) -> tuple[date, date]:
+        """Get the first date and the day after the last date covered."""
+        return self.__start_date, \
+            self.__start_date + timedelta(days=self.__values.shape[1])
+
+    def get_checksum(self) -> str:
+        """Get the checksum of the contents of the store. Stores with equal
+        checksums hold the same weather."""
+        return self.__checksum
+
+    def get_values(self) -> np.ndarray:
+        """Get the value matrix of shape (airports, days, fields). Must not
+        be modified."""
+        return self.__values
+
+    def get_present(self) -> np.ndarray:
+        """Get the presence matrix of shape (airports, days). Must not be
+        modified."""
+        return self.__present
+
+    def lookup(self, bts_id: str, ymd_date: str) -> Optional[dict]:
+        """Look up the weather at an airport on a date.
+
+        Positional arguments:
+
+        - bts_id -- airport BTS ID
+        - ymd_date -- date in `YYYY-MM-DD` format
+
+        Returns:
+
+        dict mapping each of `STORE_FIELDS` to its value (`None` if
+        missing), or `None` if the airport has no record for the date
+        """
+        row = self.__rows.get(str(bts_id))
+        if row is None:
+            return None
+
+        day = self.__day_offsets.get(ymd_date)
+        if day is None:
+            try:
+                day = date.fromisoformat(ymd_date).toordinal() - \
+                    self.__start_ordinal
+            except ValueError:
+                day = -1
+            self.__day_offsets[ymd_date] = day
+        if not (0 <= day < self.__values.shape[1]) or not self.__present[row, day]:
+            return None
+
+        values = self.__values[row, day].tolist()
+        return {field: (None if value != value else value)
+                for field, value in zip(STORE_FIELDS, values)}
+
+
+def read_weather_json(json_path: str) -> WeatherStore:
+    """Read a historical weather JSON file (airport bts_id -> `YYYY-MM-DD`
+    date -> Meteostat daily record) into an in-memory `WeatherStore`. Only
+    the fields of `STORE_FIELDS` are kept.
+
+    Raises `FileNotFoundError` if the file does not exist.
+    """
+    with open(json_path, 'r', encoding='utf-8') as w_in:
+        weather_data = json.load(w_in)
+
+    bts_ids = list(weather_data)
+    dates = [date.fromisoformat(ymd_date)
+             for days in weather_data.values() for ymd_date in days]
+    start_date = min(dates) if len(dates) > 0 else date(1970, 1, 1)
+    day_count = (max(dates) - start_date).days + 1 if len(dates) > 0 else 0
+
+    values = np.full((len(bts_ids), day_count, len(STORE_FIELDS)), np.nan)
+    present = np.zeros((len(bts_ids), day_count), dtype=bool)
+    for row, bts_id in enumerate(bts_ids):
+        for ymd_date, record in weather_data[bts_id].items():
+            day = (date.fromisoformat(ymd_date) - start_date).days
+            values[row, day] = [np.nan if record.get(field) is None
+                                else record[field] for field in STORE_FIELDS]
+            present[row, day] = True
+
+    return WeatherStore(bts_ids, start_date, values, present)
+
+
+def write_weather_store(store: WeatherStore, store_path: str):
+    """Write `store` to a store file readable by `open_weather_store()`.
+
+    File layout:
+
+    - `STORE_MAGIC` and the length of the header (little-endian `uint32`)
+    - JSON header holding the format version, fields, airports, date range,
+      and checksum
+    - Value matrix as little-endian `float64` in C order, starting at the
+      next multiple of 64 bytes
+    - Presence matrix as `uint8` (1 for recorded days) in C order
+    """
+    start_date, end_date = store.get_date_range()
+    values = store.get_values()
+    header = json.dumps({
+        'version': STORE_VERSION,
+        'fields': list(STORE_FIELDS),
+        'bts_ids': list(store.get_airports()),
+        'start_date': start_date.isoformat(),
+        'days': (end_date - start_date).days,
+        'checksum': store.get_checksum()
+    }).encode('utf-8')
+    header_end = _PREFIX.size + len(header)
+    padding = -header_end % _DATA_ALIGNMENT
+
+    with open(store_path, 'wb') as s_out:
+        s_out.write(_PREFIX.pack(STORE_MAGIC, len(header) + padding))
+        s_out.write(header + b' ' * padding)
+        s_out.write(np.ascontiguousarray(values, dtype='<f8').tobytes())
+        s_out.write(np.ascontiguousarray(
+            store.get_present(), dtype=np.uint8).tobytes())
+
+
+def open_weather_store(path: str) -> WeatherStore:
+    """Open the weather at `path`, which is either a store file (see
+    `write_weather_store()`) or a historical weather JSON file (see
+    `read_weather_json()`). Store files are memory-mapped rather than read.
+
+    Raises `FileNotFoundError` if the file does not exist and `ValueError`
+    if a store file is malformed or of an unsupported version.
+    """
+    header = _read_header(path)
+    if header is None:
+        # Not a store file
+        return read_weather_json(path)
+
+    shape = (len(header['bts_ids']), header['days'], len(STORE_FIELDS))
+    if 0 in shape:
+        values = np.empty(shape)
+        present = np.zeros(shape[:2], dtype=bool)
+    else:
+        values = np.memmap(path, dtype='<f8', mode='r',
+                           offset=header['data_offset'], shape=shape)
+        present = np.memmap(path, dtype=np.bool_, mode='r',
+                            offset=header['data_offset'] + values.nbytes,
+                            shape=shape[:2])
+
+    return WeatherStore(header['bts_ids'], date.fromisoformat(header['start_date']),
+                        values, present, header['checksum'])
+
+
+def get_weather_version(path: str) -> str:
+    """Identify the weather at `path` (see `open_weather_store()`) without
+    opening it. For store files this is the checksum of their contents
+    (see `WeatherStore.get_checksum()`); other files are identified by
+    their path, size, and modification time.
+
+    Raises the exceptions of `open_weather_store()`.
+    """
+    header = _read_header(path)
+    if header is not None:
+        return header['checksum']
+
+    stat = os.stat(path)
+    return hashlib.sha256(json.dumps(
+        [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]).encode('utf-8')).hexdigest()
+
+
+def build_weather_store(json_path: str, store_path: str) -> WeatherStore:
+    """Convert the historical weather JSON file at `json_path` to a store
+    file at `store_path` and open it.
+
+    Returns:
+
+    the memory-mapped store
+    """
+    write_weather_store(read_weather_json(json_path), store_path)
+    return open_weather_store(store_path)
+
+
+def _read_header(path: str) -> Optional[dict]:
+    """Read the header of the store file at `path`, adding the offset of
+    its value matrix as `data_offset`. `None` if the file is not a store
+    file."""
+    with open(path, 'rb') as s_in:
+        prefix = s_in.read(_PREFIX.size)
+        if not prefix.startswith(STORE_MAGIC):
+            return None
+        _, header_len = _PREFIX.unpack(prefix)
+        try:
+            header = json.loads(s_in.read(header_len))
+        except ValueError:
+            raise ValueError(
+                f'WeatherStore: ERR: Store file {path} has a malformed header.')
+
+    if header.get('version') != STORE_VERSION \
+            or tuple(header.get('fields', ())) != STORE_FIELDS:
+        raise ValueError(
+            f'WeatherStore: ERR: Store file {path} has version {header.get("version")} and fields {header.get("fields")}; expected version {STORE_VERSION} with fields {list(STORE_FIELDS)}. Rebuild the store.')
+
+    return header | {'data_offset': _PREFIX.size + header_len}
+
+
+def _get_checksum(bts_ids: list[str], start_date: date, values: np.ndarray, present: np.ndarray) -> str:
+    """Hash the airports, dates, values, and recorded days of a store."""
+    digest = hashlib.sha256(json.dumps(
+        [bts_ids, start_date.isoformat(), list(values.shape)]).encode('utf-8'))
+    digest.update(np.ascontiguousarray(values, dtype='<f8').tobytes())
+    digest.update(np.ascontiguousarray(present, dtype=np.uint8).tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,206 @@
+import asyncio
+import pytest
+import requests
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from intelliflight.models.bayes_net import Bayes_Net
+from intelliflight.util import batchutil, datautil
+from intelliflight.util.async_predictor import AsyncForecaster, AsyncPredictor
+from typing import Final
+
+
+## DATA ##
+
+
+TEST_PATH: Final = Path(__file__).parent.parent
+PARAMS_PATH: Final = TEST_PATH / 'data' / 'sample_bayes_params.json'
+FL_DATE: Final = '2024-05-01'
+
+
+## HELPERS ##
+
+
+class ForecasterDummy:
+    """Dummy class for mocking `Forecaster`. Serves a fixed hourly forecast
+    for `FL_DATE` and records each request.
+
+    If `barrier` is set, each hourly forecast request waits on it, so
+    requests that are not made concurrently fail with a
+    `threading.BrokenBarrierError`. If `fail_url` is set, hourly forecast
+    requests for it fail like an NWS outage.
+    """
+
+    def __init__(self, barrier: threading.Barrier = None, delay: float = 0, fail_url: str = None):
+        self.barrier = barrier
+        self.delay = delay
+        self.fail_url = fail_url
+        self.lock = threading.Lock()
+        self.url_requests = []
+        self.period_requests = []
+
+    def get_hourly_forecast_url(self, bts_id: int) -> str:
+        with self.lock:
+            self.url_requests.append(bts_id)
+        return f'hourly/{bts_id}'
+
+    def get_hourly_periods(self, hourly_url: str) -> list[dict]:
+        with self.lock:
+            self.period_requests.append(hourly_url)
+        if hourly_url == self.fail_url:
+            raise requests.HTTPError('503 Server Error')
+        if self.barrier is not None:
+            self.barrier.wait()
+        time.sleep(self.delay)
+        start = datetime.fromisoformat(FL_DATE)
+        return [
+            {
+                'startTime': (start + timedelta(hours=hour)).isoformat(),
+                'endTime': (start + timedelta(hours=hour + 1)).isoformat(),
+                'temperature': 40 + hour,
+                'windSpeed': f'{hour} mph'
+            }
+            for hour in range(24)
+        ]
+
+
+def get_flight(bayes: Bayes_Net, src: int = 0, dst: int = 1) -> dict:
+    """Generate one input flight without weather between the airports at
+    indices `src` and `dst` of those seen by `bayes`."""
+    airports = sorted(bayes.key_meta.get_seen_airports())
+    return {
+        'ORIGIN_AIRPORT_ID': airports[src],
+        'DEST_AIRPORT_ID': airports[dst],
+        'OP_UNIQUE_CARRIER': sorted(bayes.key_meta.get_seen_carriers())[0],
+        'FL_DATE': FL_DATE,
+        'CRS_DEP_TIME': '0930'
+    }
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.asyncpredict
+def test_predict():
+    """Verify that predictions match make_prediction() with the same
+    forecast weather."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    flight = get_flight(bayes)
+    predictor = AsyncPredictor(bayes, AsyncForecaster(ForecasterDummy()))
+    prediction = asyncio.run(predictor.predict(flight))
+    predictor.close()
+
+    # 09:00 period of ForecasterDummy
+    record = batchutil.prepare_flight(flight | {
+        'src_tavg': '49', 'dst_tavg': '49', 'src_wspd': '9', 'dst_wspd': '9'})
+    datautil.discretize([record])
+    expected_status, expected_p = bayes.make_prediction(
+        record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+        record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+    assert prediction['status'] == expected_status
+    assert prediction['probability'] == pytest.approx(expected_p)
+    assert prediction['description'] == \
+        bayes.key_meta.get_arrival_statuses()[expected_status]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncpredict
+def test_concurrent_forecasts():
+    """Verify that the forecasts of both airports are fetched
+    concurrently."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    forecaster = ForecasterDummy(threading.Barrier(2, timeout=5))
+    predictor = AsyncPredictor(bayes, AsyncForecaster(forecaster))
+    prediction = asyncio.run(predictor.predict(get_flight(bayes)))
+    predictor.close()
+    assert 'status' in prediction
+    assert len(forecaster.period_requests) == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncpredict
+def test_shared_fetches():
+    """Verify that concurrent callers share in-flight forecast fetches."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    forecaster = ForecasterDummy(delay=0.05)
+    async_forecaster = AsyncForecaster(forecaster)
+    predictor = AsyncPredictor(bayes, async_forecaster)
+    # 3 airports over 6 flights
+    flights = [get_flight(bayes, i % 3, (i + 1) % 3) for i in range(6)]
+
+    async def predict_concurrently():
+        return await asyncio.gather(
+            *[predictor.predict(flight) for flight in flights])
+
+    predictions = asyncio.run(predict_concurrently())
+    assert all('status' in prediction for prediction in predictions)
+    assert async_forecaster.get_fetch_count() == 3
+    assert async_forecaster.get_shared_count() == 9
+    assert len(forecaster.period_requests) == 3
+
+    # Forecast URLs are looked up once per airport
+    asyncio.run(predictor.predict(flights[0]))
+    predictor.close()
+    assert sorted(forecaster.url_requests) == \
+        sorted(set(forecaster.url_requests))
+    assert len(forecaster.period_requests) == 5
+
+
+@pytest.mark.unit
+@pytest.mark.asyncpredict
+def test_predict_many():
+    """Verify that batched predictions match single predictions and that
+    bad flights are reported rather than raised."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    predictor = AsyncPredictor(bayes, AsyncForecaster(ForecasterDummy()))
+    flights = [get_flight(bayes), get_flight(bayes) | {'ORIGIN_AIRPORT_ID': '0'},
+               get_flight(bayes, 1, 2)]
+
+    predictions = asyncio.run(predictor.predict_many(flights))
+    assert predictions[0] == asyncio.run(predictor.predict(flights[0]))
+    assert predictions[1] == {
+        'error': 'BayesNet: ORIGIN_AIRPORT_ID=0 did not occur in the training data.'}
+    assert predictions[2] == asyncio.run(predictor.predict(flights[2]))
+    with pytest.raises(ValueError):
+        asyncio.run(predictor.predict(flights[1]))
+    predictor.close()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncpredict
+def test_predict_many_forecast_error():
+    """Verify that flights whose forecasts fail get an error while the
+    others are predicted."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    airports = sorted(bayes.key_meta.get_seen_airports())
+    forecaster = ForecasterDummy(fail_url=f'hourly/{int(airports[0])}')
+    predictor = AsyncPredictor(bayes, AsyncForecaster(forecaster))
+    flights = [get_flight(bayes, 0, 1), get_flight(bayes, 1, 2)]
+
+    predictions = asyncio.run(predictor.predict_many(flights))
+    assert predictions[0] == {'error': '503 Server Error'}
+    assert 'status' in predictions[1]
+    with pytest.raises(requests.RequestException):
+        asyncio.run(predictor.predict(flights[0]))
+    predictor.close()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncpredict
+def test_predict_no_forecaster():
+    """Attempt to predict a flight without weather or a forecaster."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    predictor = AsyncPredictor(bayes)
+    with pytest.raises(ValueError):
+        asyncio.run(predictor.predict(get_flight(bayes)))
+    predictor.close()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncpredict
+def test_untrained():
+    """Attempt to construct a predictor for an untrained model."""
+    with pytest.raises(BufferError):
+        AsyncPredictor(Bayes_Net())
@@ -0,0 +1,176 @@
+import csv
+import pytest
+import requests
+from pathlib import Path
+from intelliflight.models.bayes_net import Bayes_Net
+from intelliflight.util import batchutil, datautil
+from typing import Final
+
+
+## DATA ##
+
+
+TEST_PATH: Final = Path(__file__).parent.parent
+PARAMS_PATH: Final = TEST_PATH / 'data' / 'sample_bayes_params.json'
+WEATHER: Final = {'src_tavg': '55.0', 'dst_tavg': '72.5',
+                  'src_wspd': '4', 'dst_wspd': '12'}
+
+
+## HELPERS ##
+
+
+class ForecasterDummy:
+    """Dummy class for mocking `Forecaster`. Returns a fixed forecast and
+    records each requested `(bts_id, timestamp)`."""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.requests = []
+
+    def get_nws_forecast_from_bts(self, bts_id: int, iso_timestamp: str) -> dict:
+        self.requests.append((bts_id, iso_timestamp))
+        if self.error is not None:
+            raise self.error
+        return {'temperature': 72, 'windSpeed': '12 mph'}
+
+
+def get_flights(bayes: Bayes_Net, count: int) -> list[dict]:
+    """Generate `count` input rows over airports and carriers seen by
+    `bayes`."""
+    airports = sorted(bayes.key_meta.get_seen_airports())
+    carriers = sorted(bayes.key_meta.get_seen_carriers())
+    return [
+        {
+            'ORIGIN_AIRPORT_ID': airports[i % len(airports)],
+            'DEST_AIRPORT_ID': airports[(i + 1) % len(airports)],
+            'OP_UNIQUE_CARRIER': carriers[i % len(carriers)],
+            'FL_DATE': f'2024-01-{str(i % 28 + 1).rjust(2, "0")}',
+            'CRS_DEP_TIME': f'{str(i % 24).rjust(2, "0")}{str(i % 60).rjust(2, "0")}'
+        } | WEATHER
+        for i in range(count)
+    ]
+
+
+def write_csv(path: Path, rows: list[dict]):
+    """Write `rows` to a CSV file at `path`."""
+    with path.open('w', newline='') as f_out:
+        writer = csv.DictWriter(f_out, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.batch
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_predict_csv(tmp_path: Path, chunk_size: int):
+    """Verify that streamed predictions match make_prediction() per flight
+    for any chunk size."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    flights = get_flights(bayes, 30)
+    write_csv(tmp_path / 'in.csv', flights)
+
+    stats = batchutil.predict_csv(
+        bayes, (tmp_path / 'in.csv').as_posix(), (tmp_path / 'out.csv').as_posix(),
+        chunk_size=chunk_size)
+    assert (stats['rows'], stats['predicted'], stats['rejected']) == (30, 30, 0)
+    assert stats['rows_per_second'] > 0
+
+    results = list(csv.DictReader((tmp_path / 'out.csv').open()))
+    assert len(results) == 30
+    for flight, result in zip(flights, results):
+        record = batchutil.prepare_flight(flight)
+        datautil.discretize([record])
+        status_k, p = bayes.make_prediction(
+            record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+            record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+        assert result['PREDICTED_STATUS'] == status_k
+        assert float(result['PROBABILITY']) == pytest.approx(p)
+        assert result['ERROR'] == ''
+        assert result['FL_DATE'] == flight['FL_DATE']
+
+
+@pytest.mark.unit
+@pytest.mark.batch
+def test_predict_csv_rejects(tmp_path: Path):
+    """Verify that flights which cannot be predicted are written with a
+    reason rather than stopping the run."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    flights = get_flights(bayes, 4)
+    flights[1]['ORIGIN_AIRPORT_ID'] = '0'
+    flights[2]['CRS_DEP_TIME'] = '2500'
+    flights[3]['src_tavg'] = ''
+    write_csv(tmp_path / 'in.csv', flights)
+
+    stats = batchutil.predict_csv(
+        bayes, (tmp_path / 'in.csv').as_posix(), (tmp_path / 'out.csv').as_posix())
+    assert (stats['rows'], stats['predicted'], stats['rejected']) == (4, 1, 3)
+    results = list(csv.DictReader((tmp_path / 'out.csv').open()))
+    assert results[0]['ERROR'] == ''
+    for result in results[1:]:
+        assert result['PREDICTED_STATUS'] == ''
+        assert result['ERROR'] != ''
+    # Unknown keys are reported once, by make_predictions(skip_invalid=True)
+    assert results[1]['ERROR'] == \
+        'ORIGIN_AIRPORT_ID=0 did not occur in the training data.'
+
+
+@pytest.mark.unit
+@pytest.mark.batch
+def test_predict_csv_forecasts(tmp_path: Path):
+    """Verify that missing weather is fetched once per airport-hour."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    flight = get_flights(bayes, 1)[0]
+    flights = []
+    for dep_time in ['1000', '1015', '1059', '1100']:
+        flights.append(flight | {column_k: '' for column_k in batchutil.BATCH_WEATHER_COLUMNS}
+                       | {'CRS_DEP_TIME': dep_time})
+    write_csv(tmp_path / 'in.csv', flights)
+    forecaster = ForecasterDummy()
+
+    stats = batchutil.predict_csv(
+        bayes, (tmp_path / 'in.csv').as_posix(), (tmp_path / 'out.csv').as_posix(),
+        forecaster, chunk_size=2)
+    assert stats['predicted'] == 4
+    # Two airports over two hours
+    assert len(forecaster.requests) == 4
+    assert len(set(forecaster.requests)) == 4
+
+
+@pytest.mark.unit
+@pytest.mark.batch
+def test_predict_csv_forecast_error(tmp_path: Path):
+    """Verify that flights whose forecasts fail are rejected rather than
+    failing the batch."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    flights = get_flights(bayes, 2)
+    flights[0] |= {column_k: '' for column_k in batchutil.BATCH_WEATHER_COLUMNS}
+    write_csv(tmp_path / 'in.csv', flights)
+
+    stats = batchutil.predict_csv(
+        bayes, (tmp_path / 'in.csv').as_posix(), (tmp_path / 'out.csv').as_posix(),
+        ForecasterDummy(requests.HTTPError('503 Server Error')))
+    assert (stats['predicted'], stats['rejected']) == (1, 1)
+    results = list(csv.DictReader((tmp_path / 'out.csv').open()))
+    assert results[0]['ERROR'] == '503 Server Error'
+    assert results[1]['ERROR'] == ''
+
+
+@pytest.mark.unit
+@pytest.mark.batch
+def test_prepare_flight_no_weather():
+    """Attempt to prepare a flight without weather or a forecaster."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    flight = get_flights(bayes, 1)[0] | {'dst_wspd': ''}
+    with pytest.raises(ValueError):
+        batchutil.prepare_flight(flight)
+
+
+@pytest.mark.unit
+@pytest.mark.batch
+@pytest.mark.parametrize('fl_date', ['2024-03-05', '3/5/2024 12:00:00 AM'])
+def test_parse_flight_date(fl_date: str):
+    """Verify that ISO and BTS flight dates are parsed."""
+    assert batchutil.parse_flight_date(fl_date).isoformat() == '2024-03-05'
@@ -11,14 +11,19 @@ This class is lightly tested for the following reasons:
 
 
 import csv
+import numpy as np
 import pytest
 import json
+import os
 from pathlib import Path
+from intelliflight.models import bayes_net
 from intelliflight.models.bayes_net import Bayes_Net, data_dir
 from intelliflight.models.components.keymeta import KeyMeta
 from intelliflight.models.components.dataset import Dataset
 from intelliflight.models.components.frequencycounter import FrequencyCounter
 from intelliflight.models.components.ptables import ProbabilityTables
+from intelliflight.models.components.encoder import FeatureEncoder, FEATURES, FEATURE_COLUMNS
+from intelliflight.util import weatherstore
 from typing import Final
 from datetime import datetime
 
@@ -28,6 +33,51 @@ TEST_PATH: Final = Path(__file__).parent.parent
 PARAMS_PATH: Final = TEST_PATH / 'data' / 'sample_bayes_params.json'
 TRUNCATED_FLIGHT_DATA_PATH: Final = TEST_PATH / \
     'data' / 'FLIGHT_DATA_TRUNCATED.csv'
+SEEN_FLIGHT_DATA_PATH: Final = TEST_PATH / \
+    'data' / 'historical_flights_seen_carriers_airports.csv'
+WEATHER_PATH: Final = TEST_PATH / 'data' / 'historical_weather_by_bts.json'
+FIFTY_FLIGHTS_PATH: Final = TEST_PATH / 'data' / 'fifty_flights.json'
+
+
+## HELPERS ##
+
+
+def setup_loaded(columnar: bool = False, record_count: int = None) -> Bayes_Net:
+    '''Instantiate a Bayes_Net and load discretized data into it directly,
+    bypassing the historical weather database. If `record_count` is set,
+    only that many records are loaded.'''
+    data = json.load(FIFTY_FLIGHTS_PATH.open())[:record_count]
+    datautil.discretize(data)
+    bayes = Bayes_Net()
+    bayes.key_meta.set_seen_airports(set([
+        *[row['ORIGIN_AIRPORT_ID'] for row in data],
+        *[row['DEST_AIRPORT_ID'] for row in data]
+    ]))
+    bayes.key_meta.set_seen_carriers(set([
+        row['OP_UNIQUE_CARRIER'] for row in data
+    ]))
+    if columnar:
+        encoder = FeatureEncoder(bayes.key_meta)
+        bayes.dataset.set_columns(encoder.encode_records(data), encoder)
+    else:
+        bayes.dataset.set_data(data)
+    return bayes
+
+
+def merge_fifty_flights(start: int) -> callable:
+    '''Get a stand-in for `datautil.merge_training_data()` that returns the
+    records of fifty_flights.json from index `start` onward.'''
+    def merge(flight_path: str, weather_path: str, drop_counts: dict = None):
+        data = json.load(FIFTY_FLIGHTS_PATH.open())[start:]
+        return data, \
+            set([row['OP_UNIQUE_CARRIER'] for row in data]), \
+            set([row['ORIGIN_AIRPORT_ID'] for row in data]), \
+            set([row['DEST_AIRPORT_ID'] for row in data])
+
+    return merge
+
+
+## TESTS ##
 
 
 @pytest.mark.unit
@@ -135,6 +185,126 @@ def test_load_data():
     ]))
 
 
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_load_data_columnar(monkeypatch, capsys, tmp_path: Path):
+    '''Verify that streamed columnar loading matches encoding the loaded
+    records.'''
+    monkeypatch.setattr(bayes_net, 'WEATHER_STORE_PATH', tmp_path / 'missing')
+    monkeypatch.setattr(bayes_net, 'WEATHER_JSON_PATH', WEATHER_PATH)
+    bayes = Bayes_Net()
+    bayes.load_data(SEEN_FLIGHT_DATA_PATH.as_posix())
+    assert 'Merged 2 flights; dropped 2 unknown_airport, 0 no_weather, 0 incomplete_weather.' \
+        in capsys.readouterr().out
+    data = bayes.dataset.get_data()
+    assert len(data) == 2
+    assert bayes.key_meta.get_seen_airports() == {'10135', '10136'}
+    assert bayes.key_meta.get_seen_carriers() == {'9E', '0F'}
+
+    columnar = Bayes_Net()
+    columnar.load_data(SEEN_FLIGHT_DATA_PATH.as_posix(), columnar=True)
+    assert columnar.key_meta.get_seen_airports() == {'10135', '10136'}
+    assert columnar.key_meta.get_seen_carriers() == {'9E', '0F'}
+    encoder = columnar.dataset.get_encoder()
+    expected = encoder.encode_records(data)
+    for name, column in columnar.dataset.get_columns().items():
+        assert column.tolist() == expected[name].tolist()
+
+    with pytest.raises(BufferError):
+        # No weather for 2019
+        Bayes_Net().load_data(
+            TRUNCATED_FLIGHT_DATA_PATH.as_posix(), columnar=True)
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_load_data_parallel(monkeypatch, tmp_path: Path):
+    '''Verify that loading chunks of several files in parallel matches a
+    serial load.'''
+    monkeypatch.setattr(bayes_net, 'WEATHER_STORE_PATH', tmp_path / 'missing')
+    monkeypatch.setattr(bayes_net, 'WEATHER_JSON_PATH', WEATHER_PATH)
+    monkeypatch.setattr(bayes_net, 'LOAD_CHUNK_BYTES', 100)
+    with SEEN_FLIGHT_DATA_PATH.open(encoding='utf-8') as f_in:
+        header, *lines = f_in.read().splitlines()
+    for month in range(1, 4):
+        # Vary departure times so that files differ
+        rows = [line.replace('1459', f'{hour:02d}{month * 10:02d}')
+                for hour in range(24) for line in lines]
+        (tmp_path / f'flights_{month}.csv').write_text(
+            '\n'.join([header, *rows]) + '\n')
+    flight_paths = [(tmp_path / 'flights_2.csv').as_posix(),
+                    (tmp_path / 'flights_[13].csv').as_posix()]
+
+    serial = Bayes_Net()
+    serial.load_data(flight_paths, columnar=True)
+    # The weather JSON is parsed by this process only; workers map a store
+    parent_pid = os.getpid()
+    read_weather_json = weatherstore.read_weather_json
+
+    def read_weather_json_in_parent(json_path: str):
+        assert os.getpid() == parent_pid
+        return read_weather_json(json_path)
+
+    monkeypatch.setattr(weatherstore, 'read_weather_json',
+                        read_weather_json_in_parent)
+    parallel = Bayes_Net()
+    parallel.load_data(flight_paths, columnar=True, workers=3)
+
+    assert parallel.dataset.get_len() == serial.dataset.get_len() == 3 * 24 * 2
+    assert parallel.key_meta.get_seen_airports() == serial.key_meta.get_seen_airports()
+    assert parallel.key_meta.get_seen_carriers() == serial.key_meta.get_seen_carriers()
+    serial_columns = serial.dataset.get_columns()
+    for name, column in parallel.dataset.get_columns().items():
+        assert column.dtype == serial_columns[name].dtype
+        assert column.tolist() == serial_columns[name].tolist()
+    # Files are loaded in the given order
+    assert serial_columns['dep_time'][0] == \
+        serial.dataset.get_encoder().encode('dep_time', '0000')
+
+    with pytest.raises(ValueError):
+        Bayes_Net().load_data(flight_paths, columnar=True, workers=0)
+    with pytest.raises(FileNotFoundError):
+        Bayes_Net().load_data((tmp_path / 'missing_*.csv').as_posix())
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_load_data_cache(monkeypatch, capsys, tmp_path: Path):
+    '''Verify that an unchanged load is read from the dataset cache, and
+    that changed flight data is loaded again.'''
+    monkeypatch.setattr(bayes_net, 'WEATHER_STORE_PATH', tmp_path / 'missing')
+    monkeypatch.setattr(bayes_net, 'WEATHER_JSON_PATH', WEATHER_PATH)
+    flight_path = tmp_path / 'flights.csv'
+    flight_path.write_text(SEEN_FLIGHT_DATA_PATH.read_text())
+    cache_dir = (tmp_path / 'cache').as_posix()
+
+    loaded = Bayes_Net()
+    loaded.load_data(flight_path.as_posix(), columnar=True, cache_dir=cache_dir)
+    assert 'Cached dataset' in capsys.readouterr().out
+
+    cached = Bayes_Net()
+    cached.load_data(flight_path.as_posix(), columnar=True, cache_dir=cache_dir)
+    out = capsys.readouterr().out
+    assert 'Loaded cached dataset' in out
+    assert 'Merged 2 flights; dropped 2 unknown_airport' in out
+    assert cached.key_meta.get_seen_airports() == loaded.key_meta.get_seen_airports()
+    assert cached.key_meta.get_seen_carriers() == loaded.key_meta.get_seen_carriers()
+    loaded_columns = loaded.dataset.get_columns()
+    for name, column in cached.dataset.get_columns().items():
+        assert isinstance(column, np.memmap)
+        assert column.tolist() == loaded_columns[name].tolist()
+    assert cached.train_model(3, 0.5, 1, 1, cv='loo') == \
+        loaded.train_model(3, 0.5, 1, 1, cv='loo')
+
+    # Changed flight data is not read from the cache
+    flight_path.write_text(flight_path.read_text() +
+                           '1,1/1/2018 12:00:00 AM,9E,10136,10135,0900,0,0,0.00,,0.00\n')
+    reloaded = Bayes_Net()
+    reloaded.load_data(flight_path.as_posix(), columnar=True, cache_dir=cache_dir)
+    assert 'Loaded cached dataset' not in capsys.readouterr().out
+    assert reloaded.dataset.get_len() == 3
+
+
 @pytest.mark.unit
 @pytest.mark.bayes
 def test_export_parameters():
@@ -172,3 +342,461 @@ def test_export_parameters():
          f'bayes_net.model.json.{backup_time}.bak').rename(model_path)
 
     assert in_data == test_data
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_train_model_parallel():
+    '''Verify that training with a process pool gives the same model as
+    training serially.'''
+    serial = setup_loaded()
+    serial_result = serial.train_model(3, 0.02, 0.2, 1)
+    parallel = setup_loaded()
+    parallel_result = parallel.train_model(3, 0.02, 0.2, 1, workers=2)
+
+    assert parallel_result == serial_result
+    assert parallel.p_tables.export_p_tables() == \
+        serial.p_tables.export_p_tables()
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_train_model_keeps_data():
+    '''Verify that training leaves the loaded data in place and that
+    repeated runs with one seed on the same data give the same model.'''
+    bayes = setup_loaded()
+    data = bayes.dataset.get_data()
+    original_data = data[:]
+    first_result = bayes.train_model(3, 0.02, 0.2, 1)
+    first_tables = bayes.p_tables.export_p_tables()
+    assert bayes.dataset.get_data() == original_data
+
+    bayes.train_model(3, 0.02, 0.2, 2)
+    assert bayes.train_model(3, 0.02, 0.2, 1) == first_result
+    assert bayes.p_tables.export_p_tables() == first_tables
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_leave_one_out_k_values():
+    '''Verify that leave-one-out errors equal testing each record against a
+    fit to all other records.'''
+    bayes = setup_loaded()
+    encoder = FeatureEncoder(bayes.key_meta)
+    columns = encoder.encode_records(bayes.dataset.get_data())
+    counts = FrequencyCounter.tally(columns, encoder)
+    k_values = [0, 1, 5]
+
+    expected = [0.0] * len(k_values)
+    for r in range(bayes.dataset.get_len()):
+        record = {name: column[r:r + 1] for name, column in columns.items()}
+        own = FrequencyCounter.tally(record, encoder)
+        errors = Bayes_Net.test_k_values(
+            {name: counts[name] - own[name] for name in counts},
+            record, k_values)
+        expected = [e + error for e, error in zip(expected, errors)]
+
+    errors = Bayes_Net.leave_one_out_k_values(counts, columns, k_values)
+    assert errors == pytest.approx(
+        [e / bayes.dataset.get_len() for e in expected])
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+@pytest.mark.parametrize('columnar', [False, True])
+def test_train_model_loo(columnar: bool):
+    '''Train with leave-one-out cross-validation and verify that the best k
+    was selected and fit to all data.'''
+    bayes = setup_loaded(columnar)
+    k, accuracy = bayes.train_model(3, 0.02, 0.2, 1, cv='loo')
+
+    encoder = FeatureEncoder(bayes.key_meta)
+    if columnar:
+        columns = bayes.dataset.get_columns()
+    else:
+        columns = encoder.encode_records(bayes.dataset.get_data())
+    errors = Bayes_Net.leave_one_out_k_values(
+        FrequencyCounter.tally(columns, encoder), columns, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+    assert k == errors.index(min(errors))
+    assert accuracy == round((1 - min(errors)) * 100, 2)
+    assert bayes.p_tables.get_k() == k
+    assert bayes.dataset.get_training_len() == bayes.dataset.get_len()
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_update(monkeypatch):
+    '''Update a model trained on part of the data with the rest, and verify
+    that it matches a fit to all data with the same k.'''
+    monkeypatch.setattr(datautil, 'merge_training_data',
+                        merge_fifty_flights(30))
+    bayes = setup_loaded(record_count=30)
+    k, _ = bayes.train_model(3, 0.05, 0.2, 1)
+    assert bayes.update('new_flights.csv') == 20
+
+    expected = setup_loaded()
+    expected.frequencies.reset_counters(expected.key_meta)
+    expected.frequencies.count_frequencies(expected.dataset)
+    expected.p_tables.reset_tables(expected.key_meta, expected.frequencies)
+    expected.p_tables.fit(expected.dataset, expected.frequencies, k)
+
+    assert bayes.key_meta.get_seen_airports() == \
+        expected.key_meta.get_seen_airports()
+    assert bayes.key_meta.get_seen_carriers() == \
+        expected.key_meta.get_seen_carriers()
+    assert bayes.frequencies.export_counters() == \
+        expected.frequencies.export_counters()
+    assert bayes.p_tables.export_p_tables() == \
+        expected.p_tables.export_p_tables()
+    # Loaded data is untouched
+    assert bayes.dataset.get_len() == 30
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+@pytest.mark.parametrize('k', [0, 3, 10])
+def test_refit(k: int):
+    '''Refit a trained model with a new k and verify that it matches a fit
+    to all data with that k.'''
+    bayes = setup_loaded()
+    bayes.train_model(3, 0.02, 0.2, 1)
+    bayes.refit(k)
+
+    expected = setup_loaded()
+    expected.frequencies.reset_counters(expected.key_meta)
+    expected.frequencies.count_frequencies(expected.dataset)
+    expected.p_tables.reset_tables(expected.key_meta, expected.frequencies)
+    expected.p_tables.fit(expected.dataset, expected.frequencies, k)
+
+    assert bayes.laplace_k == k
+    assert bayes.p_tables.export_p_tables() == \
+        expected.p_tables.export_p_tables()
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_refit_untrained():
+    '''Attempt to refit a model loaded without frequencies.'''
+    with pytest.raises(BufferError):
+        Bayes_Net(PARAMS_PATH.as_posix()).refit(1)
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+@pytest.mark.parametrize('include_counts', [False, True])
+def test_export_parameters_counts(monkeypatch, tmp_path: Path, include_counts: bool):
+    '''Export a trained model and verify that frequencies are restored on
+    load only if they were included.'''
+    bayes = setup_loaded()
+    bayes.train_model(3, 0.02, 0.2, 1)
+    # Export to a temporary data directory rather than over the real model
+    (tmp_path / 'models').mkdir()
+    with monkeypatch.context() as m:
+        m.setattr(bayes_net, 'data_dir', tmp_path)
+        bayes.export_parameters(include_counts)
+    loaded = Bayes_Net((tmp_path / 'models' / 'bayes_net.model.json').as_posix())
+
+    if include_counts:
+        assert loaded.laplace_k == bayes.laplace_k
+        assert loaded.training_len == 50
+        assert loaded.frequencies.export_counters() == \
+            bayes.frequencies.export_counters()
+        loaded.refit(bayes.laplace_k)
+        assert loaded.p_tables.export_p_tables() == \
+            bayes.p_tables.export_p_tables()
+    else:
+        assert loaded.laplace_k is None
+        assert loaded.frequencies.get_status_counter() is None
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_update_untrained():
+    '''Attempt to update a model without frequencies.'''
+    with pytest.raises(BufferError):
+        Bayes_Net(PARAMS_PATH.as_posix()).update('new_flights.csv')
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_train_model_bad_cv():
+    '''Attempt to train with an unknown cross-validation scheme.'''
+    bayes = setup_loaded()
+    with pytest.raises(ValueError):
+        bayes.train_model(3, 0.02, 0.2, 1, cv='holdout')
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+@pytest.mark.parametrize('bounds', [(0, 50), (10, 35)])
+def test_test_vectorized(bounds: tuple[int, int]):
+    '''Verify that the vectorized test path gives the same error rate as
+    calling make_prediction() per record.'''
+    bayes = setup_loaded()
+    bayes.train_model(3, 0.02, 0.2, 1)
+
+    assert bayes.test(bounds) == bayes.test(bounds, vectorized=False)
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_train_model_columnar():
+    '''Verify that training on columnar data gives the same model as
+    training on row data.'''
+    rows = setup_loaded()
+    rows_result = rows.train_model(3, 0.02, 0.2, 1)
+    columnar = setup_loaded(columnar=True)
+    columnar_result = columnar.train_model(3, 0.02, 0.2, 1)
+
+    assert columnar_result == rows_result
+    assert columnar.p_tables.export_p_tables() == \
+        rows.p_tables.export_p_tables()
+    assert columnar.test((10, 35)) == rows.test((10, 35))
+    assert columnar.test((10, 35), vectorized=False) == rows.test((10, 35))
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_predictions():
+    '''Verify that batch predictions match make_prediction() per flight,
+    for both record and column input.'''
+    bayes = setup_loaded()
+    bayes.train_model(3, 0.02, 0.2, 1)
+    records = [{column_k: row[column_k] for column_k in FEATURE_COLUMNS.values()}
+               for row in bayes.dataset.get_data()]
+    columns = {column_k: [record[column_k] for record in records]
+               for column_k in FEATURE_COLUMNS.values()}
+
+    status, p, distribution = bayes.make_predictions(
+        records, return_distribution=True)
+    assert distribution.shape == (50, len(bayes.key_meta.get_status_keys()))
+    assert distribution.sum(axis=1) == pytest.approx([1] * 50)
+    for i, record in enumerate(records):
+        expected_status, expected_p = bayes.make_prediction(
+            record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+            record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+        assert status[i] == expected_status
+        assert p[i] == pytest.approx(expected_p)
+
+    column_status, column_p = bayes.make_predictions(columns)
+    assert column_status.tolist() == status.tolist()
+    assert column_p.tolist() == p.tolist()
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_predictions_unknown_value():
+    '''Attempt batch predictions with an airport unseen in training.'''
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    record = {
+        'ORIGIN_AIRPORT_ID': 0,
+        'DEST_AIRPORT_ID': list(bayes.key_meta.get_seen_airports())[0],
+        'OP_UNIQUE_CARRIER': list(bayes.key_meta.get_seen_carriers())[0],
+        'DAY_OF_WEEK': 1,
+        'CRS_DEP_TIME': '0000',
+        'src_tavg': '0',
+        'dst_tavg': '0',
+        'src_wspd': '0',
+        'dst_wspd': '0'
+    }
+    with pytest.raises(ValueError):
+        bayes.make_predictions([record])
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_predictions_untrained():
+    '''Attempt batch predictions without a trained model.'''
+    with pytest.raises(BufferError):
+        setup_loaded().make_predictions([])
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_prediction_follows_tables():
+    '''Verify that predictions reflect tables imported after the first
+    prediction.'''
+    bayes = setup_loaded()
+    bayes.train_model(3, 0.02, 0.2, 1)
+    record = bayes.dataset.get_data()[0]
+    args = (record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+            record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+    status_k, _ = bayes.make_prediction(*args)
+
+    # Make every status but one impossible
+    tables = bayes.p_tables.export_p_tables()
+    other_k = next(key for key in tables['arrival_status'] if key != status_k)
+    tables['arrival_status'] = {key: float(key == other_k)
+                                for key in tables['arrival_status']}
+    bayes.p_tables.import_p_tables(tables)
+
+    assert bayes.make_prediction(*args) == (other_k, 1.0)
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_prediction_cache():
+    '''Verify that repeated predictions hit the cache and that changing the
+    tables invalidates it.'''
+    bayes = setup_loaded()
+    bayes.prediction_cache.set_max_size(10)
+    bayes.train_model(3, 0.02, 0.2, 1)
+    record = bayes.dataset.get_data()[0]
+    args = (record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+            record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+
+    prediction = bayes.make_prediction(*args)
+    assert bayes.make_prediction(*args) == prediction
+    assert bayes.prediction_cache.get_hits() == 1
+    assert bayes.prediction_cache.get_misses() == 1
+
+    bayes.p_tables.import_p_tables(bayes.p_tables.export_p_tables())
+    bayes.make_prediction(*args)
+    assert bayes.prediction_cache.get_hits() == 0
+    assert bayes.prediction_cache.get_len() == 1
+
+    bayes.train_model(3, 0.02, 0.2, 2)
+    bayes.make_prediction(*args)
+    assert bayes.prediction_cache.get_hits() == 0
+
+    bayes.load_params(PARAMS_PATH.as_posix())
+    with pytest.raises(ValueError):
+        bayes.make_prediction(*args)
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_prediction_cache_contributions():
+    '''Verify that requesting contributions reuses cached predictions and
+    keeps cached distributions.'''
+    bayes = setup_loaded()
+    bayes.prediction_cache.set_max_size(10)
+    bayes.train_model(3, 0.02, 0.2, 1)
+    record = bayes.dataset.get_data()[0]
+    args = (record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+            record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+
+    expected = bayes.make_prediction(*args, return_distribution=True)
+    status_k, p, contributions = bayes.make_prediction(
+        *args, return_contributions=True)
+    assert (status_k, p) == expected[:2]
+    assert list(contributions.keys()) == ['prior', *FEATURES]
+    # The cached distribution is not replaced by the contributions call
+    assert bayes.make_prediction(*args, return_distribution=True) == expected
+    assert bayes.prediction_cache.get_misses() == 1
+    assert bayes.prediction_cache.get_hits() == 2
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_prediction_details():
+    '''Verify that the distribution, top-k statuses, and buckets of a
+    prediction agree with each other and with the batch path.'''
+    bayes = setup_loaded()
+    bayes.prediction_cache.set_max_size(10)
+    bayes.train_model(3, 0.02, 0.2, 1)
+    record = bayes.dataset.get_data()[0]
+    args = (record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+            record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+
+    status_k, p = bayes.make_prediction(*args)
+    # Cached without a distribution, then recomputed with one
+    _, _, distribution, top, buckets = bayes.make_prediction(
+        *args, return_distribution=True, top_k=3, return_buckets=True)
+    assert list(distribution.keys()) == list(bayes.key_meta.get_status_keys())
+    assert sum(distribution.values()) == pytest.approx(1)
+    assert top[0] == (status_k, p)
+    assert [pair[1] for pair in top] == sorted(
+        distribution.values(), reverse=True)[:3]
+    assert list(buckets.keys()) == ['on_time', 'delayed', 'cancelled', 'diverted']
+    assert buckets['diverted'] == pytest.approx(distribution['divert'])
+    assert sum(buckets.values()) == pytest.approx(1)
+    assert bayes.make_prediction(*args, top_k=3) == (status_k, p, top)
+
+    records = [{column_k: row[column_k] for column_k in FEATURE_COLUMNS.values()}
+               for row in bayes.dataset.get_data()[:5]]
+    batch_status, batch_p, batch_distribution, top_status, top_p, batch_buckets = \
+        bayes.make_predictions(records, return_distribution=True, top_k=3, return_buckets=True)
+    assert batch_distribution[0].tolist() == pytest.approx(
+        list(distribution.values()))
+    assert list(zip(top_status[0].tolist(), top_p[0].tolist())) == pytest.approx(top)
+    assert batch_buckets[0].tolist() == pytest.approx(list(buckets.values()))
+    assert top_status[:, 0].tolist() == batch_status.tolist()
+    assert top_p[:, 0].tolist() == batch_p.tolist()
+    assert batch_buckets.sum(axis=1) == pytest.approx([1] * 5)
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_prediction_contributions():
+    '''Verify that factor contributions explain the prediction and agree
+    between the scalar and batch paths.'''
+    bayes = setup_loaded()
+    bayes.train_model(3, 0.02, 0.2, 1)
+    record = bayes.dataset.get_data()[0]
+    args = (record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+            record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+
+    status_k, p, contributions = bayes.make_prediction(
+        *args, return_contributions=True)
+    assert (status_k, p) == bayes.make_prediction(*args)
+    assert list(contributions.keys()) == ['prior', *FEATURES]
+    scores = {key: sum(contributions[factor][key] for factor in contributions)
+              for key in bayes.key_meta.get_status_keys()}
+    assert max(scores, key=scores.get) == status_k
+
+    _, _, distribution, breakdown = bayes.make_prediction(
+        *args, return_distribution=True, return_contributions=True)
+    assert breakdown == contributions
+    assert distribution[status_k] == p
+
+    records = [{column_k: row[column_k] for column_k in FEATURE_COLUMNS.values()}
+               for row in bayes.dataset.get_data()[:3]]
+    _, _, batch_contributions = bayes.make_predictions(
+        records, return_contributions=True)
+    assert batch_contributions.shape == \
+        (3, len(FEATURES) + 1, len(bayes.key_meta.get_status_keys()))
+    assert batch_contributions[0] == pytest.approx(
+        np.array([list(row.values()) for row in contributions.values()]), rel=1e-6)
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_predictions_skip_invalid():
+    '''Verify that batch predictions can skip flights with unknown values
+    instead of raising.'''
+    bayes = setup_loaded()
+    bayes.train_model(3, 0.02, 0.2, 1)
+    records = [{column_k: row[column_k] for column_k in FEATURE_COLUMNS.values()}
+               for row in bayes.dataset.get_data()[:4]]
+    records[1] = records[1] | {'ORIGIN_AIRPORT_ID': '0'}
+    records[3] = records[3] | {'CRS_DEP_TIME': '0045'}
+
+    status, p, distribution, valid, reasons = bayes.make_predictions(
+        records, return_distribution=True, skip_invalid=True)
+    assert valid.tolist() == [True, False, True, False]
+    assert sorted(reasons.keys()) == [1, 3]
+    assert 'ORIGIN_AIRPORT_ID' in reasons[1]
+    assert 'CRS_DEP_TIME' in reasons[3]
+    assert distribution.shape[0] == 2
+    expected_status, expected_p = bayes.make_predictions(
+        [records[0], records[2]])
+    assert status.tolist() == expected_status.tolist()
+    assert p.tolist() == expected_p.tolist()
+
+    with pytest.raises(ValueError):
+        bayes.make_predictions(records)
+
+
+@pytest.mark.unit
+@pytest.mark.bayes
+def test_make_prediction_unknown_dep_time():
+    '''Attempt a prediction with a departure time that is not a bucket.'''
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    with pytest.raises(ValueError) as e:
+        bayes.make_prediction(
+            list(bayes.key_meta.get_seen_airports())[0],
+            list(bayes.key_meta.get_seen_airports())[1],
+            list(bayes.key_meta.get_seen_carriers())[0],
+            1, '0045', '0', '0', '0', '0')
+    assert 'CRS_DEP_TIME=0045' in str(e.value)
@@ -0,0 +1,314 @@
+import pytest
+import json
+import math
+import numpy as np
+from pathlib import Path
+from intelliflight.models.components.keymeta import KeyMeta
+from intelliflight.models.components.dataset import Dataset
+from intelliflight.models.components.encoder import FeatureEncoder, FEATURES
+from intelliflight.models.components.frequencycounter import FrequencyCounter
+from intelliflight.models.components.ptables import ProbabilityTables
+from intelliflight.models.components.compiledpredictor import CompiledPredictor, FACTORS
+from typing import Final
+
+
+## DATA ##
+
+
+TEST_PATH: Final = Path(__file__).parent.parent
+FREQ_TEST_DATA_PATH: Final = TEST_PATH / 'data' / 'freq_test_data.json'
+# Feature keys of one flight, in the order of FEATURES
+FLIGHT_KEYS: Final = ('3', 'c1', 'a2', 'a1', '0030', 1, 2, 2, 1)
+
+
+## HELPERS ##
+
+
+def get_keymeta() -> KeyMeta:
+    """Instantiate and return a KeyMeta object."""
+    keymeta = KeyMeta()
+    keymeta.set_arrival_statuses({
+        'divert': 'desc1',
+        'cancel:1': 'desc2',
+        'delay:1': 'desc3',
+        'delay:2': 'desc4'
+    })
+    keymeta.set_seen_airports({'a1', 'a2'})
+    keymeta.set_seen_carriers({'c1', 'c2'})
+    keymeta.set_temp_keys([1, 2])
+    keymeta.set_wind_keys([1, 2])
+    return keymeta
+
+
+def setup_ptables(k: int) -> ProbabilityTables:
+    """Fit and return probability tables over the test dataset."""
+    dataset = Dataset()
+    dataset.set_data(json.load(FREQ_TEST_DATA_PATH.open()))
+    counter = FrequencyCounter()
+    counter.reset_counters(get_keymeta())
+    counter.count_frequencies(dataset)
+    tables = ProbabilityTables()
+    tables.reset_tables(get_keymeta(), counter)
+    tables.fit(dataset, counter, k)
+    return tables
+
+
+def expected_distribution(tables: ProbabilityTables, keys: tuple) -> dict[str, float]:
+    """Compute the posterior of each status by multiplying table values."""
+    day, airline, src, dst, dep_time, src_tmp, dst_tmp, src_wnd, dst_wnd = keys
+    products = {
+        status_k: math.prod([
+            tables.query_p_status(status_k),
+            tables.query_p_day(day, status_k),
+            tables.query_p_airline(airline, status_k),
+            tables.query_p_src(src, status_k),
+            tables.query_p_dst(dst, status_k),
+            tables.query_p_dep_time(dep_time, status_k),
+            tables.query_p_src_tmp(src_tmp, status_k),
+            tables.query_p_dst_tmp(dst_tmp, status_k),
+            tables.query_p_src_wnd(src_wnd, status_k),
+            tables.query_p_dst_wnd(dst_wnd, status_k)
+        ])
+        for status_k in tables.get_p_status().keys()
+    }
+    total = sum(products.values())
+    return {status_k: p / total for status_k, p in products.items()}
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_predict():
+    """Verify that predictions match the product of table values."""
+    tables = setup_ptables(1)
+    predictor = CompiledPredictor(tables, FeatureEncoder(get_keymeta()))
+    expected = expected_distribution(tables, FLIGHT_KEYS)
+    best_k = max(expected, key=expected.get)
+
+    status_k, p = predictor.predict(FLIGHT_KEYS)
+    assert status_k == best_k
+    assert p == pytest.approx(expected[best_k])
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_predict_batch():
+    """Verify that batch predictions match single predictions."""
+    tables = setup_ptables(1)
+    predictor = CompiledPredictor(tables, FeatureEncoder(get_keymeta()))
+    flights = [FLIGHT_KEYS, ('7', 'c2', 'a1', 'a1', '2330', 2, 1, 1, 1)]
+    columns = {feature: [keys[i] for keys in flights]
+               for i, feature in enumerate(FEATURES)}
+
+    status, p, distribution = predictor.predict_batch(
+        columns, return_distribution=True)
+    for i, keys in enumerate(flights):
+        assert (status[i], p[i]) == pytest.approx(predictor.predict(keys))
+        expected = expected_distribution(tables, keys)
+        assert distribution[i].tolist() == pytest.approx(
+            [expected[status_k] for status_k in predictor.get_status_keys()])
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_predict_no_underflow():
+    """Verify that predictions stay normalized when the product of the
+    probabilities underflows to 0."""
+    tables = setup_ptables(1)
+    for table in [tables.p_day, tables.p_airline, tables.p_src, tables.p_dst,
+                  tables.p_dep_time, tables.p_src_tmp, tables.p_dst_tmp,
+                  tables.p_src_wnd, tables.p_dst_wnd]:
+        for row in table.values():
+            for status_k in row:
+                row[status_k] *= 1e-40
+    predictor = CompiledPredictor(tables, FeatureEncoder(get_keymeta()))
+
+    _, p, distribution = predictor.predict_batch(
+        {feature: [key] for feature, key in zip(FEATURES, FLIGHT_KEYS)},
+        return_distribution=True)
+    assert predictor.predict(FLIGHT_KEYS)[1] > 0
+    assert predictor.predict(FLIGHT_KEYS)[1] == pytest.approx(p[0])
+    assert distribution.sum() == pytest.approx(1)
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_predict_unknown_key():
+    """Attempt predictions with an unknown airport."""
+    predictor = CompiledPredictor(
+        setup_ptables(1), FeatureEncoder(get_keymeta()))
+    with pytest.raises(KeyError):
+        predictor.predict(('3', 'c1', 'a9', 'a1', '0030', 1, 2, 2, 1))
+    with pytest.raises(KeyError) as e:
+        predictor.predict_batch(
+            {feature: [key] for feature, key in zip(FEATURES, FLIGHT_KEYS)}
+            | {'src': ['a9']})
+    assert e.value.args[0] == ('src', ['a9'])
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_revision():
+    """Verify that the predictor records the revision of its tables."""
+    tables = setup_ptables(1)
+    predictor = CompiledPredictor(tables, FeatureEncoder(get_keymeta()))
+    assert predictor.get_revision() == tables.get_revision()
+    tables.import_p_tables(tables.export_p_tables())
+    assert predictor.get_revision() != tables.get_revision()
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_not_fit():
+    """Attempt to compile tables that were never fit."""
+    with pytest.raises(BufferError):
+        CompiledPredictor(ProbabilityTables(),
+                          FeatureEncoder(get_keymeta()))
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_route_memo():
+    """Verify that route factors are memoized once per route."""
+    tables = setup_ptables(1)
+    predictor = CompiledPredictor(tables, FeatureEncoder(get_keymeta()))
+    assert predictor.get_route_memo_len() == 0
+    assert predictor.get_route_memo_hit_rate() == 0
+
+    expected = predictor.predict(FLIGHT_KEYS)
+    # Same route, different departure
+    other_keys = ('5', 'c1', 'a2', 'a1', '2330', 2, 1, 1, 1)
+    predictor.predict(other_keys)
+    assert predictor.predict(FLIGHT_KEYS) == expected
+    assert predictor.get_route_memo_len() == 1
+    assert predictor.get_route_memo_hits() == 2
+    assert predictor.get_route_memo_misses() == 1
+    assert predictor.get_route_memo_hit_rate() == pytest.approx(2 / 3)
+
+    flights = [FLIGHT_KEYS, other_keys, ('7', 'c2', 'a1', 'a1', '2330', 2, 1, 1, 1)]
+    columns = {feature: [keys[i] for keys in flights]
+               for i, feature in enumerate(FEATURES)}
+    status, p = predictor.predict_batch(columns)
+    assert predictor.get_route_memo_len() == 2
+    assert predictor.get_route_memo_hits() == 3
+    assert predictor.get_route_memo_misses() == 2
+    for i, keys in enumerate(flights):
+        assert (status[i], p[i]) == predictor.predict(keys)
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_route_memo_bounded():
+    """Verify that the route memo evicts its least recently used route when
+    full and can be cleared."""
+    predictor = CompiledPredictor(
+        setup_ptables(1), FeatureEncoder(get_keymeta()), route_memo_size=2)
+    assert predictor.get_route_memo_size() == 2
+    routes = [('c1', 'a1', 'a2'), ('c1', 'a2', 'a1'), ('c2', 'a1', 'a1')]
+    expected = [predictor.predict(('3', *route, '0030', 1, 2, 2, 1))
+                for route in routes]
+    assert predictor.get_route_memo_len() == 2
+
+    # The first route was evicted; the third is still memoized
+    assert predictor.predict(('3', *routes[0], '0030', 1, 2, 2, 1)) == expected[0]
+    assert predictor.predict(('3', *routes[2], '0030', 1, 2, 2, 1)) == expected[2]
+    assert predictor.get_route_memo_misses() == 4
+    assert predictor.get_route_memo_hits() == 1
+    assert predictor.get_route_memo_len() == 2
+
+    predictor.clear_route_memo()
+    assert predictor.get_route_memo_len() == 0
+    assert predictor.get_route_memo_hits() == 0
+    assert predictor.get_route_memo_misses() == 0
+
+    # A disabled memo memoizes nothing
+    predictor = CompiledPredictor(
+        setup_ptables(1), FeatureEncoder(get_keymeta()), route_memo_size=0)
+    assert predictor.predict(FLIGHT_KEYS) == expected[1]
+    assert predictor.get_route_memo_len() == 0
+    with pytest.raises(ValueError):
+        CompiledPredictor(setup_ptables(1), FeatureEncoder(
+            get_keymeta()), route_memo_size=-1)
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_predict_distribution():
+    """Verify that the distribution of a single prediction matches the batch
+    distribution and its argmax."""
+    tables = setup_ptables(1)
+    predictor = CompiledPredictor(tables, FeatureEncoder(get_keymeta()))
+    status_k, p, distribution = predictor.predict(
+        FLIGHT_KEYS, return_distribution=True)
+    assert (status_k, p) == predictor.predict(FLIGHT_KEYS)
+    _, _, batch_distribution = predictor.predict_batch(
+        {feature: [key] for feature, key in zip(FEATURES, FLIGHT_KEYS)},
+        return_distribution=True)
+    assert distribution.tolist() == batch_distribution[0].tolist()
+    assert distribution[predictor.get_status_keys().index(status_k)] == p
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_top_k():
+    """Verify that top-k statuses are ordered by probability, with ties in
+    status order."""
+    predictor = CompiledPredictor(
+        setup_ptables(1), FeatureEncoder(get_keymeta()))
+    # Statuses: divert, cancel:1, delay:1, delay:2
+    distribution = np.array([[0.1, 0.4, 0.1, 0.4],
+                             [0.7, 0.1, 0.2, 0.0]])
+    status, p = predictor.top_k(distribution, 3)
+    assert status.tolist() == [['cancel:1', 'delay:2', 'divert'],
+                               ['divert', 'delay:1', 'cancel:1']]
+    assert p.tolist() == [[0.4, 0.4, 0.1], [0.7, 0.2, 0.1]]
+    assert predictor.top_k(distribution, 10)[0].shape == (2, 4)
+    with pytest.raises(ValueError):
+        predictor.top_k(distribution, 0)
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_aggregate_buckets():
+    """Verify that bucket probabilities sum the probabilities of their
+    statuses."""
+    predictor = CompiledPredictor(
+        setup_ptables(1), FeatureEncoder(get_keymeta()))
+    assert predictor.get_bucket_keys() == \
+        ['on_time', 'delayed', 'cancelled', 'diverted']
+    # Statuses: divert, cancel:1, delay:1, delay:2
+    buckets = predictor.aggregate_buckets(np.array([[0.1, 0.2, 0.3, 0.4]]))
+    assert buckets[0].tolist() == pytest.approx([0, 0.7, 0.2, 0.1])
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+def test_contributions():
+    """Verify that factor contributions are the table log-probabilities and
+    sum to the scores of the prediction."""
+    tables = setup_ptables(1)
+    predictor = CompiledPredictor(tables, FeatureEncoder(get_keymeta()))
+    status_k, p, distribution, contributions = predictor.predict(
+        FLIGHT_KEYS, return_distribution=True, return_contributions=True)
+    assert (status_k, p) == predictor.predict(FLIGHT_KEYS)
+    assert contributions.shape == (len(FACTORS), 4)
+    status_keys = predictor.get_status_keys()
+    assert contributions[0].tolist() == pytest.approx(
+        [math.log(tables.query_p_status(key)) for key in status_keys])
+    assert contributions[FACTORS.index('src')].tolist() == pytest.approx(
+        [math.log(tables.query_p_src(FLIGHT_KEYS[2], key)) for key in status_keys])
+    # Softmax of the summed contributions is the posterior
+    scores = contributions.sum(axis=0)
+    assert CompiledPredictor.normalize(scores[np.newaxis, :])[0].tolist() == \
+        pytest.approx(distribution.tolist())
+
+    flights = [FLIGHT_KEYS, ('7', 'c2', 'a1', 'a1', '2330', 2, 1, 1, 1)]
+    columns = {feature: [keys[i] for keys in flights]
+               for i, feature in enumerate(FEATURES)}
+    _, _, batch_contributions = predictor.predict_batch(
+        columns, return_contributions=True)
+    assert batch_contributions.dtype == np.float32
+    assert batch_contributions.shape == (2, len(FACTORS), 4)
+    assert batch_contributions[0] == pytest.approx(contributions, rel=1e-6)
@@ -1,7 +1,10 @@
 import pytest
 import json
+import numpy as np
 from pathlib import Path
 from intelliflight.models.components.dataset import Dataset
+from intelliflight.models.components.keymeta import KeyMeta
+from intelliflight.models.components.encoder import FeatureEncoder
 from typing import Final
 
 
@@ -10,6 +13,7 @@ from typing import Final
 
 TEST_PATH: Final = Path(__file__).parent.parent
 FIFTY_FLIGHTS_PATH: Final = TEST_PATH / 'data' / 'fifty_flights.json'
+FREQ_TEST_DATA_PATH: Final = TEST_PATH / 'data' / 'freq_test_data.json'
 
 
 ## HELPERS ##
@@ -23,6 +27,26 @@ def setup() -> Dataset:
     return dataset
 
 
+def setup_columnar() -> Dataset:
+    """Instantiate and return a Dataset object in columnar mode."""
+    keymeta = KeyMeta()
+    keymeta.set_arrival_statuses({
+        'divert': 'desc1',
+        'cancel:1': 'desc2',
+        'delay:1': 'desc3',
+        'delay:2': 'desc4'
+    })
+    keymeta.set_seen_airports({'a1', 'a2'})
+    keymeta.set_seen_carriers({'c1', 'c2'})
+    keymeta.set_temp_keys([1, 2])
+    keymeta.set_wind_keys([1, 2])
+    encoder = FeatureEncoder(keymeta)
+    dataset = Dataset()
+    dataset.set_columns(encoder.encode_records(
+        json.load(FREQ_TEST_DATA_PATH.open())), encoder)
+    return dataset
+
+
 ## TESTS ##
 
 
@@ -229,3 +253,79 @@ def test_set_validation_bounds_no_data():
     """Attempt to set validation bounds of an unloaded dataset."""
     with pytest.raises(ValueError):
         Dataset().set_validation_bounds(0, 1)
+
+
+@pytest.mark.unit
+@pytest.mark.dataset
+def test_set_columns():
+    """Load encoded columns and verify columnar state and length."""
+    dataset = setup_columnar()
+    assert dataset.data_loaded()
+    assert dataset.is_columnar()
+    assert dataset.get_len() == 5
+    assert dataset.get_columns()['day'].tolist() == [0, 1, 2, 2, 6]
+    assert dataset.get_encoder().get_keys('airline') == ['c1', 'c2']
+
+
+@pytest.mark.unit
+@pytest.mark.dataset
+def test_columnar_bounds():
+    """Verify that partition bounds behave the same in columnar mode."""
+    dataset = setup_columnar()
+    dataset.set_test_bounds(0, 2)
+    dataset.set_validation_bounds(2, 3)
+    assert dataset.get_training_len() == 2
+    with pytest.raises(IndexError):
+        dataset.set_test_bounds(0, 6)
+
+
+@pytest.mark.unit
+@pytest.mark.dataset
+def test_switch_modes():
+    """Verify that setting row data leaves columnar mode and vice versa."""
+    dataset = setup_columnar()
+    with pytest.raises(TypeError):
+        dataset.get_data()
+
+    dataset.set_data(json.load(FIFTY_FLIGHTS_PATH.open()))
+    assert not dataset.is_columnar()
+    assert dataset.get_encoder() is None
+    with pytest.raises(TypeError):
+        dataset.get_columns()
+
+
+@pytest.mark.unit
+@pytest.mark.dataset
+def test_set_order():
+    """Set a record order and map partition positions to records."""
+    dataset = setup_columnar()
+    assert dataset.get_order() is None
+    assert dataset.get_indices(1, 3).tolist() == [1, 2]
+
+    dataset.set_order(np.array([4, 3, 2, 1, 0]))
+    assert dataset.get_indices(1, 3).tolist() == [3, 2]
+    assert dataset.get_indices(3).tolist() == [1, 0]
+    # Columns are not reordered
+    assert dataset.get_columns()['day'].tolist() == [0, 1, 2, 2, 6]
+
+    dataset.clear_order()
+    assert dataset.get_indices().tolist() == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.unit
+@pytest.mark.dataset
+def test_set_order_bad_length():
+    """Attempt to set an order that does not match the dataset length."""
+    dataset = setup_columnar()
+    with pytest.raises(ValueError):
+        dataset.set_order(np.array([0, 1]))
+
+
+@pytest.mark.unit
+@pytest.mark.dataset
+def test_set_data_clears_order():
+    """Verify that loading new data resets the record order."""
+    dataset = setup_columnar()
+    dataset.set_order(np.array([4, 3, 2, 1, 0]))
+    dataset.set_data(json.load(FIFTY_FLIGHTS_PATH.open()))
+    assert dataset.get_order() is None
@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+from pathlib import Path
+from intelliflight.models.components.datasetcache import DatasetCache
+
+
+## HELPERS ##
+
+
+def get_columns() -> dict[str, np.ndarray]:
+    """Generate a small set of encoded columns."""
+    return {
+        'status': np.array([0, 2, 1], dtype=np.uint8),
+        'src': np.array([3, 300, 7], dtype=np.uint16)
+    }
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.datasetcache
+def test_save_load(tmp_path: Path):
+    """Verify that saved columns load as read-only memory maps along with
+    their metadata."""
+    cache = DatasetCache((tmp_path / 'cache').as_posix())
+    assert cache.load('key') is None
+    assert cache.get_misses() == 1
+
+    meta = {'seen_airports': ['1', '2'], 'drop_counts': {'no_weather': 3}}
+    cache.save('key', get_columns(), meta)
+    columns, loaded_meta = cache.load('key')
+    assert cache.get_hits() == 1
+    assert loaded_meta == meta
+    for name, column in get_columns().items():
+        assert isinstance(columns[name], np.memmap)
+        assert columns[name].dtype == column.dtype
+        assert columns[name].tolist() == column.tolist()
+        with pytest.raises(ValueError):
+            columns[name][0] = 1
+
+    # No temporary directories are left behind
+    assert [path.name for path in (tmp_path / 'cache').iterdir()] == ['key']
+
+
+@pytest.mark.unit
+@pytest.mark.datasetcache
+def test_save_replaces(tmp_path: Path):
+    """Verify that saving under an existing key replaces its entry."""
+    cache = DatasetCache(tmp_path.as_posix())
+    cache.save('key', get_columns(), {'n': 1})
+    cache.save('key', {'status': np.array([5], dtype=np.uint8)}, {'n': 2})
+    columns, meta = cache.load('key')
+    assert list(columns.keys()) == ['status']
+    assert columns['status'].tolist() == [5]
+    assert meta == {'n': 2}
+
+
+@pytest.mark.unit
+@pytest.mark.datasetcache
+def test_load_partial(tmp_path: Path):
+    """Verify that entries missing metadata or columns are misses."""
+    cache = DatasetCache(tmp_path.as_posix())
+    cache.save('key', get_columns(), {})
+    (tmp_path / 'key' / 'src.npy').unlink()
+    assert cache.load('key') is None
+
+    cache.save('key', get_columns(), {})
+    (tmp_path / 'key' / 'meta.json').write_text('{')
+    assert cache.load('key') is None
+    assert cache.get_misses() == 2
+
+
+@pytest.mark.unit
+@pytest.mark.datasetcache
+def test_make_key():
+    """Verify that keys depend on the inputs only."""
+    key = DatasetCache.make_key({'a': [1, 2], 'b': 'x'})
+    assert key == DatasetCache.make_key({'b': 'x', 'a': [1, 2]})
+    assert key != DatasetCache.make_key({'a': [2, 1], 'b': 'x'})
+    assert key != DatasetCache.make_key({'a': [1, 2], 'b': 'y'})
@@ -187,6 +187,27 @@ def test_shuffle_and_partition():
     assert partition_indices == [0, 16, 33]
 
 
+@pytest.mark.unit
+@pytest.mark.datautil
+def test_permute_and_partition():
+    """Test the following:
+
+    - Data are not modified
+    - The permutation matches the order given by shuffle_and_partition()
+    - Partition indices are correctly calculated
+    """
+    data = json.load(FIFTY_FLIGHTS_PATH.open())
+    original_data = deepcopy(data)
+    shuffled_data = data[:]
+    datautil.shuffle_and_partition(shuffled_data, 1, 3)
+
+    order, partition_indices = datautil.permute_and_partition(len(data), 1, 3)
+    assert data == original_data
+    assert sorted(order.tolist()) == list(range(len(data)))
+    assert [data[i] for i in order] == shuffled_data
+    assert partition_indices == [0, 16, 33]
+
+
 @pytest.mark.unit
 @pytest.mark.datautil
 @pytest.mark.parametrize('temp, bucket', [
@@ -245,3 +266,142 @@ def test_discretize_time(time, bucket):
     data[0]['CRS_DEP_TIME'] = time
     datautil.discretize(data)
     assert data[0]['CRS_DEP_TIME'] == bucket
+
+
+@pytest.mark.unit
+@pytest.mark.datautil
+def test_stream_merged_flights():
+    """Verify that streamed records match those of merge_training_data(), and
+    that records are discretized as they are consumed."""
+    merged_data, _, _, _ = datautil.merge_training_data(
+        FLIGHTS_SEEN_CARRIERS_AND_AIRPORTS_PATH, VALID_WEATHER_PATH)
+    stream = datautil.stream_merged_flights(
+        FLIGHTS_SEEN_CARRIERS_AND_AIRPORTS_PATH, VALID_WEATHER_PATH)
+    assert list(stream) == merged_data == SEEN_CARRIERS_AIRPORTS_MERGE_OUTPUT
+
+    records = datautil.discretize_records(datautil.stream_merged_flights(
+        FLIGHTS_SEEN_CARRIERS_AND_AIRPORTS_PATH, VALID_WEATHER_PATH))
+    expected = deepcopy(SEEN_CARRIERS_AIRPORTS_MERGE_OUTPUT)
+    datautil.discretize(expected)
+    assert next(records) == expected[0]
+    assert list(records) == expected[1:]
+
+
+@pytest.mark.unit
+@pytest.mark.datautil
+def test_stream_bad_weather_path():
+    """Attempt to stream with a nonexistent weather data file. The weather is
+    opened before any record is consumed."""
+    with pytest.raises(FileNotFoundError):
+        datautil.stream_merged_flights(
+            FLIGHTS_NO_TMP_OR_WND_PATH, 'BAD_PATH')
+
+
+@pytest.mark.unit
+@pytest.mark.datautil
+@pytest.mark.parametrize('flight_data, expected_counts', [
+    (FLIGHTS_NO_TMP_OR_WND_PATH, {'incomplete_weather': 2}),
+    (FLIGHTS_NO_WEATHER_FOR_DATE_PATH, {'no_weather': 1}),
+    (FLIGHTS_UNMAPPED_AIRPORTS_PATH, {'unknown_airport': 2}),
+    (FLIGHTS_SEEN_CARRIERS_AND_AIRPORTS_PATH, {'unknown_airport': 2})
+])
+def test_merge_drop_counts(flight_data: Path, expected_counts: dict):
+    """Verify that pruned flights are counted by reason, and that counts
+    accumulate across merges."""
+    drop_counts = {}
+    datautil.merge_training_data(
+        flight_data, VALID_WEATHER_PATH, drop_counts)
+    assert drop_counts == expected_counts
+    assert set(drop_counts.keys()) <= set(datautil.DROP_REASONS)
+
+    datautil.merge_training_data(
+        flight_data, VALID_WEATHER_PATH, drop_counts)
+    assert drop_counts == {reason: count * 2
+                           for reason, count in expected_counts.items()}
+
+
+@pytest.mark.unit
+@pytest.mark.datautil
+def test_join_weather_index():
+    """Verify that the weather of each airport and date is looked up once."""
+    class WeatherStoreDummy:
+        def __init__(self):
+            self.lookups = []
+
+        def lookup(self, bts_id: str, ymd_date: str):
+            self.lookups.append((bts_id, ymd_date))
+            return None if bts_id == '3' else {'tavg': 1.0, 'wspd': 2.0}
+
+    weather = WeatherStoreDummy()
+    dated_rows = [('2018-01-01', {'ORIGIN_AIRPORT_ID': src, 'DEST_AIRPORT_ID': dst})
+                  for src, dst in [('1', '2'), ('2', '1'), ('1', '2'), ('3', '1'), ('3', '2')]]
+    drop_counts = {}
+    merged = list(datautil.join_weather(dated_rows, weather, drop_counts))
+    assert len(merged) == 3
+    assert merged[0]['src_tavg'] == 1.0 and merged[0]['dst_wspd'] == 2.0
+    assert sorted(weather.lookups) == [
+        ('1', '2018-01-01'), ('2', '2018-01-01'), ('3', '2018-01-01')]
+    assert drop_counts == {'no_weather': 2}
+
+
+@pytest.mark.unit
+@pytest.mark.datautil
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+@pytest.mark.parametrize('chunk_bytes', [1, 7, 40, 10 ** 6])
+def test_get_csv_chunks(tmp_path: Path, newline: str, chunk_bytes: int):
+    """Verify that chunks start on line boundaries and together hold every
+    row once, in order."""
+    with FLIGHTS_SEEN_CARRIERS_AND_AIRPORTS_PATH.open(encoding='utf-8') as f_in:
+        lines = f_in.read().splitlines()
+    flight_path = tmp_path / 'flights.csv'
+    flight_path.write_bytes(
+        newline.join(lines[:1] + lines[1:] * 5).encode('utf-8') + newline.encode('utf-8'))
+
+    chunks = datautil.get_csv_chunks(flight_path.as_posix(), chunk_bytes)
+    content = flight_path.read_bytes()
+    assert chunks[0][0] == len(lines[0]) + len(newline)
+    assert chunks[-1][1] == len(content)
+    for (_, end), (start, _) in zip(chunks[:-1], chunks[1:]):
+        assert end == start
+        assert content[start - 1:start] == b'\n'
+    if chunk_bytes == 10 ** 6:
+        assert len(chunks) == 1
+
+    rows = list(datautil.read_flight_rows(flight_path.as_posix()))
+    assert len(rows) == (len(lines) - 1) * 5
+    assert [row for chunk in chunks
+            for row in datautil.read_flight_rows(flight_path.as_posix(), chunk)] == rows
+
+
+@pytest.mark.unit
+@pytest.mark.datautil
+def test_get_csv_chunks_empty(tmp_path: Path):
+    """Verify that files without rows have no chunks."""
+    flight_path = tmp_path / 'flights.csv'
+    flight_path.write_text('DAY_OF_WEEK,FL_DATE\n')
+    assert datautil.get_csv_chunks(flight_path.as_posix(), 10) == []
+    flight_path.write_text('')
+    assert datautil.get_csv_chunks(flight_path.as_posix(), 10) == []
+    assert list(datautil.read_flight_rows(flight_path.as_posix())) == []
+    with pytest.raises(ValueError):
+        datautil.get_csv_chunks(flight_path.as_posix(), 0)
+
+
+@pytest.mark.unit
+@pytest.mark.datautil
+def test_resolve_flight_paths(tmp_path: Path):
+    """Verify that paths are kept in order and patterns are expanded in name
+    order."""
+    for name in ['2019_02.csv', '2019_01.csv', '2020_01.csv']:
+        (tmp_path / name).write_text('')
+    paths = datautil.resolve_flight_paths(
+        [(tmp_path / '2020_01.csv').as_posix(), (tmp_path / '2019_*.csv').as_posix()])
+    assert [Path(path).name for path in paths] == \
+        ['2020_01.csv', '2019_01.csv', '2019_02.csv']
+    assert datautil.resolve_flight_paths((tmp_path / '2019_01.csv').as_posix()) == \
+        [(tmp_path / '2019_01.csv').as_posix()]
+
+    with pytest.raises(FileNotFoundError):
+        datautil.resolve_flight_paths((tmp_path / '2021_*.csv').as_posix())
+    with pytest.raises(FileNotFoundError):
+        datautil.resolve_flight_paths(['BAD_PATH'])
@@ -0,0 +1,162 @@
+import pytest
+import json
+from pathlib import Path
+from intelliflight.models.components.keymeta import KeyMeta
+from intelliflight.models.components.encoder import FeatureEncoder, StreamEncoder, FEATURES, FEATURE_VOCABULARIES, get_status_key
+from typing import Final
+
+
+## DATA ##
+
+
+TEST_PATH: Final = Path(__file__).parent.parent
+FREQ_TEST_DATA_PATH: Final = TEST_PATH / 'data' / 'freq_test_data.json'
+
+
+## HELPERS ##
+
+
+def get_keymeta() -> KeyMeta:
+    """Instantiate and return a KeyMeta object."""
+    keymeta = KeyMeta()
+    keymeta.set_arrival_statuses({
+        'divert': 'desc1',
+        'cancel:1': 'desc2',
+        'delay:1': 'desc3',
+        'delay:2': 'desc4'
+    })
+    keymeta.set_seen_airports({'a2', 'a1'})
+    keymeta.set_seen_carriers({'c2', 'c1'})
+    keymeta.set_temp_keys([1, 2])
+    keymeta.set_wind_keys([1, 2])
+    return keymeta
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_vocabularies():
+    """Test that codes follow KeyMeta order, with sets sorted."""
+    encoder = FeatureEncoder(get_keymeta())
+    assert encoder.get_keys('status') == [
+        'divert', 'cancel:1', 'delay:1', 'delay:2']
+    assert encoder.get_keys('day') == ['1', '2', '3', '4', '5', '6', '7']
+    assert encoder.get_keys('airline') == ['c1', 'c2']
+    assert encoder.get_keys('src') == ['a1', 'a2']
+    assert encoder.get_keys('dst') == ['a1', 'a2']
+    assert encoder.get_dimension('dep_time') == 48
+    assert encoder.get_keys('src_tmp') == [1, 2]
+    assert encoder.encode('dep_time', '0030') == 1
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_vocabularies_match_keymeta():
+    """Test that every code is the code KeyMeta validates against."""
+    keymeta = get_keymeta()
+    encoder = FeatureEncoder(keymeta)
+    for name, vocabulary in [('status', 'status')] + list(FEATURE_VOCABULARIES.items()):
+        keys = encoder.get_keys(name)
+        assert keys == keymeta.get_vocabulary_keys(vocabulary)
+        assert encoder.encode_column(name, keys).tolist() \
+            == [keymeta.get_vocabulary(vocabulary)[str(key)] for key in keys]
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_encode_records():
+    """Test encoding of all and of selected records."""
+    data = json.load(FREQ_TEST_DATA_PATH.open())
+    encoder = FeatureEncoder(get_keymeta())
+
+    columns = encoder.encode_records(data)
+    assert set(columns.keys()) == {'status', *FEATURES}
+    assert columns['status'].tolist() == [
+        encoder.encode('status', get_status_key(row)) for row in data]
+    assert columns['src'].tolist() == [0, 1, 0, 0, 1]
+
+    columns = encoder.encode_records(data, [1, 3])
+    assert columns['day'].tolist() == [1, 2]
+    assert columns['airline'].tolist() == [0, 0]
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_encode_unknown_key():
+    """Attempt to encode a record holding an unknown airport."""
+    data = json.load(FREQ_TEST_DATA_PATH.open())
+    data[0]['ORIGIN_AIRPORT_ID'] = 'a3'
+    with pytest.raises(KeyError):
+        FeatureEncoder(get_keymeta()).encode_records(data)
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_encode_column():
+    """Encode a column of keys, matching keys by string form."""
+    encoder = FeatureEncoder(get_keymeta())
+    assert encoder.encode_column('src', ['a2', 'a1', 'a2']).tolist() == [
+        1, 0, 1]
+    assert encoder.encode_column('src_tmp', ['2', 1]).tolist() == [1, 0]
+    assert encoder.encode_column('day', []).tolist() == []
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_encode_column_unknown_key():
+    """Attempt to encode a column holding unknown keys."""
+    encoder = FeatureEncoder(get_keymeta())
+    with pytest.raises(KeyError) as e:
+        encoder.encode_column('airline', ['c1', 'c9', 'c8', 'c9'])
+    assert e.value.args[0] == ['c8', 'c9']
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_init_uninitialized():
+    """Attempt to build an encoder from an empty KeyMeta."""
+    with pytest.raises(BufferError):
+        FeatureEncoder(KeyMeta())
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_stream_encoder():
+    """Verify that streamed records encode as FeatureEncoder encodes them
+    once the seen airports and carriers are known."""
+    data = json.load(FREQ_TEST_DATA_PATH.open())
+    keymeta = get_keymeta()
+    stream_encoder = StreamEncoder(keymeta)
+    # Consumed lazily, in two parts
+    assert stream_encoder.encode(iter(data[:2])) == 2
+    assert stream_encoder.encode(row for row in data[2:]) == len(data) - 2
+    assert stream_encoder.get_len() == len(data)
+
+    keymeta.set_seen_airports(stream_encoder.get_seen_airports())
+    keymeta.set_seen_carriers(stream_encoder.get_seen_carriers())
+    encoder = FeatureEncoder(keymeta)
+    columns = stream_encoder.get_columns(encoder)
+    expected = encoder.encode_records(data)
+    assert set(columns.keys()) == set(expected.keys())
+    for name, column in expected.items():
+        assert columns[name].dtype == column.dtype
+        assert columns[name].tolist() == column.tolist()
+
+
+@pytest.mark.unit
+@pytest.mark.encoder
+def test_stream_encoder_unknown_key():
+    """Attempt to stream a record holding an unknown departure time, and
+    verify that the records before it stay encoded."""
+    data = json.load(FREQ_TEST_DATA_PATH.open())
+    data[1] = data[1] | {'ORIGIN_AIRPORT_ID': 'a9', 'CRS_DEP_TIME': '1445'}
+    stream_encoder = StreamEncoder(get_keymeta())
+    with pytest.raises(KeyError):
+        stream_encoder.encode(data)
+    assert stream_encoder.get_len() == 1
+    assert 'a9' not in stream_encoder.get_seen_airports()
+
+    with pytest.raises(BufferError):
+        StreamEncoder(KeyMeta())
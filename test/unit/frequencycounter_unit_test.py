@@ -4,6 +4,7 @@ from pathlib import Path
 from intelliflight.models.components.keymeta import KeyMeta
 from intelliflight.models.components.dataset import Dataset
 from intelliflight.models.components.frequencycounter import FrequencyCounter
+from intelliflight.models.components.encoder import FeatureEncoder
 from typing import Final
 
 
@@ -525,3 +526,135 @@ def test_count_uninitialized():
     """Attempt to count frequencies with uninitialized counters."""
     with pytest.raises(BufferError):
         FrequencyCounter().count_frequencies(get_dataset())
+
+
+@pytest.mark.unit
+@pytest.mark.frequencies
+@pytest.mark.parametrize('test_bounds, validation_bounds', [
+    (None, None),
+    ((0, 1), None),
+    ((0, 1), (1, 2)),
+    ((3, 5), (1, 2))
+])
+def test_count_vectorized_matches_count(test_bounds, validation_bounds):
+    """Verify that the vectorized counting engine produces the same tables
+    as `count_frequencies()`."""
+    expected = FrequencyCounter()
+    expected.reset_counters(get_keymeta())
+    counter = FrequencyCounter()
+    counter.reset_counters(get_keymeta())
+    dataset = get_dataset()
+    if test_bounds is not None:
+        dataset.set_test_bounds(*test_bounds)
+    if validation_bounds is not None:
+        dataset.set_validation_bounds(*validation_bounds)
+
+    expected.count_frequencies(dataset)
+    counter.count_frequencies_vectorized(dataset, FeatureEncoder(get_keymeta()))
+
+    assert counter.get_status_counter() == expected.get_status_counter()
+    assert counter.get_day_counter() == expected.get_day_counter()
+    assert counter.get_airline_counter() == expected.get_airline_counter()
+    assert counter.get_src_counter() == expected.get_src_counter()
+    assert counter.get_dst_counter() == expected.get_dst_counter()
+    assert counter.get_dep_time_counter() == expected.get_dep_time_counter()
+    assert counter.get_src_tmp_counter() == expected.get_src_tmp_counter()
+    assert counter.get_dst_tmp_counter() == expected.get_dst_tmp_counter()
+    assert counter.get_src_wind_counter() == expected.get_src_wind_counter()
+    assert counter.get_dst_wind_counter() == expected.get_dst_wind_counter()
+
+
+@pytest.mark.unit
+@pytest.mark.frequencies
+def test_count_arrays_round_trip():
+    """Verify that count arrays read back the values they were set with."""
+    encoder = FeatureEncoder(get_keymeta())
+    counts = setup_counter().get_count_arrays(encoder)
+    counter = FrequencyCounter()
+    counter.reset_counters(get_keymeta())
+    counter.set_count_arrays(counts, encoder)
+
+    assert counter.query_status_counter('cancel:1') == 2
+    assert counter.query_day_counter('7', 'cancel:1') == 1
+    round_trip = counter.get_count_arrays(encoder)
+    assert all((round_trip[name] == counts[name]).all() for name in counts)
+
+
+@pytest.mark.unit
+@pytest.mark.frequencies
+def test_count_vectorized_uninitialized():
+    """Attempt to count frequencies with uninitialized counters."""
+    with pytest.raises(BufferError):
+        FrequencyCounter().count_frequencies_vectorized(
+            get_dataset(), FeatureEncoder(get_keymeta()))
+
+
+@pytest.mark.unit
+@pytest.mark.frequencies
+def test_count_columnar():
+    """Verify that columnar datasets are counted the same as row data."""
+    expected = FrequencyCounter()
+    expected.reset_counters(get_keymeta())
+    row_dataset = get_dataset()
+    row_dataset.set_test_bounds(3, 5)
+    expected.count_frequencies(row_dataset)
+
+    encoder = FeatureEncoder(get_keymeta())
+    dataset = Dataset()
+    dataset.set_columns(encoder.encode_records(get_dataset().get_data()),
+                        encoder)
+    dataset.set_test_bounds(3, 5)
+    counter = FrequencyCounter()
+    counter.reset_counters(get_keymeta())
+    counter.count_frequencies(dataset)
+
+    assert counter.get_status_counter() == expected.get_status_counter()
+    assert counter.get_src_counter() == expected.get_src_counter()
+    assert counter.get_dep_time_counter() == expected.get_dep_time_counter()
+    assert counter.get_dst_wind_counter() == expected.get_dst_wind_counter()
+
+
+@pytest.mark.unit
+@pytest.mark.frequencies
+def test_export_import_counters():
+    """Verify that exported counters import into an equal counter."""
+    counter = FrequencyCounter()
+    counter.reset_counters(get_keymeta())
+    counter.count_frequencies(get_dataset())
+
+    imported = FrequencyCounter()
+    imported.import_counters(counter.export_counters())
+    encoder = FeatureEncoder(get_keymeta())
+    expected = counter.get_count_arrays(encoder)
+    actual = imported.get_count_arrays(encoder)
+    for name in expected:
+        assert (actual[name] == expected[name]).all()
+
+
+@pytest.mark.unit
+@pytest.mark.frequencies
+def test_extend_counters():
+    """Add new airports and carriers to counted frequencies."""
+    counter = FrequencyCounter()
+    counter.reset_counters(get_keymeta())
+    counter.count_frequencies(get_dataset())
+    src_counter = counter.get_src_counter()
+
+    keymeta = get_keymeta()
+    keymeta.set_seen_airports({'a1', 'a2', 'a3'})
+    keymeta.set_seen_carriers({'c1', 'c2', 'c3'})
+    counter.extend_counters(keymeta)
+
+    assert counter.get_src_counter() == {
+        **src_counter, 'a3': dict.fromkeys(src_counter['a1'].keys(), 0)}
+    assert set(counter.get_dst_counter().keys()) == {'a1', 'a2', 'a3'}
+    assert set(counter.get_airline_counter().keys()) == {'c1', 'c2', 'c3'}
+
+
+@pytest.mark.unit
+@pytest.mark.frequencies
+def test_extend_counters_uninitialized():
+    """Attempt to extend counters that were never initialized."""
+    with pytest.raises(BufferError):
+        FrequencyCounter().extend_counters(get_keymeta())
+
@@ -131,3 +131,70 @@ def test_in_wind_keys_uninitialized():
     """Atwindt to call in_wind_keys when that structure is `None`."""
     with pytest.raises(BufferError):
         KeyMeta().in_wind_keys('')
+
+
+@pytest.mark.unit
+@pytest.mark.keymeta
+def test_get_vocabulary():
+    """Verify that vocabularies map string keys to codes and follow changes
+    to the keys."""
+    keymeta = setup()
+    assert dict(keymeta.get_vocabulary('airport')) == {'a1': 0, 'a2': 1}
+    assert dict(keymeta.get_vocabulary('status')) == {'s1': 0, 's2': 1}
+    assert keymeta.get_vocabulary('day')['7'] == 6
+    assert keymeta.get_vocabulary('dep_time')['2330'] == 47
+    assert keymeta.get_vocabulary('carrier') is keymeta.get_vocabulary('carrier')
+    with pytest.raises(TypeError):
+        keymeta.get_vocabulary('carrier')['c3'] = 2
+
+    keymeta.set_seen_airports({'a0', 'a1'})
+    assert dict(keymeta.get_vocabulary('airport')) == {'a0': 0, 'a1': 1}
+    keymeta.set_temp_keys([1, 2])
+    assert dict(keymeta.get_vocabulary('temp')) == {'1': 0, '2': 1}
+
+
+@pytest.mark.unit
+@pytest.mark.keymeta
+def test_get_vocabulary_bad_name():
+    """Attempt to get unknown and uninitialized vocabularies."""
+    with pytest.raises(ValueError):
+        setup().get_vocabulary('bad')
+    with pytest.raises(BufferError):
+        KeyMeta().get_vocabulary('airport')
+
+
+@pytest.mark.unit
+@pytest.mark.keymeta
+def test_validate_records():
+    """Verify that records with unknown values are masked, with the first
+    unknown value of each reported."""
+    mask, reasons = setup().validate_records({
+        'ORIGIN_AIRPORT_ID': ['a1', 'a9', 'a2', 'a9'],
+        'DEST_AIRPORT_ID': ['a2', 'a1', 'a1', 'a0'],
+        'OP_UNIQUE_CARRIER': ['c1', 'c1', 'c9', 'c1'],
+        'CRS_DEP_TIME': ['0030', '0030', '0030', '0045'],
+        'src_tavg': ['t1', 't2', 't1', 't1'],
+        'other': ['x', 'y', 'z', 'w']
+    })
+    assert mask.tolist() == [True, False, False, False]
+    assert reasons == {
+        1: 'ORIGIN_AIRPORT_ID=a9 did not occur in the training data.',
+        2: 'OP_UNIQUE_CARRIER=c9 did not occur in the training data.',
+        3: 'ORIGIN_AIRPORT_ID=a9 did not occur in the training data.'
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.keymeta
+@pytest.mark.parametrize('status_k, bucket', [
+    ('delay:-2', 'on_time'),
+    ('delay:0', 'on_time'),
+    ('delay:1', 'delayed'),
+    ('delay:12', 'delayed'),
+    ('cancel:A', 'cancelled'),
+    ('divert', 'diverted')
+])
+def test_get_status_bucket(status_k: str, bucket: str):
+    """Verify that arrival statuses are aggregated into buckets."""
+    assert KeyMeta.get_status_bucket(status_k) == bucket
+    assert bucket in setup().get_status_buckets()
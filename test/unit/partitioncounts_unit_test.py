@@ -0,0 +1,125 @@
+import pytest
+import json
+import numpy as np
+from pathlib import Path
+from intelliflight.models.components.keymeta import KeyMeta
+from intelliflight.models.components.dataset import Dataset
+from intelliflight.models.components.encoder import FeatureEncoder
+from intelliflight.models.components.frequencycounter import FrequencyCounter
+from intelliflight.models.components.partitioncounts import PartitionCounts
+from typing import Final
+
+
+## DATA ##
+
+
+TEST_PATH: Final = Path(__file__).parent.parent
+FREQ_TEST_DATA_PATH: Final = TEST_PATH / 'data' / 'freq_test_data.json'
+PARTITION_STARTS: Final = [0, 2, 3]
+ORDER: Final = [3, 0, 4, 1, 2]
+
+
+## HELPERS ##
+
+
+def get_dataset() -> Dataset:
+    """Instantiate and return a Dataset object."""
+    data = json.load(FREQ_TEST_DATA_PATH.open())
+    dataset = Dataset()
+    dataset.set_data(data)
+    return dataset
+
+
+def get_keymeta() -> KeyMeta:
+    """Instantiate and return a KeyMeta object."""
+    keymeta = KeyMeta()
+    keymeta.set_arrival_statuses({
+        'divert': 'desc1',
+        'cancel:1': 'desc2',
+        'delay:1': 'desc3',
+        'delay:2': 'desc4'
+    })
+    keymeta.set_seen_airports({'a1', 'a2'})
+    keymeta.set_seen_carriers({'c1', 'c2'})
+    keymeta.set_temp_keys([1, 2])
+    keymeta.set_wind_keys([1, 2])
+    return keymeta
+
+
+def setup(ordered: bool = False) -> tuple[PartitionCounts, Dataset, FeatureEncoder]:
+    """Build partition counts over the test dataset, optionally permuted by
+    `ORDER`."""
+    dataset = get_dataset()
+    if ordered:
+        dataset.set_order(np.array(ORDER))
+    encoder = FeatureEncoder(get_keymeta())
+    partition_counts = PartitionCounts()
+    partition_counts.build(dataset, PARTITION_STARTS, encoder)
+    return partition_counts, dataset, encoder
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.partitions
+def test_bounds():
+    """Test that partition bounds span the dataset."""
+    partition_counts, _, _ = setup()
+    assert partition_counts.get_partition_count() == 3
+    assert partition_counts.get_bounds(0) == (0, 2)
+    assert partition_counts.get_bounds(1) == (2, 3)
+    assert partition_counts.get_bounds(2) == (3, 5)
+    assert partition_counts.get_columns(2)['day'].tolist() == [2, 6]
+
+
+@pytest.mark.unit
+@pytest.mark.partitions
+@pytest.mark.parametrize('ordered', [False, True])
+@pytest.mark.parametrize('excluded', [(), (0,), (1, 2), (2, 0)])
+def test_counts_excluding(excluded: tuple[int], ordered: bool):
+    """Verify that derived counts equal a recount of the remaining data."""
+    partition_counts, dataset, encoder = setup(ordered)
+    if len(excluded) > 0:
+        dataset.set_test_bounds(*partition_counts.get_bounds(excluded[0]))
+    if len(excluded) > 1:
+        dataset.set_validation_bounds(
+            *partition_counts.get_bounds(excluded[1]))
+    counter = FrequencyCounter()
+    counter.reset_counters(get_keymeta())
+    counter.count_frequencies(dataset)
+    expected = counter.get_count_arrays(encoder)
+
+    counts = partition_counts.get_counts_excluding(*excluded)
+    assert set(counts.keys()) == set(expected.keys())
+    for name in expected:
+        assert (counts[name] == expected[name]).all()
+
+
+@pytest.mark.unit
+@pytest.mark.partitions
+def test_ordered_partitions():
+    """Verify that partitions are index ranges over the record order."""
+    partition_counts, _, _ = setup(ordered=True)
+    assert partition_counts.get_indices(0).tolist() == [3, 0]
+    assert partition_counts.get_indices(2).tolist() == [1, 2]
+    assert partition_counts.get_columns(2)['day'].tolist() == [1, 2]
+    # Full dataset columns stay in storage order
+    assert partition_counts.get_columns()['day'].tolist() == [0, 1, 2, 2, 6]
+
+
+@pytest.mark.unit
+@pytest.mark.partitions
+def test_counts_excluding_does_not_modify_total():
+    """Verify that deriving counts leaves the cached totals untouched."""
+    partition_counts, _, _ = setup()
+    partition_counts.get_counts_excluding(0, 1)
+    assert partition_counts.get_counts_excluding()['status'].sum() == 5
+
+
+@pytest.mark.unit
+@pytest.mark.partitions
+def test_not_built():
+    """Attempt to read counts before building them."""
+    with pytest.raises(BufferError):
+        PartitionCounts().get_counts_excluding()
@@ -0,0 +1,210 @@
+import json
+import pytest
+import requests
+import threading
+import urllib.request
+from urllib.error import HTTPError
+from pathlib import Path
+from intelliflight.models.bayes_net import Bayes_Net
+from intelliflight.models.components.ptables import ProbabilityTables
+from intelliflight.util import batchutil, datautil
+from intelliflight.util.prediction_server import PredictionServer, LatencyStats
+from typing import Final
+
+
+## DATA ##
+
+
+TEST_PATH: Final = Path(__file__).parent.parent
+PARAMS_PATH: Final = TEST_PATH / 'data' / 'sample_bayes_params.json'
+WEATHER: Final = {'src_tavg': '55.0', 'dst_tavg': '72.5',
+                  'src_wspd': '4', 'dst_wspd': '12'}
+
+
+## HELPERS ##
+
+
+class ForecasterDummy:
+    """Dummy class for mocking `Forecaster`. Every forecast request fails
+    like an NWS outage."""
+
+    def get_nws_forecast_from_bts(self, bts_id: int, iso_timestamp: str) -> dict:
+        raise requests.HTTPError('503 Server Error')
+
+
+@pytest.fixture
+def server():
+    """Serve the sample model on a free port for the duration of a test."""
+    server = PredictionServer(
+        Bayes_Net(PARAMS_PATH.as_posix()), port=0, workers=2)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(server: PredictionServer, path: str, body=None) -> tuple[int, dict]:
+    """Send a request to `server` and return its status and JSON body. The
+    request is a POST of `body` as JSON if `body` is not `None`."""
+    host, port = server.server_address[:2]
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    try:
+        with urllib.request.urlopen(f'http://{host}:{port}{path}', data) as res:
+            return res.status, json.loads(res.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def get_flight(bayes: Bayes_Net) -> dict:
+    """Generate one input flight over an airport and carrier seen by
+    `bayes`."""
+    airports = sorted(bayes.key_meta.get_seen_airports())
+    return {
+        'ORIGIN_AIRPORT_ID': airports[0],
+        'DEST_AIRPORT_ID': airports[1],
+        'OP_UNIQUE_CARRIER': sorted(bayes.key_meta.get_seen_carriers())[0],
+        'FL_DATE': '2024-05-01',
+        'CRS_DEP_TIME': '0930'
+    } | WEATHER
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.server
+def test_health(server: PredictionServer):
+    """Verify that the health endpoint responds."""
+    status, body = request(server, '/health')
+    assert status == 200
+    assert body['status'] == 'ok'
+    assert body['workers'] == 2
+
+
+@pytest.mark.unit
+@pytest.mark.server
+def test_predict(server: PredictionServer):
+    """Verify that served predictions match make_prediction()."""
+    flight = get_flight(server.bayes)
+    record = batchutil.prepare_flight(flight)
+    datautil.discretize([record])
+    expected_status, expected_p = server.bayes.make_prediction(
+        record['ORIGIN_AIRPORT_ID'], record['DEST_AIRPORT_ID'], record['OP_UNIQUE_CARRIER'],
+        record['DAY_OF_WEEK'], record['CRS_DEP_TIME'], record['src_tavg'], record['dst_tavg'], record['src_wspd'], record['dst_wspd'])
+
+    status, body = request(server, '/predict', flight)
+    assert status == 200
+    assert len(body['predictions']) == 1
+    assert body['predictions'][0]['status'] == expected_status
+    assert body['predictions'][0]['probability'] == pytest.approx(expected_p)
+
+    status, body = request(server, '/predict', {'flights': [
+        flight, flight | {'ORIGIN_AIRPORT_ID': '0'}]})
+    assert status == 200
+    assert body['predictions'][0]['status'] == expected_status
+    assert 'error' in body['predictions'][1]
+
+
+@pytest.mark.unit
+@pytest.mark.server
+def test_predict_forecast_error():
+    """Verify that flights whose forecasts fail get an error while the
+    others are predicted, and that the request is recorded."""
+    bayes = Bayes_Net(PARAMS_PATH.as_posix())
+    server = PredictionServer(bayes, port=0, forecaster=ForecasterDummy())
+    flight = get_flight(bayes)
+    no_weather = {key: value for key, value in flight.items()
+                  if key not in WEATHER}
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        status, body = request(
+            server, '/predict', {'flights': [no_weather, flight]})
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    assert status == 200
+    assert body['predictions'][0] == {'error': '503 Server Error'}
+    assert 'status' in body['predictions'][1]
+    assert server.latency_stats.summary()['requests'] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.server
+@pytest.mark.parametrize('path, body, expected_status', [
+    ('/predict', {'flights': 'not a list'}, 400),
+    ('/predict', [1, 2], 200),
+    ('/unknown', {}, 404)
+])
+def test_predict_bad_request(server: PredictionServer, path: str, body, expected_status: int):
+    """Attempt malformed requests."""
+    status, response = request(server, path, body)
+    assert status == expected_status
+    if status == 200:
+        assert all('error' in prediction
+                   for prediction in response['predictions'])
+    else:
+        assert 'error' in response
+
+
+@pytest.mark.unit
+@pytest.mark.server
+def test_stats(server: PredictionServer):
+    """Verify that prediction requests are counted in the latency stats."""
+    _, body = request(server, '/stats')
+    assert body['requests'] == 0
+    assert body['p50_ms'] is None
+
+    flight = get_flight(server.bayes)
+    for _ in range(3):
+        request(server, '/predict', flight)
+    request(server, '/predict', {'flights': None})
+
+    _, body = request(server, '/stats')
+    assert body['requests'] == 4
+    assert body['errors'] == 1
+    assert 0 < body['p50_ms'] <= body['p99_ms'] <= body['max_ms']
+
+
+@pytest.mark.unit
+@pytest.mark.server
+def test_predict_internal_error(server: PredictionServer):
+    """Verify that a failing model yields a 500 response and is counted as an
+    error."""
+    flight = get_flight(server.bayes)
+    server.bayes.p_tables = ProbabilityTables()
+    status, body = request(server, '/predict', flight)
+    assert status == 500
+    assert body['error'].startswith('BayesNet: ERR:')
+
+    _, body = request(server, '/stats')
+    assert body['requests'] == 1
+    assert body['errors'] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.server
+def test_latency_stats():
+    """Verify that latency percentiles cover only the most recent window."""
+    stats = LatencyStats(window=4)
+    for seconds in [1, 1, 0.001, 0.002, 0.003, 0.004]:
+        stats.record(seconds)
+    summary = stats.summary()
+    assert summary['requests'] == 6
+    assert summary['max_ms'] == pytest.approx(4)
+    assert summary['mean_ms'] == pytest.approx(2.5)
+    with pytest.raises(ValueError):
+        LatencyStats(window=0)
+
+
+@pytest.mark.unit
+@pytest.mark.server
+def test_untrained():
+    """Attempt to serve an untrained model."""
+    with pytest.raises(BufferError):
+        PredictionServer(Bayes_Net(), port=0)
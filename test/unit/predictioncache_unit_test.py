@@ -0,0 +1,82 @@
+import pytest
+from intelliflight.models.components.predictioncache import PredictionCache
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.cache
+def test_get_put():
+    """Store predictions and count hits and misses."""
+    cache = PredictionCache(2)
+    assert cache.get(('a',)) is None
+    cache.put(('a',), ('delay:0', 0.5))
+    assert cache.get(('a',)) == ('delay:0', 0.5)
+    assert cache.get_len() == 1
+    assert cache.get_hits() == 1
+    assert cache.get_misses() == 1
+    assert cache.get_hit_rate() == 0.5
+
+
+@pytest.mark.unit
+@pytest.mark.cache
+def test_evict_least_recently_used():
+    """Verify that the least recently used prediction is evicted."""
+    cache = PredictionCache(2)
+    cache.put(('a',), 1)
+    cache.put(('b',), 2)
+    # 'a' is now more recently used than 'b'
+    cache.get(('a',))
+    cache.put(('c',), 3)
+    assert cache.get_len() == 2
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) == 1
+    assert cache.get(('c',)) == 3
+
+
+@pytest.mark.unit
+@pytest.mark.cache
+def test_disabled():
+    """Verify that a cache of size 0 stores nothing and counts nothing."""
+    cache = PredictionCache()
+    cache.put(('a',), 1)
+    assert cache.get(('a',)) is None
+    assert cache.get_len() == 0
+    assert cache.get_misses() == 0
+    assert cache.get_hit_rate() == 0
+
+
+@pytest.mark.unit
+@pytest.mark.cache
+def test_set_max_size():
+    """Shrink the cache and verify that the oldest predictions are evicted."""
+    cache = PredictionCache(3)
+    for i in range(3):
+        cache.put((i,), i)
+    cache.set_max_size(1)
+    assert cache.get_max_size() == 1
+    assert cache.get_len() == 1
+    assert cache.get((2,)) == 2
+
+
+@pytest.mark.unit
+@pytest.mark.cache
+def test_clear():
+    """Clear predictions and counters."""
+    cache = PredictionCache(2)
+    cache.put(('a',), 1)
+    cache.get(('a',))
+    cache.clear()
+    assert cache.get_len() == 0
+    assert cache.get_hits() == 0
+
+
+@pytest.mark.unit
+@pytest.mark.cache
+def test_bad_size():
+    """Attempt to create a cache with a negative size."""
+    with pytest.raises(ValueError):
+        PredictionCache(-1)
+    with pytest.raises(ValueError):
+        PredictionCache(1).set_max_size(-1)
@@ -1,10 +1,12 @@
 import pytest
 import json
+import numpy as np
 from pathlib import Path
 from intelliflight.models.components.keymeta import KeyMeta
 from intelliflight.models.components.dataset import Dataset
 from intelliflight.models.components.frequencycounter import FrequencyCounter
 from intelliflight.models.components.ptables import ProbabilityTables
+from intelliflight.models.components.encoder import FeatureEncoder, FEATURES
 from typing import Final
 
 
@@ -1324,3 +1326,71 @@ def test_fit_dst_wnd(k: int, expected: set[tuple[str, float]]):
     table = tables.get_p_dst_wnd()
     assert frozenset([(key, frozenset(col.items()))
                      for key, col in table.items()]) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.ptables
+def test_log_tensors_match_fit():
+    """Verify that batched log tensors hold the logs of the probabilities
+    computed by `fit()` for each k."""
+    k_values = [0, 1, 3]
+    encoder = FeatureEncoder(get_keymeta())
+    tensors = ProbabilityTables.log_tensors(
+        setup_counter().get_count_arrays(encoder), k_values)
+
+    status_keys = encoder.get_keys('status')
+    assert tensors['status'].shape == (3, 4)
+    assert tensors['src'].shape == (3, 2, 4)
+    for i, k in enumerate(k_values):
+        tables = setup_ptables(k)
+        for j, status_k in enumerate(status_keys):
+            assert np.exp(tensors['status'][i, j]) == pytest.approx(
+                tables.query_p_status(status_k))
+            for x, key in enumerate(encoder.get_keys('dep_time')):
+                assert np.exp(tensors['dep_time'][i, x, j]) == pytest.approx(
+                    tables.query_p_dep_time(key, status_k))
+            for x, key in enumerate(encoder.get_keys('airline')):
+                assert np.exp(tensors['airline'][i, x, j]) == pytest.approx(
+                    tables.query_p_airline(key, status_k))
+
+
+@pytest.mark.unit
+@pytest.mark.ptables
+def test_leave_one_out_log_tensors():
+    """Verify that leave-one-out tensors equal log tensors of counts from
+    which each record was removed."""
+    k_values = [0, 1, 3]
+    encoder = FeatureEncoder(get_keymeta())
+    columns = encoder.encode_records(get_dataset().get_data())
+    counts = FrequencyCounter.tally(columns, encoder)
+    tensors = ProbabilityTables.leave_one_out_log_tensors(
+        counts, columns, k_values)
+
+    assert tensors['status'].shape == (3, 5, 4)
+    for r in range(5):
+        record = {name: column[r:r + 1] for name, column in columns.items()}
+        own = FrequencyCounter.tally(record, encoder)
+        expected = ProbabilityTables.log_tensors(
+            {name: counts[name] - own[name] for name in counts}, k_values)
+        assert (tensors['status'][:, r] == expected['status']).all()
+        for feature in FEATURES:
+            assert (tensors[feature][:, r]
+                    == expected[feature][:, columns[feature][r]]).all()
+
+
+@pytest.mark.unit
+@pytest.mark.ptables
+def test_get_log_arrays():
+    """Verify that log arrays hold the logs of the fit probabilities in
+    encoder order."""
+    tables = setup_ptables(1)
+    encoder = FeatureEncoder(get_keymeta())
+    arrays = tables.get_log_arrays(encoder)
+
+    assert arrays['status'].shape == (4,)
+    assert arrays['day'].shape == (7, 4)
+    assert np.exp(arrays['status'][1]) == pytest.approx(
+        tables.query_p_status('cancel:1'))
+    assert np.exp(arrays['dst'][1, 0]) == pytest.approx(
+        tables.query_p_dst('a2', 'divert'))
+    assert ProbabilityTables().get_log_arrays(encoder) is None
@@ -0,0 +1,197 @@
+import pytest
+import json
+import numpy as np
+from datetime import date
+from pathlib import Path
+import intelliflight.util.datautil as datautil
+from intelliflight.util import weatherstore
+from intelliflight.util.weatherstore import WeatherStore
+from typing import Final
+
+
+## DATA ##
+
+
+TEST_PATH: Final = Path(__file__).parent.parent
+VALID_WEATHER_PATH: Final = \
+    TEST_PATH / 'data' / 'historical_weather_by_bts.json'
+FLIGHTS_SEEN_CARRIERS_AND_AIRPORTS_PATH: Final = \
+    TEST_PATH / 'data' / 'historical_flights_seen_carriers_airports.csv'
+FLIGHTS_NO_TMP_OR_WND_PATH: Final = \
+    TEST_PATH / 'data' / 'historical_flights_no_tmp_or_wnd.csv'
+
+
+## TESTS ##
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+def test_read_weather_json():
+    """Verify that lookups match the weather JSON."""
+    with VALID_WEATHER_PATH.open(encoding='utf-8') as w_in:
+        weather_data = json.load(w_in)
+    store = weatherstore.read_weather_json(VALID_WEATHER_PATH.as_posix())
+
+    assert store.get_airports() == tuple(weather_data)
+    for bts_id, days in weather_data.items():
+        for ymd_date, record in days.items():
+            assert store.lookup(bts_id, ymd_date) == \
+                {field: record[field] for field in weatherstore.STORE_FIELDS}
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+@pytest.mark.parametrize('bts_id, ymd_date', [
+    ('0', '2018-01-01'),
+    ('10135', '2017-12-31'),
+    ('10135', '2030-01-01'),
+    ('10135', 'not a date')
+])
+def test_lookup_missing(bts_id: str, ymd_date: str):
+    """Verify that unknown airports and dates are not found."""
+    store = weatherstore.read_weather_json(VALID_WEATHER_PATH.as_posix())
+    assert store.lookup(bts_id, ymd_date) is None
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+def test_lookup_gap():
+    """Verify that days absent for one airport are not found even if other
+    airports have them."""
+    store = WeatherStore(['1', '2'], date(2020, 1, 1), np.array([
+        [[1.0, 2.0], [np.nan, np.nan]],
+        [[3.0, np.nan], [5.0, 6.0]]
+    ]))
+    assert store.lookup('1', '2020-01-02') is None
+    assert store.lookup('2', '2020-01-01') == {'tavg': 3.0, 'wspd': None}
+    assert store.lookup(2, '2020-01-02') == {'tavg': 5.0, 'wspd': 6.0}
+    assert store.get_date_range() == (date(2020, 1, 1), date(2020, 1, 3))
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+def test_lookup_recorded_without_fields(tmp_path: Path):
+    """Verify that a recorded day missing every field is found, unlike a
+    day without a record, and that this survives a store file."""
+    json_path = tmp_path / 'weather.json'
+    json_path.write_text(json.dumps({
+        '1': {'2020-01-01': {'tavg': None, 'wspd': None},
+              '2020-01-03': {'tavg': 1.0, 'wspd': 2.0}}
+    }))
+    json_store = weatherstore.read_weather_json(json_path.as_posix())
+    file_store = weatherstore.build_weather_store(
+        json_path.as_posix(), (tmp_path / 'weather.bin').as_posix())
+    assert json_store.get_checksum() == file_store.get_checksum()
+
+    for store in [json_store, file_store]:
+        assert store.lookup('1', '2020-01-01') == {'tavg': None, 'wspd': None}
+        assert store.lookup('1', '2020-01-02') is None
+        assert store.lookup('1', '2020-01-03') == {'tavg': 1.0, 'wspd': 2.0}
+
+    # Classified as incomplete rather than missing weather
+    drop_counts = {}
+    rows = [('2020-01-01', {'ORIGIN_AIRPORT_ID': '1', 'DEST_AIRPORT_ID': '1'}),
+            ('2020-01-02', {'ORIGIN_AIRPORT_ID': '1', 'DEST_AIRPORT_ID': '1'})]
+    assert list(datautil.join_weather(rows, file_store, drop_counts)) == []
+    assert drop_counts == {'incomplete_weather': 1, 'no_weather': 1}
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+def test_build_weather_store(tmp_path: Path):
+    """Verify that a built store is memory-mapped and holds the same weather
+    as the JSON."""
+    json_store = weatherstore.read_weather_json(VALID_WEATHER_PATH.as_posix())
+    store_path = tmp_path / 'weather.bin'
+    store = weatherstore.build_weather_store(
+        VALID_WEATHER_PATH.as_posix(), store_path.as_posix())
+
+    assert isinstance(store.get_values(), np.memmap)
+    assert store.get_airports() == json_store.get_airports()
+    assert store.get_date_range() == json_store.get_date_range()
+    assert store.get_checksum() == json_store.get_checksum()
+    np.testing.assert_array_equal(store.get_values(), json_store.get_values())
+    assert weatherstore.open_weather_store(store_path.as_posix()).get_checksum() == \
+        store.get_checksum()
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+def test_checksum():
+    """Verify that checksums change with the weather."""
+    values = np.array([[[1.0, 2.0]]])
+    checksum = WeatherStore(['1'], date(2020, 1, 1), values).get_checksum()
+    assert WeatherStore(['1'], date(2020, 1, 1), values.copy()).get_checksum() == checksum
+    assert WeatherStore(['1'], date(2020, 1, 2), values).get_checksum() != checksum
+    assert WeatherStore(['2'], date(2020, 1, 1), values).get_checksum() != checksum
+    assert WeatherStore(['1'], date(2020, 1, 1), values + 1).get_checksum() != checksum
+    assert WeatherStore(['1'], date(2020, 1, 1), values,
+                        np.zeros((1, 1), dtype=bool)).get_checksum() != checksum
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+@pytest.mark.parametrize('flight_path', [
+    FLIGHTS_SEEN_CARRIERS_AND_AIRPORTS_PATH,
+    FLIGHTS_NO_TMP_OR_WND_PATH
+])
+def test_merge_with_store(tmp_path: Path, flight_path: Path):
+    """Verify that merging with a store matches merging with the JSON."""
+    store_path = tmp_path / 'weather.bin'
+    weatherstore.build_weather_store(
+        VALID_WEATHER_PATH.as_posix(), store_path.as_posix())
+    assert datautil.merge_training_data(flight_path, store_path.as_posix()) == \
+        datautil.merge_training_data(flight_path, VALID_WEATHER_PATH)
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+def test_open_bad_store(tmp_path: Path):
+    """Attempt to open malformed and outdated stores."""
+    store_path = tmp_path / 'weather.bin'
+    weatherstore.build_weather_store(
+        VALID_WEATHER_PATH.as_posix(), store_path.as_posix())
+    content = store_path.read_bytes()
+
+    store_path.write_bytes(content.replace(
+        f'"version": {weatherstore.STORE_VERSION}'.encode('utf-8'), b'"version": 0'))
+    with pytest.raises(ValueError):
+        weatherstore.open_weather_store(store_path.as_posix())
+
+    store_path.write_bytes(content[:20])
+    with pytest.raises(ValueError):
+        weatherstore.open_weather_store(store_path.as_posix())
+
+    with pytest.raises(FileNotFoundError):
+        weatherstore.open_weather_store((tmp_path / 'missing').as_posix())
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+def test_bad_shape():
+    """Attempt to construct a store whose values or presence do not match
+    its airports."""
+    with pytest.raises(ValueError):
+        WeatherStore(['1', '2'], date(2020, 1, 1), np.zeros((1, 1, 2)))
+    with pytest.raises(ValueError):
+        WeatherStore(['1'], date(2020, 1, 1), np.zeros((1, 2, 2)),
+                     np.ones((1, 1), dtype=bool))
+
+
+@pytest.mark.unit
+@pytest.mark.weather
+def test_get_weather_version(tmp_path: Path):
+    """Verify that store versions follow their contents and JSON versions
+    follow their file."""
+    store_path = tmp_path / 'weather.bin'
+    store = weatherstore.build_weather_store(
+        VALID_WEATHER_PATH.as_posix(), store_path.as_posix())
+    assert weatherstore.get_weather_version(store_path.as_posix()) == \
+        store.get_checksum()
+
+    json_path = tmp_path / 'weather.json'
+    json_path.write_text(VALID_WEATHER_PATH.read_text())
+    version = weatherstore.get_weather_version(json_path.as_posix())
+    assert weatherstore.get_weather_version(json_path.as_posix()) == version
+    json_path.write_text(VALID_WEATHER_PATH.read_text() + ' ')
+    assert weatherstore.get_weather_version(json_path.as_posix()) != version